@@ -8,10 +8,19 @@ from kivy.uix.scrollview import ScrollView
 from kivy.uix.gridlayout import GridLayout
 import json
 
+BASE_URL = 'http://localhost:5001'
+USER_ID = 1  # Replace with the user ID
+PAGE_SIZE = 100
+
 
 class NotificationApp(App):
     def build(self):
+        # Highest notification ID shown so far, only newer ones are fetched
+        self.last_id = 0
+
         self.root = BoxLayout(orientation='vertical')
+        self.unread_label = Label(size_hint_y=None, height=30)
+        self.root.add_widget(self.unread_label)
         self.notification_layout = GridLayout(cols=1, size_hint_y=None)
         self.notification_layout.bind(minimum_height=self.notification_layout.setter('height'))
         self.scroll_view = ScrollView()
@@ -25,28 +34,43 @@ class NotificationApp(App):
         send_button.bind(on_press=self.send_notification)
         self.root.add_widget(send_button)
 
+        UrlRequest(f'{BASE_URL}/users/{USER_ID}/notifications/unread', on_success=self.display_unread)
         self.get_notifications()
 
         return self.root
 
+    def display_unread(self, request, result):
+        self.unread_label.text = f"{result['unread']} unread"
+
     def add_notification(self, message):
         label = Label(text=message, size_hint_y=None, height=40)
         self.notification_layout.add_widget(label)
 
     def get_notifications(self):
-        user_id = 1  # Replace with the user ID
-        UrlRequest(f'http://localhost:5001/users/{user_id}/notifications', on_success=self.display_notifications)
+        UrlRequest(f'{BASE_URL}/users/{USER_ID}/notifications?since_id={self.last_id}&limit={PAGE_SIZE}',
+                   on_success=self.display_notifications)
 
     def display_notifications(self, request, result):
         for notification in result:
             self.add_notification(notification['message'])
+            self.last_id = notification['id']
+
+        if len(result) == PAGE_SIZE:
+            self.get_notifications()
+        elif self.last_id:
+            # Everything shown counts as read
+            UrlRequest(
+                f'{BASE_URL}/users/{USER_ID}/notifications/ack',
+                req_body=json.dumps({'up_to_id': self.last_id}),
+                req_headers={'Content-Type': 'application/json'},
+                on_success=self.display_unread
+            )
 
     def send_notification(self, instance):
         message = self.message_input.text
         if message:
-            user_id = 1  # Replace with the user ID
             UrlRequest(
-                f'http://localhost:5001/notify/{user_id}',
+                f'{BASE_URL}/notify/{USER_ID}',
                 req_body=json.dumps({'message': message}),
                 req_headers={'Content-Type': 'application/json'},
                 on_success=self.on_notification_sent
@@ -54,7 +78,7 @@ class NotificationApp(App):
             self.message_input.text = ''
 
     def on_notification_sent(self, request, result):
-        self.add_notification('Notification sent: ' + self.message_input.text)
+        self.get_notifications()
 
 
 if __name__ == '__main__':
@@ -1,11 +1,55 @@
 import unittest
 from tests.ping_test import PingTestCase
 from tests.apikeycheck_test import APIKeyCheckTestCase
+from tests.query_plan_test import QueryPlanTestCase
+from tests.query_budget_test import QueryBudgetTestCase, APIQueryBudgetTestCase
+from tests.notify_bus_test import NotifyBusTestCase
+from tests.socket_token_test import SocketTokenTestCase, NotifyWidgetTestCase
+from tests.notify_cache_test import RecentNotificationsTestCase
+from tests.notify_writer_test import NotificationWriterTestCase, NotifyUserTestCase
+from tests.alarm_stream_test import AlarmStreamTestCase
+from tests.dispatch_test import DeliveryQueueTestCase, DispatcherTestCase
+from tests.emergency_test import EmergencyAlarmTestCase, EmergencyRateLimitTestCase, EmergencyGroupCommitTestCase
+from tests.ratelimit_test import RateLimiterTestCase
+from tests.space_admin_test import SpaceAdminTestCase
+from tests.outbox_test import OutboxTestCase
+from tests.alarm_stats_test import AlarmStatsTestCase
+from tests.alarm_history_test import AlarmHistoryTestCase
+from tests.notify_archive_test import NotificationArchiveTestCase
+from tests.notify_subscriptions_test import SubscriptionsTestCase
+from tests.cache_test import TTLCacheTestCase, CachedLookupTestCase
+from tests.coalesce_test import AlarmCoalescerTestCase, CoalescedAlarmTestCase
 
 if __name__ == '__main__':
     suite = unittest.TestSuite()
     suite.addTests(unittest.TestLoader().loadTestsFromTestCase(PingTestCase))
     suite.addTests(unittest.TestLoader().loadTestsFromTestCase(APIKeyCheckTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(QueryPlanTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(QueryBudgetTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(APIQueryBudgetTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(NotifyBusTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SocketTokenTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(NotifyWidgetTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(RecentNotificationsTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(NotificationWriterTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(NotifyUserTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(AlarmStreamTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(DeliveryQueueTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(DispatcherTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(EmergencyAlarmTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(EmergencyRateLimitTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(EmergencyGroupCommitTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(RateLimiterTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SpaceAdminTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(OutboxTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(AlarmStatsTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(AlarmHistoryTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(NotificationArchiveTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SubscriptionsTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(TTLCacheTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(CachedLookupTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(AlarmCoalescerTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(CoalescedAlarmTestCase))
 
     runner = unittest.TextTestRunner(verbosity=2)
     runner.run(suite)
@@ -0,0 +1,70 @@
+import base64
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from api_app import APITestCase, api  # noqa: E402
+
+
+class AlarmHistoryTestCase(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = datetime.utcnow().replace(microsecond=0)
+        # 1 and 2 are archived, 3-5 share a timestamp, 7 belongs to the other space
+        alarms = [(1, 400, 0), (2, 400, 2), (3, 1, 1), (4, 1, 2), (5, 1, 0), (6, 0, 2)]
+        with self.app.app_context():
+            api.db.session.add_all(api.Alarm(id=alarm_id, message='Fire', position='Hall', level=level, user_id=2,
+                                             space_id=1, timestamp=self.now - timedelta(days=days, hours=1))
+                                   for alarm_id, days, level in alarms)
+            api.db.session.add(api.Alarm(id=7, message='Flood', position='Cellar', level=0, user_id=4, space_id=2,
+                                         timestamp=self.now))
+            api.db.session.commit()
+        result = self.app.test_cli_runner().invoke(args=['archive-alarms', '--days', '30'])
+        self.assertEqual(result.exit_code, 0, result.output)
+
+    def get_alarms(self, **args):
+        return self.client.get('/api/v1/spaces/1/alarms', headers={'API-Key': 'ALPHA'}, query_string=args)
+
+    def pages(self, **args):
+        pages, cursor = [], None
+        while True:
+            response = self.get_alarms(**dict(args, cursor=cursor) if cursor else args)
+            self.assertEqual(response.status_code, 200)
+            pages.append([alarm['id'] for alarm in response.json['alarms']])
+            cursor = response.json['next_cursor']
+            if cursor is None:
+                return pages
+
+    def test_cursor_pages_through_table_and_archive(self):
+        self.assertEqual(self.pages(limit=2, include_archive=1), [[6, 5], [4, 3], [2, 1]])
+        self.assertEqual(self.pages(limit=4), [[6, 5, 4, 3]])
+
+    def test_equal_timestamps_are_split_by_id(self):
+        self.assertEqual(self.pages(limit=1, since=(self.now - timedelta(days=2)).isoformat()),
+                         [[6], [5], [4], [3]])
+
+    def test_filters(self):
+        two_days_ago = (self.now - timedelta(days=2)).isoformat()
+        self.assertEqual(self.pages(level=2, include_archive=1), [[6, 4, 2]])
+        self.assertEqual(self.pages(since=two_days_ago, include_archive=1), [[6, 5, 4, 3]])
+        self.assertEqual(self.pages(until=two_days_ago, include_archive=1), [[2, 1]])
+        self.assertEqual(self.pages(until=two_days_ago), [[]])
+        self.assertEqual(self.pages(since=two_days_ago, level=0, limit=1), [[5]])
+
+    def test_invalid_parameters(self):
+        bad_cursor = base64.urlsafe_b64encode(b'yesterday|1').decode()
+        for args in ({'cursor': 'not a cursor'}, {'cursor': bad_cursor}, {'limit': 'x'}, {'limit': 0},
+                     {'level': 'high'}, {'since': 'yesterday'}):
+            with self.subTest(args=args):
+                self.assertEqual(self.get_alarms(**args).status_code, 400)
+
+    def test_other_space_is_refused(self):
+        response = self.client.get('/api/v1/spaces/2/alarms', headers={'API-Key': 'ALPHA'})
+        self.assertEqual(response.status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from api_app import APITestCase, api  # noqa: E402
+
+
+class AlarmStatsTestCase(APITestCase):
+    def setUp(self):
+        super().setUp()
+        now = datetime.utcnow()
+        with self.app.app_context():
+            api.db.session.add_all([
+                api.Alarm(id=1, message='Fire', position='Hall', level=2, user_id=2, space_id=1,
+                          timestamp=now - timedelta(days=400)),
+                api.Alarm(id=2, message='Fire', position='Hall', level=1, user_id=2, space_id=1,
+                          timestamp=now - timedelta(days=1)),
+                api.Alarm(id=3, message='Flood', position='Cellar', level=0, user_id=4, space_id=2,
+                          timestamp=now - timedelta(days=500)),
+            ])
+            api.db.session.commit()
+        self.runner = self.app.test_cli_runner()
+        self.assertEqual(self.runner.invoke(args=['archive-alarms', '--days', '30']).exit_code, 0)
+
+    def user_counts(self):
+        with self.app.app_context():
+            return {(row.space_id, row.user_id): row.count for row in api.UserAlarmStat.query.all()}
+
+    def test_rebuild_counts_archived_alarms(self):
+        result = self.runner.invoke(args=['rebuild-alarm-stats'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(self.user_counts(), {(1, 2): 2, (2, 4): 1})
+        with self.app.app_context():
+            self.assertEqual(sum(row.count for row in api.AlarmHourlyStat.query.all()), 3)
+
+    def test_rebuild_one_space(self):
+        self.runner.invoke(args=['rebuild-alarm-stats'])
+        result = self.runner.invoke(args=['rebuild-alarm-stats', '--space-id', '1'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(self.user_counts(), {(1, 2): 2, (2, 4): 1})
+
+    def test_alarm_left_in_table_after_archiving_counts_once(self):
+        with self.app.app_context():
+            api.db.session.add(api.Alarm(id=1, message='Fire', position='Hall', level=2, user_id=2, space_id=1,
+                                         timestamp=datetime.utcnow() - timedelta(days=400)))
+            api.db.session.commit()
+        self.runner.invoke(args=['rebuild-alarm-stats'])
+        self.assertEqual(self.user_counts()[(1, 2)], 2)
+
+    def test_archived_alarm_ids_are_not_reused(self):
+        self.assertEqual(self.runner.invoke(args=['archive-alarms', '--days', '0']).exit_code, 0)
+        response = self.client.post('/api/v1/emergency', json={
+            'api_key': 'ALPHA', 'position': 'Hall', 'message': 'Fire', 'level': 2, 'user_id': 2})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json['alarm_id'], 4)
+        self.runner.invoke(args=['rebuild-alarm-stats'])
+        self.assertEqual(self.user_counts()[(1, 2)], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from api_app import APITestCase  # noqa: E402
+
+
+class AlarmStreamTestCase(APITestCase):
+    def raise_alarm(self, position):
+        response = self.client.post('/api/v1/emergency', json={
+            'api_key': 'ALPHA', 'position': position, 'message': 'Fire', 'level': 1, 'user_id': 2})
+        self.assertEqual(response.status_code, 201)
+        return response.json['alarm_id']
+
+    def open_stream(self, **headers):
+        response = self.client.get('/api/v1/spaces/1/alarms/stream', headers=dict(headers, **{'API-Key': 'ALPHA'}),
+                                   buffered=False)
+        self.assertEqual(response.status_code, 200)
+        self.addCleanup(response.close)
+        return iter(response.response)
+
+    def read_event(self, frames):
+        fields = dict(line.split(': ', 1) for line in next(frames).decode().strip().split('\n'))
+        return fields['event'], int(fields['id']), json.loads(fields['data'])
+
+    def test_live_alarm(self):
+        frames = self.open_stream()
+        self.assertEqual(next(frames), b'retry: 3000\n\n')
+
+        alarm_id = self.raise_alarm('Hall')
+        event, event_id, data = self.read_event(frames)
+        self.assertEqual((event, event_id, data['position']), ('alarm', alarm_id, 'Hall'))
+
+    def test_last_event_id_replays_missed_alarms(self):
+        first = self.raise_alarm('Hall')
+        second = self.raise_alarm('Kitchen')
+
+        frames = self.open_stream(**{'Last-Event-ID': str(first)})
+        self.assertEqual(next(frames), b'retry: 3000\n\n')
+        event, event_id, data = self.read_event(frames)
+        self.assertEqual((event, event_id, data['position']), ('alarm', second, 'Kitchen'))
+
+    def test_other_space_key_is_refused(self):
+        response = self.client.get('/api/v1/spaces/1/alarms/stream', headers={'API-Key': 'BETA'})
+        self.assertEqual(response.status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import tempfile
+import unittest
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, os.path.join(root_dir, 'api'))
+
+import app as api  # noqa: E402
+
+# Nothing listens on the discard port, so calls to the notification service fail fast
+NOTIFICATION_SERVICE = 'http://127.0.0.1:9'
+
+
+def api_settings(directory, overrides=None):
+    """api/config.ini with the database and archive moved into ``directory``."""
+    settings = api.load_config()
+    settings['DATABASE']['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(directory, "api.db")}'
+    settings['RETENTION']['directory'] = os.path.join(directory, 'archive')
+    settings['NOTIFICATION_SERVICE']['url'] = f'{NOTIFICATION_SERVICE}/notify'
+    settings['NOTIFICATION_SERVICE']['subscriptions_url'] = f'{NOTIFICATION_SERVICE}/subscriptions'
+    for section, values in (overrides or {}).items():
+        if not settings.has_section(section):
+            settings.add_section(section)
+        settings[section].update({key: str(value) for key, value in values.items()})
+    return settings
+
+
+class APITestCase(unittest.TestCase):
+    """Runs the API on a temporary database with two spaces.
+
+    Space 1 (API key ALPHA) has admin 1 and alarmed user 2, space 2 (BETA)
+    has admin 3 and normal user 4. ``settings`` overrides config.ini.
+    """
+
+    settings = None
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = api.create_app(api_settings(self.directory.name, self.settings))
+        self.app.testing = True
+        # The outbox stays undelivered, tests read it instead of running send workers
+        self.app.extensions['alarm_system'].dispatcher.start = lambda: None
+        with self.app.app_context():
+            api.db.create_all()
+            api.db.session.add_all([api.Space(id=1, name='Alpha', api_key='ALPHA'),
+                                    api.Space(id=2, name='Beta', api_key='BETA')])
+            api.db.session.add_all([
+                api.User(id=1, prename='Ada', name='Admin', username='ada', email='ada@alpha', role='space_admin',
+                         space_id=1),
+                api.User(id=2, prename='Al', name='Alarmed', username='al', email='al@alpha', role='alarmed',
+                         space_id=1),
+                api.User(id=3, prename='Bea', name='Admin', username='bea', email='bea@beta', role='space_admin',
+                         space_id=2),
+                api.User(id=4, prename='Bo', name='Normal', username='bo', email='bo@beta', role='normal',
+                         space_id=2),
+            ])
+            api.db.session.commit()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            api.db.engine.dispose()
+        self.directory.cleanup()
+
+    def admin_headers(self, space):
+        return {1: {'API-Key': 'ALPHA', 'User-ID': '1'}, 2: {'API-Key': 'BETA', 'User-ID': '3'}}[space]
@@ -0,0 +1,70 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from api_app import APITestCase  # noqa: E402
+from cache import MISSING, TTLCache  # noqa: E402
+
+
+class TTLCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        patcher = mock.patch('cache.time.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_entries_expire_after_ttl(self):
+        cache = TTLCache(ttl=10)
+        cache.set('a', 1)
+        self.now += 9
+        self.assertEqual(cache.get('a'), 1)
+        self.now += 1
+        self.assertIs(cache.get('a'), MISSING)
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TTLCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIs(cache.get('b'), MISSING)
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_none_is_cached(self):
+        cache = TTLCache()
+        loads = []
+        for _ in range(3):
+            self.assertIsNone(cache.get_or_load('missing', lambda: loads.append(1)))
+        self.assertEqual(len(loads), 1)
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (2, 1))
+
+    def test_invalidate_and_clear(self):
+        cache = TTLCache()
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.invalidate('a')
+        cache.invalidate('unknown')
+        self.assertIs(cache.get('a'), MISSING)
+        cache.clear()
+        self.assertIs(cache.get('b'), MISSING)
+
+
+class CachedLookupTestCase(APITestCase):
+    def raise_alarm(self, user_id):
+        return self.client.post('/api/v1/emergency', json={
+            'api_key': 'BETA', 'position': 'Hall', 'message': 'Fire', 'level': 2, 'user_id': user_id})
+
+    def test_removed_user_is_not_served_from_the_role_cache(self):
+        self.assertEqual(self.raise_alarm(4).status_code, 201)
+        response = self.client.delete('/api/v1/spaces/2/users/4', headers=self.admin_headers(2))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.raise_alarm(4).status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from api_app import APITestCase, api  # noqa: E402
+from coalesce import AlarmCoalescer  # noqa: E402
+
+
+class AlarmCoalescerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        patcher = mock.patch('coalesce.time.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeat_within_window_matches(self):
+        coalescer = AlarmCoalescer(window=30)
+        coalescer.remember((1, 2, 'Hall', 2), 7)
+        self.now += 29
+        self.assertEqual(coalescer.match((1, 2, 'Hall', 2)), 7)
+        self.assertIsNone(coalescer.match((1, 2, 'Hall', 1)))
+        self.now += 1
+        self.assertIsNone(coalescer.match((1, 2, 'Hall', 2)))
+        self.assertEqual(coalescer.stats()['merged'], 1)
+
+    def test_expired_entries_are_pruned(self):
+        coalescer = AlarmCoalescer(window=30)
+        coalescer.remember('a', 1)
+        self.now += 31
+        coalescer.remember('b', 2)
+        self.assertEqual(coalescer.stats()['tracked'], 1)
+
+    def test_zero_window_disables_coalescing(self):
+        coalescer = AlarmCoalescer(window=0)
+        coalescer.remember('a', 1)
+        self.assertIsNone(coalescer.match('a'))
+        self.assertEqual(coalescer.stats()['tracked'], 0)
+
+
+class CoalescedAlarmTestCase(APITestCase):
+    def raise_alarm(self, position='Hall', level=2):
+        return self.client.post('/api/v1/emergency', json={
+            'api_key': 'ALPHA', 'position': position, 'message': 'Fire', 'level': level, 'user_id': 2})
+
+    def test_repeated_alarm_is_merged(self):
+        first = self.raise_alarm()
+        self.assertEqual(first.status_code, 201)
+        repeat = self.raise_alarm()
+        self.assertEqual((repeat.status_code, repeat.json['alarm_id'], repeat.json['coalesced']),
+                         (200, first.json['alarm_id'], True))
+        self.assertEqual(self.raise_alarm(position='Kitchen').status_code, 201)
+        self.assertEqual(self.raise_alarm(level=1).status_code, 201)
+
+        with self.app.app_context():
+            alarm = api.db.session.get(api.Alarm, first.json['alarm_id'])
+            self.assertEqual(alarm.repeat_count, 1)
+            # Only the original alarm is notified
+            self.assertEqual(api.NotificationOutbox.query.count(), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
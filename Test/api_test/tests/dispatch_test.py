@@ -0,0 +1,131 @@
+import os
+import sys
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, os.path.join(root_dir, 'api'))
+sys.path.insert(0, root_dir)
+
+from dispatch import DeliveryQueue, NotificationDispatcher  # noqa: E402
+
+
+def row(row_id, level, age=0, attempts=0):
+    # Deadlines as the outbox sets them with starvation_after = 5
+    created_at = datetime.utcnow() - timedelta(seconds=age)
+    deliver_by = created_at + timedelta(seconds=(2 - level if isinstance(level, int) else 0) * 5)
+    return SimpleNamespace(id=row_id, space_id=1, message=f'Alarm {row_id}', attempts=attempts, level=level,
+                           created_at=created_at, deliver_by=deliver_by)
+
+
+class DeliveryQueueTestCase(unittest.TestCase):
+    def test_earliest_deadline_first(self):
+        queue = DeliveryQueue()
+        # Info waiting 12 s is past its deadline, warning waiting 1 s is not, critical is due at once
+        queue.put([row(1, 0, age=12), row(2, 1, age=1), row(3, 2), row(4, 0, age=2)])
+        self.assertEqual([item.id for item in queue.take(10)], [1, 3, 2, 4])
+
+    def test_waits_are_measured_from_the_outbox_row(self):
+        queue = DeliveryQueue()
+        queue.put([row(1, 0, age=30), row(2, 2)])
+        queue.take(10)
+        stats = queue.stats()
+        self.assertGreaterEqual(stats[0]['wait_max'], 30)
+        self.assertLess(stats[2]['wait_max'], 5)
+        self.assertEqual([stats[level]['depth'] for level in range(3)], [0, 0, 0])
+
+
+class DispatcherTestCase(unittest.TestCase):
+    def dispatcher(self, claim, complete, **options):
+        return NotificationDispatcher('http://127.0.0.1:9/notify', claim, complete, **options)
+
+    def test_bad_row_does_not_stop_the_drain(self):
+        batches = [[row(1, 'high'), row(2, 1)], [row(3, 2)]]
+        completed = []
+        dispatcher = self.dispatcher(lambda limit: batches.pop(0) if batches else [],
+                                     lambda delivered, failed: completed.append((delivered, failed)),
+                                     workers=1, poll_interval=0.05)
+        drain = threading.Thread(target=dispatcher._drain, daemon=True)
+        drain.start()
+
+        deadline = time.monotonic() + 5
+        while len(dispatcher.queue) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(drain.is_alive())
+        self.assertEqual([item.id for item in dispatcher.queue.take(10)], [3, 2])
+        (delivered, failed), = completed
+        self.assertEqual((delivered, [(outbox_id, error) for outbox_id, error, _ in failed]),
+                         ([], [(1, 'Not queued: ValueError')]))
+
+    def test_retry_delay_doubles_up_to_the_maximum(self):
+        dispatcher = self.dispatcher(None, None, retry_base=2, retry_max=60)
+        self.assertEqual([dispatcher.retry_delay(attempts) for attempts in range(7)], [2, 4, 8, 16, 32, 60, 60])
+
+    def send(self, batch, status_code=201, body=None):
+        # One _send with the notification service answering status_code and body
+        completed, posted = [], []
+        dispatcher = self.dispatcher(None, lambda delivered, failed: completed.append((delivered, failed)),
+                                     retry_base=2)
+        response = SimpleNamespace(status_code=status_code, json=lambda: body)
+        dispatcher.session = SimpleNamespace(post=lambda url, json, timeout: posted.append(json) or response)
+        dispatcher._send(batch)
+        return posted, completed
+
+    def test_delivered_batch_is_completed_with_recipients(self):
+        results = [{'recipients': [3, 4]}, {'recipients': []}]
+        posted, completed = self.send([row(1, 2), row(2, 0)], body={'results': results})
+        self.assertEqual(posted, [{'notifications': [{'space_id': 1, 'message': 'Alarm 1'},
+                                                     {'space_id': 1, 'message': 'Alarm 2'}]}])
+        self.assertEqual(completed, [([(1, [3, 4]), (2, [])], [])])
+
+    def test_failed_batch_is_retried_with_backoff(self):
+        before = datetime.utcnow()
+        _, completed = self.send([row(1, 2), row(2, 0, attempts=3)], status_code=503)
+        (delivered, failed), = completed
+        self.assertEqual(delivered, [])
+        self.assertEqual([(outbox_id, error) for outbox_id, error, _ in failed], [(1, 'HTTP 503'), (2, 'HTTP 503')])
+        delays = [(next_attempt_at - before).total_seconds() for _, _, next_attempt_at in failed]
+        self.assertAlmostEqual(delays[0], 2, delta=1)
+        self.assertAlmostEqual(delays[1], 16, delta=1)
+
+    def test_unreachable_service_fails_the_batch(self):
+        completed = []
+        dispatcher = self.dispatcher(None, lambda delivered, failed: completed.append((delivered, failed)),
+                                     timeout=1)
+        dispatcher._send([row(1, 2)])
+        (delivered, failed), = completed
+        self.assertEqual((delivered, [(outbox_id, error) for outbox_id, error, _ in failed]),
+                         ([], [(1, 'ConnectionError')]))
+
+    def test_claimed_rows_are_sent_and_completed(self):
+        batches = [[row(1, 0), row(2, 2)]]
+        completed = threading.Event()
+        results = []
+
+        def complete(delivered, failed):
+            results.append((delivered, failed))
+            completed.set()
+
+        dispatcher = self.dispatcher(lambda limit: batches.pop(0) if batches else [], complete, workers=1,
+                                     poll_interval=0.05)
+        response = SimpleNamespace(status_code=201, json=lambda: {'results': [{'recipients': [1]}] * 2})
+        dispatcher.session = SimpleNamespace(post=lambda url, json, timeout: response)
+        dispatcher.wake()
+
+        self.assertTrue(completed.wait(5))
+        # The critical row is due first, so it leads the batch
+        self.assertEqual(results, [([(2, [1]), (1, [1])], [])])
+        self.assertEqual(dispatcher.stats()['levels'][2]['taken'], 1)
+
+    def test_put_is_all_or_nothing(self):
+        queue = DeliveryQueue()
+        with self.assertRaises(ValueError):
+            queue.put([row(1, 1), row(2, 'high')])
+        self.assertEqual(len(queue), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from api_app import APITestCase, api  # noqa: E402
+
+
+class EmergencyAlarmTestCase(APITestCase):
+    def raise_alarm(self, level, position='Hall'):
+        return self.client.post('/api/v1/emergency', json={
+            'api_key': 'ALPHA', 'position': position, 'message': 'Fire', 'level': level, 'user_id': 2})
+
+    def test_level_must_be_a_known_integer(self):
+        for level in ('high', 3, -1, 1.5, True, [2]):
+            with self.subTest(level=level):
+                self.assertEqual(self.raise_alarm(level).status_code, 400)
+        with self.app.app_context():
+            self.assertEqual(api.NotificationOutbox.query.count(), 0)
+
+    def test_alarm_is_queued_with_its_level(self):
+        for level in (2, '2'):
+            with self.subTest(level=level):
+                response = self.raise_alarm(level, position=f'Hall {level!r}')
+                self.assertEqual(response.status_code, 201)
+                with self.app.app_context():
+                    outbox = api.NotificationOutbox.query.filter_by(alarm_id=response.json['alarm_id']).one()
+                    self.assertEqual(outbox.level, 2)
+
+
+class EmergencyRateLimitTestCase(APITestCase):
+    settings = {'RATE_LIMIT': {'user_rate': 0.001, 'user_burst': 1}}
+
+    def raise_alarm(self, level, position):
+        return self.client.post('/api/v1/emergency', json={
+            'api_key': 'ALPHA', 'position': position, 'message': 'Fire', 'level': level, 'user_id': 2})
+
+    def test_critical_alarms_skip_the_user_bucket(self):
+        self.assertEqual(self.raise_alarm(1, 'Hall').status_code, 201)
+        self.assertEqual(self.raise_alarm(1, 'Kitchen').status_code, 429)
+        for level in (2, '2'):
+            with self.subTest(level=level):
+                self.assertEqual(self.raise_alarm(level, f'Hall {level!r}').status_code, 201)
+
+    def test_repeated_presses_do_not_use_up_the_bucket(self):
+        first = self.raise_alarm(1, 'Hall')
+        for _ in range(3):
+            repeat = self.raise_alarm(1, 'Hall')
+            self.assertEqual((repeat.status_code, repeat.json['alarm_id']), (200, first.json['alarm_id']))
+        self.assertEqual(self.raise_alarm(1, 'Kitchen').status_code, 429)
+
+
+class EmergencyGroupCommitTestCase(APITestCase):
+    settings = {'DATABASE': {'group_commit': True, 'group_commit_timeout': 0.05}}
+
+    def setUp(self):
+        super().setUp()
+        self.writer = self.app.extensions['alarm_system'].alarm_writer
+
+    def tearDown(self):
+        self.writer.close()
+        super().tearDown()
+
+    def raise_alarm(self):
+        return self.client.post('/api/v1/emergency', json={
+            'api_key': 'ALPHA', 'position': 'Hall', 'message': 'Fire', 'level': 2, 'user_id': 2})
+
+    def test_alarm_committed_after_the_timeout_is_announced(self):
+        release = threading.Event()
+        write_batch = self.writer.write_batch
+        self.writer.write_batch = lambda alarms: release.wait(5) and write_batch(alarms)
+
+        self.assertEqual(self.raise_alarm().status_code, 202)
+        release.set()
+        self.writer.close()
+
+        repeat = self.raise_alarm()
+        self.assertEqual((repeat.status_code, repeat.json['coalesced']), (200, True))
+        with self.app.app_context():
+            self.assertEqual(api.NotificationOutbox.query.filter_by(alarm_id=repeat.json['alarm_id']).count(), 1)
+
+    def test_failed_write(self):
+        def write_batch(alarms):
+            raise RuntimeError('disk full')
+
+        self.writer.write_batch = write_batch
+        self.assertEqual(self.raise_alarm().status_code, 503)
+
+
+if __name__ == '__main__':
+    unittest.main()
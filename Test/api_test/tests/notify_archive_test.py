@@ -0,0 +1,79 @@
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, os.path.join(root_dir, 'notifySys'))
+
+import notify  # noqa: E402
+from common.archive import SegmentArchive  # noqa: E402
+
+
+class NotificationArchiveTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.app = notify.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+        self.archive = self.app.extensions['notification_archive'] = SegmentArchive(directory.name, key='user_id')
+        # Notifications 1-4 in January, 5-8 in April, 9-11 one a month after that and 12 today
+        timestamps = [datetime(2025, 1, 10)] * 4 + [datetime(2025, 4, 10)] * 4
+        timestamps += [datetime(2025, month, 10) for month in (5, 6, 7)] + [datetime.utcnow()]
+        with self.app.app_context():
+            notify.db.create_all()
+            notify.db.session.add(notify.User(id=1, username='user', email='user@test'))
+            notify.db.session.add(notify.Subscription(space_id=1, user_id=1))
+            notify.db.session.add_all(notify.Notification(id=i, message=f'test {i}', user_id=1, timestamp=timestamp,
+                                                          space_id=1 if i % 2 else 2)
+                                      for i, timestamp in enumerate(timestamps, 1))
+            notify.db.session.commit()
+        # Older than 60 days, so 1-11 are archived
+        result = self.app.test_cli_runner().invoke(args=['archive-notifications', '--days', '60'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.client = self.app.test_client()
+
+    def notification_ids(self, **args):
+        response = self.client.get('/users/1/notifications', query_string=dict(args, include_archive=1))
+        self.assertEqual(response.status_code, 200)
+        return [n['id'] for n in response.json]
+
+    def test_archived_notifications_of_left_spaces_are_kept(self):
+        self.assertEqual(self.notification_ids(), list(range(1, 13)))
+
+    def test_since_id_and_limit_skip_segments(self):
+        with mock.patch.object(self.archive, 'read', wraps=self.archive.read) as read:
+            self.assertEqual(self.notification_ids(since_id=4, limit=3), [5, 6, 7])
+        self.assertEqual(len(read.call_args_list), 1)
+
+    def test_segments_without_id_range_are_read(self):
+        for month in self.archive.months(1):
+            os.remove(self.archive.segment_path(1, month) + '.ids')
+        self.assertEqual(self.notification_ids(since_id=4, limit=3), [5, 6, 7])
+
+    def test_id_range_follows_appends(self):
+        month = self.archive.months(1)[0]
+        self.assertEqual(self.archive.id_range(1, month), (1, 4))
+        self.archive.append([{'id': 20, 'user_id': 1, 'message': 'late', 'space_id': None,
+                              'timestamp': datetime.strptime(month, '%Y-%m')}])
+        self.assertEqual(self.archive.id_range(1, month), (1, 20))
+        self.assertEqual(self.archive.max_id(), 20)
+
+    def test_max_id_without_high_water_mark(self):
+        os.remove(os.path.join(self.archive.directory, 'max_id'))
+        self.assertEqual(self.archive.max_id(), 11)
+        os.remove(self.archive.segment_path(1, self.archive.months(1)[-1]) + '.ids')
+        self.assertEqual(self.archive.max_id(), 11)
+
+    def test_archived_ids_are_not_handed_out_again(self):
+        with self.app.app_context():
+            notify.Notification.query.filter_by(id=12).delete()
+            notify.db.session.commit()
+        ids = self.app.extensions['notification_ids']
+        ids.configure(stride=1, offset=0)
+        self.assertEqual(ids.take(), [12])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, os.path.join(root_dir, 'notifySys'))
+
+from notify_bus import BusHub, LocalBusManager, MemoryBusManager, queue_options  # noqa: E402
+
+
+def next_message(manager):
+    received = []
+    listener = threading.Thread(target=lambda: received.append(next(manager._listen())), daemon=True)
+    listener.start()
+    return listener, received
+
+
+class NotifyBusTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.url = f'local://{os.path.join(self.directory.name, "bus.sock")}'
+        self.hub = BusHub(self.url)
+        self.hub.start()
+
+    def tearDown(self):
+        self.hub.close()
+        self.directory.cleanup()
+
+    def wait_for_subscribers(self, count):
+        deadline = time.monotonic() + 5
+        while len(self.hub.subscribers) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_published_message_reaches_other_managers(self):
+        publisher, subscribers = LocalBusManager(self.url), [LocalBusManager(self.url) for _ in range(2)]
+        listeners = [next_message(subscriber) for subscriber in subscribers]
+        self.wait_for_subscribers(2)
+
+        publisher._publish({'method': 'emit', 'event': 'notification', 'data': [{'user_id': 1}],
+                            'host_id': publisher.host_id})
+
+        for listener, received in listeners:
+            listener.join(5)
+            self.assertEqual(received, [{'method': 'emit', 'event': 'notification', 'data': [{'user_id': 1}],
+                                         'host_id': publisher.host_id}])
+
+    def test_publish_without_hub_does_not_raise(self):
+        manager = LocalBusManager(f'local://{os.path.join(self.directory.name, "missing.sock")}')
+        with self.assertLogs(level='ERROR'):
+            manager._publish({'method': 'emit'})
+
+    def test_memory_bus(self):
+        publisher, subscriber = MemoryBusManager('memory://test'), MemoryBusManager('memory://test')
+        listener, received = next_message(subscriber)
+        while not subscriber.subscribers:
+            time.sleep(0.01)
+
+        publisher._publish({'method': 'emit', 'event': 'notification'})
+        listener.join(5)
+        self.assertEqual(received, [{'method': 'emit', 'event': 'notification'}])
+
+    def test_queue_options(self):
+        self.assertEqual(queue_options(None), {'message_queue': None, 'client_manager': None})
+        self.assertIsInstance(queue_options(self.url)['client_manager'], LocalBusManager)
+        self.assertEqual(queue_options('redis://localhost:6379/0'), {'message_queue': 'redis://localhost:6379/0'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import sys
+import unittest
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, os.path.join(root_dir, 'notifySys'))
+
+from notify_cache import RecentNotifications  # noqa: E402
+
+
+def notification(notification_id):
+    return {"id": notification_id, "message": str(notification_id), "timestamp": None}
+
+
+def ids(result):
+    return [n['id'] for n in result[0]]
+
+
+class RecentNotificationsTestCase(unittest.TestCase):
+    def test_writes_need_a_read_before_serving(self):
+        cache = RecentNotifications(per_user=3)
+        cache.add(1, notification(10))
+        self.assertIsNone(cache.since(1, 9))
+
+        cache.load(1, 0, [notification(4), notification(7)], read_up_to=4)
+        self.assertEqual(ids(cache.since(1, 0)), [4, 7, 10])
+        self.assertEqual(cache.since(1, 0)[1], 4)
+
+    def test_ring_buffer_falls_back_for_older_ranges(self):
+        cache = RecentNotifications(per_user=3)
+        cache.load(1, 0, [notification(i) for i in range(1, 6)], read_up_to=0)
+        self.assertEqual(ids(cache.since(1, 2)), [3, 4, 5])
+        self.assertIsNone(cache.since(1, 1))
+
+        cache.add(1, notification(6))
+        self.assertEqual(ids(cache.since(1, 3, limit=2)), [4, 5])
+        self.assertIsNone(cache.since(1, 2))
+
+    def test_out_of_order_and_duplicate_writes(self):
+        cache = RecentNotifications(per_user=5)
+        cache.load(1, 0, [notification(1)], read_up_to=0)
+        for notification_id in (3, 2, 3):
+            cache.add(1, notification(notification_id))
+        self.assertEqual(ids(cache.since(1, 0)), [1, 2, 3])
+
+    def test_mark_read_only_moves_forward(self):
+        cache = RecentNotifications()
+        cache.load(1, 0, [notification(1), notification(2)], read_up_to=1)
+        cache.mark_read(1, 2)
+        cache.mark_read(1, 1)
+        self.assertEqual(cache.since(1, 0)[1], 2)
+
+    def test_evicts_least_recently_used_users(self):
+        cache = RecentNotifications(per_user=2, max_items=4)
+        for user_id in (1, 2):
+            cache.load(user_id, 0, [notification(user_id * 10), notification(user_id * 10 + 1)], read_up_to=0)
+        cache.since(1, 0)
+        cache.load(3, 0, [notification(30)], read_up_to=0)
+
+        self.assertIsNone(cache.since(2, 0))
+        self.assertEqual(ids(cache.since(1, 0)), [10, 11])
+        self.assertEqual(cache.stats()['size'], 3)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_newer_than_includes_unloaded_entries(self):
+        cache = RecentNotifications()
+        self.assertEqual(cache.newer_than(1, 0), [])
+        for notification_id in (5, 7):
+            cache.add(1, notification(notification_id))
+        self.assertEqual(cache.newer_than(1, 5), [7])
+        self.assertEqual(cache.stats()['misses'], 0)
+
+    def test_entries_expire(self):
+        cache = RecentNotifications(ttl=0)
+        cache.load(1, 0, [notification(1)], read_up_to=0)
+        self.assertIsNone(cache.since(1, 0))
+        self.assertEqual(cache.stats()['size'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import sys
+import unittest
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, os.path.join(root_dir, 'notifySys'))
+
+import notify  # noqa: E402
+
+
+class SubscriptionsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = notify.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+        self.addCleanup(self.app.extensions['notification_writer'].close)
+        with self.app.app_context():
+            notify.db.create_all()
+            # Added through /users/add before the API kept subscriptions, under an id of its own
+            notify.db.session.add(notify.User(id=1, username='legacy', email='legacy@test', read_up_to=5))
+            notify.db.session.add(notify.Notification(id=5, message='old', user_id=1))
+            notify.db.session.commit()
+        self.client = self.app.test_client()
+
+    def test_legacy_user_takes_the_api_id(self):
+        response = self.client.put('/subscriptions/bulk', json={'subscriptions': [
+            {'user_id': 7, 'space_id': 1, 'username': 'legacy', 'email': 'legacy@test', 'alarmed': True},
+            {'user_id': 8, 'space_id': 1, 'username': 'new', 'email': 'new@test', 'alarmed': True},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        with self.app.app_context():
+            self.assertEqual([(user.id, user.username, user.read_up_to) for user in notify.User.query.order_by('id')],
+                             [(7, 'legacy', 5), (8, 'new', 0)])
+            self.assertEqual(notify.db.session.get(notify.Notification, 5).user_id, 7)
+            self.assertEqual(sorted(s.user_id for s in notify.Subscription.query), [7, 8])
+
+    def test_legacy_user_is_matched_by_email(self):
+        response = self.client.put('/subscriptions/7', json={'space_id': 1, 'username': 'renamed',
+                                                             'email': 'legacy@test'})
+        self.assertEqual(response.status_code, 200)
+        with self.app.app_context():
+            self.assertEqual([(user.id, user.username) for user in notify.User.query], [(7, 'renamed')])
+
+    def test_entries_that_are_not_objects_are_refused(self):
+        requests = [
+            ('put', '/subscriptions/bulk', {'subscriptions': ['user']}),
+            ('put', '/subscriptions/bulk', ['user']),
+            ('put', '/subscriptions/7', ['user']),
+            ('post', '/notify/batch', {'notifications': [None, {'space_id': 1, 'message': 'Fire'}]}),
+            ('post', '/notify/batch', [1]),
+        ]
+        for method, path, body in requests:
+            with self.subTest(path=path, body=body):
+                self.assertEqual(getattr(self.client, method)(path, json=body).status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, os.path.join(root_dir, 'notifySys'))
+
+import notify  # noqa: E402
+from common.writer import GroupCommitWriter, IdAllocator  # noqa: E402
+
+
+class NotificationWriterTestCase(unittest.TestCase):
+    def test_close_writes_everything_accepted(self):
+        written, release = [], threading.Event()
+
+        def write_batch(items):
+            release.wait(5)
+            written.append(items)
+            return items
+
+        writer = GroupCommitWriter(write_batch, interval=0.001)
+        futures = [writer.submit(i) for i in range(50)]
+        release.set()
+        writer.close()
+
+        self.assertEqual(sorted(i for batch in written for i in batch), list(range(50)))
+        self.assertLess(len(written), 50)
+        self.assertTrue(all(future.done() for future in futures))
+        with self.assertRaises(RuntimeError):
+            writer.submit(50)
+
+    def test_failed_group_only_fails_bad_item(self):
+        def write_batch(items):
+            if 'bad' in items:
+                raise ValueError('bad item')
+            return items
+
+        writer = GroupCommitWriter(write_batch)
+        futures = [writer.submit(item) for item in ('a', 'bad', 'b')]
+        writer.close()
+
+        self.assertEqual(futures[0].result(), 'a')
+        self.assertIsInstance(futures[1].exception(), ValueError)
+        self.assertEqual(futures[2].result(), 'b')
+
+    def test_ids_of_workers_do_not_collide(self):
+        workers = [IdAllocator(lambda: 10, stride=3, offset=offset) for offset in range(3)]
+        ids = [i for worker in workers for i in worker.take(4)]
+        self.assertEqual(len(set(ids)), 12)
+        self.assertEqual(workers[0].take(), [24])
+        self.assertEqual(workers[1].take(2), [25, 28])
+
+    def test_observed_ids_keep_allocation_ahead(self):
+        ids = IdAllocator(lambda: 0, stride=2, offset=1)
+        self.assertEqual(ids.take(), [1])
+        ids.observe(10)
+        self.assertEqual(ids.take(), [11])
+        ids.observe(4)
+        self.assertEqual(ids.take(), [13])
+
+    def test_writers_of_every_app_are_closed_at_exit(self):
+        writers = [notify.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'}).extensions['notification_writer']
+                   for _ in range(2)]
+        self.assertTrue(set(writers) <= set(notify.open_writers))
+        notify.close_writers()
+        self.assertTrue(all(writer.closed for writer in writers))
+
+
+class NotifyUserTestCase(unittest.TestCase):
+    def setUp(self):
+        # A file, not sqlite://, whose one shared connection the writer thread would commit on mid-request
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.app = notify.create_app(
+            {'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory.name, 'notifications.db')})
+        self.addCleanup(self.app.extensions['notification_writer'].close)
+        with self.app.app_context():
+            notify.db.create_all()
+            notify.db.session.add(notify.User(id=1, username='user', email='user@test'))
+            notify.db.session.commit()
+        self.client = self.app.test_client()
+
+    def test_notification_is_accepted_then_written(self):
+        responses = [self.client.post('/notify/1', json={'message': f'test {i}'}) for i in range(3)]
+        self.assertEqual([response.status_code for response in responses], [202] * 3)
+        ids = [response.json['notification_id'] for response in responses]
+        self.assertEqual(ids, sorted(set(ids)))
+
+        # Served from the recent-notification cache while the rows may still be queued
+        recent = self.client.get('/users/1/notifications').json
+        self.assertEqual([n['id'] for n in recent][-3:], ids)
+
+        self.app.extensions['notification_writer'].close()
+        with self.app.app_context():
+            stored = notify.user_notifications_query(1).all()
+        self.assertEqual([(n.id, n.message) for n in stored], [(ids[i], f'test {i}') for i in range(3)])
+
+    def test_space_notifications_continue_after_queued_ids(self):
+        with self.app.app_context():
+            notify.db.session.add(notify.Subscription(space_id=1, user_id=1))
+            notify.db.session.commit()
+        accepted = self.client.post('/notify/1', json={'message': 'direct'}).json['notification_id']
+        response = self.client.post('/notify/space/1', json={'message': 'space'})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertGreater(response.json['notification_ids'][0], accepted)
+        self.app.extensions['notification_writer'].close()
+        with self.app.app_context():
+            self.assertEqual(notify.db.session.query(notify.Notification).count(), 2)
+
+    def test_space_notification_is_emitted_per_room(self):
+        with self.app.app_context():
+            notify.db.session.add(notify.User(id=2, username='other', email='other@test'))
+            notify.db.session.add_all([notify.Subscription(space_id=1, user_id=1),
+                                       notify.Subscription(space_id=1, user_id=2)])
+            notify.db.session.commit()
+        with mock.patch.object(notify.socketio, 'emit') as emit:
+            ids = self.client.post('/notify/space/1', json={'message': 'space'}).json['notification_ids']
+
+        self.assertEqual([(call.kwargs['to'], call.args[1]['user_id'], call.args[1]['id'])
+                          for call in emit.call_args_list], [('user_1', 1, ids[0]), ('user_2', 2, ids[1])])
+        self.assertTrue(all('user_ids' not in call.args[1] for call in emit.call_args_list))
+        self.assertEqual([n['id'] for n in self.client.get('/users/2/notifications').json], [ids[1]])
+
+    def test_ack_and_unread_count_see_queued_notifications(self):
+        release = threading.Event()
+        writer = self.app.extensions['notification_writer']
+        write_batch = writer.write_batch
+        writer.write_batch = lambda rows: release.wait(5) and write_batch(rows)
+
+        first, second = [self.client.post('/notify/1', json={'message': message}).json['notification_id']
+                         for message in ('first', 'second')]
+        self.assertEqual(self.client.get('/users/1/notifications/unread').json, {"read_up_to": 0, "unread": 2})
+        acked = self.client.post('/users/1/notifications/ack', json={'up_to_id': first}).json
+        self.assertEqual(acked, {"read_up_to": first, "unread": 1})
+
+        release.set()
+        writer.close()
+        self.assertEqual(self.client.get('/users/1/notifications/unread').json, {"read_up_to": first, "unread": 1})
+        self.assertEqual(self.client.post('/users/1/notifications/ack', json={'up_to_id': second + 10}).json,
+                         {"read_up_to": second, "unread": 0})
+
+    def test_unknown_user(self):
+        self.assertEqual(self.client.post('/notify/2', json={'message': 'test'}).status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from api_app import APITestCase, api  # noqa: E402
+
+
+class OutboxTestCase(APITestCase):
+    def add_rows(self, *rows):
+        # (level, seconds since the alarm) per row
+        now = datetime.utcnow()
+        with self.app.app_context():
+            for alarm_id, (level, age) in enumerate(rows, start=1):
+                created_at = now - timedelta(seconds=age)
+                api.db.session.add(api.Alarm(id=alarm_id, position='Hall', level=level, space_id=1,
+                                             timestamp=created_at))
+                api.db.session.add(api.NotificationOutbox(
+                    alarm_id=alarm_id, space_id=1, level=level, message=f'Alarm {alarm_id}', created_at=created_at,
+                    deliver_by=api.delivery_deadline(created_at, level), next_attempt_at=created_at))
+            api.db.session.commit()
+
+    def test_claim_is_earliest_deadline_first(self):
+        self.add_rows((0, 60), (2, 0), (1, 1), (0, 1), (2, 2))
+        self.assertEqual([row.id for row in api.claim_outbox(self.app, 10)], [1, 5, 2, 3, 4])
+
+    def test_new_critical_alarm_overtakes_a_backlog(self):
+        self.add_rows(*[(0, 3)] * 5, (2, 0))
+        self.assertEqual([row.id for row in api.claim_outbox(self.app, 3)], [6, 1, 2])
+
+    def outbox(self, outbox_id):
+        with self.app.app_context():
+            return api.db.session.get(api.NotificationOutbox, outbox_id)
+
+    def set_next_attempt(self, outbox_id, next_attempt_at):
+        with self.app.app_context():
+            api.NotificationOutbox.query.filter_by(id=outbox_id).update(
+                {api.NotificationOutbox.next_attempt_at: next_attempt_at})
+            api.db.session.commit()
+
+    def test_claimed_rows_are_leased_until_the_lease_expires(self):
+        self.add_rows((2, 0), (1, 0))
+        self.assertEqual([row.id for row in api.claim_outbox(self.app, 10)], [1, 2])
+        self.assertEqual(api.claim_outbox(self.app, 10), [])
+        self.assertGreater(self.outbox(1).next_attempt_at, datetime.utcnow() + timedelta(seconds=50))
+
+        # A worker that died without completing its rows loses them once the lease runs out
+        self.set_next_attempt(2, datetime.utcnow())
+        self.assertEqual([row.id for row in api.claim_outbox(self.app, 10)], [2])
+
+    def test_rows_waiting_for_a_retry_are_not_claimed(self):
+        self.add_rows((2, 0), (2, 0))
+        self.set_next_attempt(1, datetime.utcnow() + timedelta(seconds=30))
+        self.assertEqual([row.id for row in api.claim_outbox(self.app, 10)], [2])
+
+    def test_complete_records_deliveries_and_failures(self):
+        self.add_rows((2, 0), (1, 0))
+        api.claim_outbox(self.app, 10)
+        retry_at = datetime.utcnow() + timedelta(seconds=4)
+        api.complete_outbox(self.app, [(1, [2, 5, 7])], [(2, 'HTTP 500', retry_at)])
+
+        delivered, failed = self.outbox(1), self.outbox(2)
+        self.assertIsNotNone(delivered.delivered_at)
+        self.assertEqual((delivered.recipients, delivered.recipient_ids, delivered.attempts, delivered.last_error),
+                         (3, [2, 5, 7], 0, None))
+        self.assertIsNone(failed.delivered_at)
+        self.assertEqual((failed.attempts, failed.last_error, failed.next_attempt_at), (1, 'HTTP 500', retry_at))
+
+        # Delivered rows are done, the failed one comes back once its retry is due
+        self.assertEqual(api.claim_outbox(self.app, 10), [])
+        self.set_next_attempt(2, datetime.utcnow())
+        self.assertEqual([(row.id, row.attempts) for row in api.claim_outbox(self.app, 10)], [(2, 1)])
+
+    def test_delivery_lists_the_notified_users(self):
+        self.add_rows((2, 0))
+        api.complete_outbox(self.app, [(1, [2])], [])
+        response = self.client.get('/api/v1/alarms/1/delivery', headers={'API-Key': 'ALPHA'})
+        self.assertEqual((response.json['delivered'], response.json['recipients'], response.json['recipient_ids']),
+                         (True, 1, [2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import sys
+import unittest
+
+from flask import Flask, jsonify
+from sqlalchemy import create_engine, text
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, os.path.join(root_dir, 'api'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from api_app import APITestCase, api  # noqa: E402
+from profiler import QueryBudgetExceeded, SQLProfiler, statement_shape  # noqa: E402
+
+
+class QueryBudgetTestCase(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        with self.engine.begin() as connection:
+            connection.execute(text('CREATE TABLE user (id INTEGER PRIMARY KEY, space_id INTEGER)'))
+            connection.execute(text('INSERT INTO user (space_id) VALUES (1), (1), (1), (2)'))
+
+        self.app = Flask(__name__)
+        self.app.testing = True
+        self.profiler = SQLProfiler(self.app, self.engine, budget=None, n_plus_one_threshold=3)
+
+        @self.app.route('/users')
+        def users():
+            with self.engine.connect() as connection:
+                return jsonify([row.id for row in connection.execute(text('SELECT id FROM user WHERE space_id = 1'))])
+
+        @self.app.route('/users/n-plus-one')
+        def users_one_by_one():
+            with self.engine.connect() as connection:
+                ids = [row.id for row in connection.execute(text('SELECT id FROM user'))]
+                for user_id in ids:
+                    connection.execute(text('SELECT space_id FROM user WHERE id = :id'), {'id': user_id})
+            return jsonify(ids)
+
+        self.client = self.app.test_client()
+
+    def test_header_reports_query_count(self):
+        response = self.client.get('/users')
+        self.assertTrue(response.headers['X-SQL-Queries'].startswith('count=1;'))
+        self.assertNotIn('X-SQL-N-Plus-One', response.headers)
+
+    def test_repeated_statement_is_flagged(self):
+        response = self.client.get('/users/n-plus-one')
+        self.assertEqual(response.headers['X-SQL-N-Plus-One'], '1')
+        self.assertEqual(list(self.profiler.last['suspects'].values()), [4])
+
+    def test_budget_fails_request(self):
+        with self.profiler.expect_at_most(1):
+            self.client.get('/users')
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/users/n-plus-one')
+
+    def test_statement_shape_ignores_literals(self):
+        self.assertEqual(statement_shape("SELECT * FROM user WHERE id IN (?, ?, ?) AND name = 'x' LIMIT 5"),
+                         statement_shape("SELECT * FROM user WHERE id IN (?, ?) AND name = 'y' LIMIT 10"))
+
+
+class APIQueryBudgetTestCase(APITestCase):
+    settings = {'PROFILING': {'enabled': 'True'}}
+
+    def test_routes_stay_within_the_configured_budget(self):
+        profiler = self.app.extensions['alarm_system'].profiler
+        self.assertEqual(profiler.budget, api.load_config()['PROFILING'].getint('query_budget'))
+        alpha = self.admin_headers(1)
+        # Bulk rows and alarms in numbers above the budget, so per-row queries would exceed it
+        users = [{'prename': 'Bulk', 'name': f'User {i}', 'username': f'bulk{i}', 'email': f'bulk{i}@alpha',
+                  'role': 'normal'} for i in range(profiler.budget + 5)]
+
+        with profiler.expect_at_most(profiler.budget):
+            for i in range(profiler.budget + 5):
+                response = self.client.post('/api/v1/emergency', json={
+                    'api_key': 'ALPHA', 'position': f'Room {i}', 'message': 'Fire', 'level': 2, 'user_id': 2})
+                self.assertEqual(response.status_code, 201)
+            alarm_id = response.json['alarm_id']
+            requests = [
+                ('post', '/api/v1/spaces/1/users/bulk', {'json': users, 'headers': alpha}),
+                ('post', '/api/v1/spaces/1/users/add', {'json': {'prename': 'New', 'name': 'User', 'username': 'new',
+                                                                 'role': 'normal'}, 'headers': alpha}),
+                ('put', '/api/v1/spaces/1/users/2', {'json': {'role': 'alarmed'}, 'headers': alpha}),
+                ('get', '/api/v1/spaces/1/users', {'headers': alpha}),
+                ('get', '/api/v1/spaces/1/alarms', {'headers': {'API-Key': 'ALPHA'}}),
+                ('get', '/api/v1/spaces/1/alarms/stats', {'headers': alpha}),
+                ('get', f'/api/v1/alarms/{alarm_id}/delivery', {'headers': {'API-Key': 'ALPHA'}}),
+                ('post', '/api/v1/verify_user', {'json': {'api_key': 'ALPHA', 'username': 'al'}}),
+                ('post', '/api/v1/apikeycheck', {'json': {'api_key': 'ALPHA'}}),
+                ('get', '/api/v1/ping', {}),
+                ('get', '/api/v1/stats', {}),
+                ('delete', '/api/v1/spaces/1/users/2', {'headers': alpha}),
+            ]
+            for method, path, options in requests:
+                with self.subTest(method=method, path=path):
+                    response = getattr(self.client, method)(path, **options)
+                    self.assertLess(response.status_code, 300, response.json)
+                    self.assertIn('X-SQL-Queries', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
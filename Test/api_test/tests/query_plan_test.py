@@ -0,0 +1,81 @@
+import os
+import sys
+import unittest
+
+from sqlalchemy import create_engine, select, text
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, os.path.join(root_dir, 'notifySys'))
+sys.path.insert(0, os.path.join(root_dir, 'api'))
+
+import app as api  # noqa: E402
+import notify  # noqa: E402
+
+
+def query_plan(engine, statement):
+    compiled = statement.compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.connect() as connection:
+        rows = connection.execute(text(f'EXPLAIN QUERY PLAN {compiled}')).fetchall()
+    return ' | '.join(row[-1] for row in rows)
+
+
+class QueryPlanTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.api_app = api.create_app()
+        cls.notify_app = notify.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+        cls.api_engine = create_engine('sqlite://')
+        api.db.metadata.create_all(cls.api_engine)
+        cls.notify_engine = create_engine('sqlite://')
+        notify.db.metadata.create_all(cls.notify_engine)
+
+    def assertUsesIndex(self, engine, statement, index):
+        plan = query_plan(engine, statement)
+        self.assertIn(index, plan)
+        self.assertNotIn('USE TEMP B-TREE', plan)
+
+    def test_space_alarms_by_timestamp(self):
+        statement = (select(api.Alarm)
+                     .filter_by(space_id=1)
+                     .order_by(api.Alarm.timestamp.desc()))
+        self.assertUsesIndex(self.api_engine, statement, 'ix_alarm_space_id_timestamp')
+
+    def test_alarm_history_page(self):
+        with self.api_app.app_context():
+            statement = api.alarm_history_query(1, level=2, cursor=(api.datetime(2024, 1, 1), 10)).statement
+        self.assertUsesIndex(self.api_engine, statement, 'ix_alarm_space_id_timestamp')
+
+    def test_space_users(self):
+        statement = select(api.User).filter_by(space_id=1)
+        self.assertUsesIndex(self.api_engine, statement, 'ix_user_space_id_role')
+
+    def test_alarmed_users(self):
+        statement = select(api.User.id).filter_by(space_id=1, role='alarmed')
+        self.assertUsesIndex(self.api_engine, statement, 'ix_user_space_id_role')
+
+    def test_top_alarm_users(self):
+        statement = (select(api.UserAlarmStat)
+                     .filter_by(space_id=1)
+                     .order_by(api.UserAlarmStat.count.desc())
+                     .limit(10))
+        self.assertUsesIndex(self.api_engine, statement, 'ix_user_alarm_stat_space_id_count')
+
+    def test_user_notifications(self):
+        statement = (select(notify.Notification)
+                     .filter_by(user_id=1)
+                     .order_by(notify.Notification.id))
+        self.assertUsesIndex(self.notify_engine, statement, 'ix_notification_user_id_id')
+
+    def test_user_notifications_since_id(self):
+        with self.notify_app.app_context():
+            statement = notify.user_notifications_query(1, since_id=100).limit(50).statement
+        self.assertUsesIndex(self.notify_engine, statement, 'ix_notification_user_id_id')
+
+    def test_unread_count(self):
+        with self.notify_app.app_context():
+            statement = notify.unread_count_query(1, 100).statement
+        self.assertUsesIndex(self.notify_engine, statement, 'ix_notification_user_id_id')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, os.path.join(root_dir, 'api'))
+
+from ratelimit import RateLimiter  # noqa: E402
+
+
+class RateLimiterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        patcher = mock.patch('ratelimit.time.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_refill(self):
+        limiter = RateLimiter({'user': (2, 3)})
+        self.assertEqual([limiter.take(('user', 1, None)) for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(limiter.take(('user', 1, None)), 0.5)
+        self.now += 0.5
+        self.assertEqual(limiter.take(('user', 1, None)), 0)
+        self.assertEqual(limiter.stats()['limited'], {'user': 1})
+
+    def test_limited_request_takes_no_tokens(self):
+        limiter = RateLimiter({'space': (1, 5), 'user': (1, 1)})
+        self.assertEqual(limiter.take(('space', 1, 1), ('user', 2, 1)), 0)
+        self.assertGreater(limiter.take(('space', 1, 1), ('user', 2, 1)), 0)
+        # The space bucket still has the token the refused request did not use
+        self.assertEqual([limiter.take(('space', 1, 1)) for _ in range(4)], [0, 0, 0, 0])
+        self.assertGreater(limiter.take(('space', 1, 1)), 0)
+
+    def test_space_overrides(self):
+        limiter = RateLimiter({'space': (1, 1)}, overrides={2: {'space': (1, 2)}})
+        self.assertEqual(limiter.take(('space', 1, 1)), 0)
+        self.assertGreater(limiter.take(('space', 1, 1)), 0)
+        self.assertEqual([limiter.take(('space', 2, 2)) for _ in range(2)], [0, 0])
+
+    def test_disabled(self):
+        limiter = RateLimiter({'user': (0, 0)}, enabled=False)
+        self.assertEqual(limiter.take(('user', 1, None)), 0)
+
+    def test_least_recently_used_buckets_are_dropped(self):
+        limiter = RateLimiter({'user': (1, 1)}, max_buckets=2)
+        for key in (1, 2, 3):
+            limiter.take(('user', key, None))
+        self.assertEqual(limiter.stats()['buckets'], 2)
+        # Bucket 1 was dropped and starts full again
+        self.assertEqual(limiter.take(('user', 1, None)), 0)
+        self.assertGreater(limiter.take(('user', 3, None)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
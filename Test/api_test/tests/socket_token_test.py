@@ -0,0 +1,41 @@
+import os
+import sys
+import unittest
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, root_dir)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from api_app import APITestCase  # noqa: E402
+from common.socket_token import issue_token, read_token  # noqa: E402
+
+
+class SocketTokenTestCase(unittest.TestCase):
+    def test_round_trip(self):
+        self.assertEqual(read_token('secret', issue_token('secret', 42, 60)), 42)
+
+    def test_rejects_other_secret_and_tampering(self):
+        token = issue_token('secret', 42, 60)
+        self.assertIsNone(read_token('other', token))
+        self.assertIsNone(read_token('secret', '43' + token[2:]))
+        self.assertIsNone(read_token('secret', None))
+        self.assertIsNone(read_token('secret', 'not-a-token'))
+
+    def test_rejects_expired(self):
+        self.assertIsNone(read_token('secret', issue_token('secret', 42, -1)))
+
+
+class NotifyWidgetTestCase(APITestCase):
+    def test_token_from_verify_user_is_passed_to_the_widget(self):
+        token = self.client.post('/api/v1/verify_user', json={'api_key': 'ALPHA', 'username': 'al'}).json[
+            'notification_token']
+        page = self.client.get('/', query_string={'token': token}).get_data(as_text=True)
+        self.assertIn(f'var token = "{token}";', page)
+
+    def test_widget_without_token_does_not_connect(self):
+        page = self.client.get('/').get_data(as_text=True)
+        self.assertIn('var token = null;', page)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from api_app import APITestCase, api  # noqa: E402
+
+
+class SpaceAdminTestCase(APITestCase):
+    def test_export_of_own_space(self):
+        response = self.client.get('/api/v1/spaces/1/export/users', headers=self.admin_headers(1))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([json.loads(line)['username'] for line in response.get_data(as_text=True).splitlines()],
+                         ['ada', 'al'])
+
+    def test_admin_of_another_space_is_refused(self):
+        headers = self.admin_headers(1)
+        for method, path in (('get', '/api/v1/spaces/2/export/users'), ('get', '/api/v1/spaces/2/users'),
+                             ('put', '/api/v1/spaces/2/users/4'), ('delete', '/api/v1/spaces/2/users/4')):
+            with self.subTest(method=method, path=path):
+                response = getattr(self.client, method)(path, headers=headers, json={'name': 'Renamed'})
+                self.assertEqual(response.status_code, 403)
+                self.assertNotIn(b'bo@beta', response.data)
+
+    def test_bulk_add_to_another_space_is_refused(self):
+        response = self.client.post('/api/v1/spaces/2/users/bulk', headers=self.admin_headers(1),
+                                    json=[{'prename': 'Eve', 'name': 'E', 'username': 'eve', 'role': 'alarmed'}])
+        self.assertEqual(response.status_code, 403)
+
+    def test_bulk_rows_with_non_string_fields(self):
+        response = self.client.post('/api/v1/spaces/1/users/bulk', headers=self.admin_headers(1), json=[
+            {'prename': 'Eve', 'name': 'E', 'username': ['eve'], 'role': 'alarmed'},
+            {'prename': 'Fin', 'name': 'F', 'username': 'fin', 'email': {'a': 1}, 'role': 'alarmed'},
+            {'prename': 'Gus', 'name': 'G', 'username': 'gus', 'role': 'alarmed'},
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([(result['status'], result.get('error')) for result in response.json['results']],
+                         [('error', 'Fields must be strings'), ('error', 'Fields must be strings'),
+                          ('created', None)])
+
+    def test_bulk_results_carry_the_new_user_ids(self):
+        response = self.client.post('/api/v1/spaces/1/users/bulk', headers=self.admin_headers(1), json=[
+            {'prename': 'Gus', 'name': 'G', 'username': 'gus', 'role': 'alarmed'},
+            {'prename': 'Al', 'name': 'A', 'username': 'al', 'role': 'alarmed'},
+            {'prename': 'Hal', 'name': 'H', 'username': 'hal', 'email': 'hal@alpha', 'role': 'normal'},
+        ])
+        self.assertEqual(response.json['created'], 2)
+        created = {result['row']: result['user_id'] for result in response.json['results'] if 'user_id' in result}
+        with self.app.app_context():
+            self.assertEqual({row: api.db.session.get(api.User, user_id).username
+                              for row, user_id in created.items()}, {0: 'gus', 2: 'hal'})
+            self.assertEqual(api.db.session.get(api.User, created[2]).space_id, 1)
+
+    def test_sync_subscriptions_pushes_every_user(self):
+        with mock.patch.object(self.app.extensions['alarm_system'].dispatcher, 'sync_subscriptions',
+                               return_value=mock.Mock(status_code=200)) as sync:
+            result = self.app.test_cli_runner().invoke(args=['sync-subscriptions', '--batch-size', '3'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        pushed = [entry for call in sync.call_args_list for entry in call.args[1]]
+        self.assertEqual([len(call.args[1]) for call in sync.call_args_list], [3, 1])
+        self.assertEqual([(entry['user_id'], entry['space_id'], entry['alarmed']) for entry in pushed],
+                         [(1, 1, False), (2, 1, True), (3, 2, False), (4, 2, False)])
+
+    def test_sync_subscriptions_reports_failures(self):
+        with mock.patch.object(self.app.extensions['alarm_system'].dispatcher, 'sync_subscriptions',
+                               return_value=mock.Mock(status_code=500)):
+            result = self.app.test_cli_runner().invoke(args=['sync-subscriptions'])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn('Failed to sync 4 users', result.output)
+
+    def test_non_admin_is_refused(self):
+        response = self.client.get('/api/v1/spaces/1/users', headers={'API-Key': 'ALPHA', 'User-ID': '2'})
+        self.assertEqual(response.status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""Alarm insert throughput with and without WAL and group commit.
+
+Runs every mode in a fresh process against a temporary SQLite file and
+prints alarms per second for 1, 10 and 100 concurrent writers:
+
+    python group_commit_bench.py [--alarms 2000]
+"""
+import argparse
+import configparser
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+MODES = {
+    'baseline': {'wal': 'False', 'group_commit': 'False'},
+    'wal': {'wal': 'True', 'group_commit': 'False'},
+    'wal+group_commit': {'wal': 'True', 'group_commit': 'True'},
+}
+WRITERS = (1, 10, 100)
+
+
+def write_config(directory, mode):
+    config = configparser.ConfigParser()
+    config.read(os.path.join(root_dir, 'api', 'config.ini'))
+    config['DATABASE']['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(directory, "bench.db")}'
+    config['DATABASE'].update(MODES[mode])
+    config['RATE_LIMIT']['enabled'] = 'False'
+    config['ALARMS']['coalesce_window'] = '0'
+    path = os.path.join(directory, 'config.ini')
+    with open(path, 'w') as f:
+        config.write(f)
+    return path
+
+
+def run_mode(writers, alarms):
+    sys.path.insert(0, os.path.join(root_dir, 'api'))
+    import app as api
+
+    app = api.create_app()
+    # Only the write path is measured, nothing is delivered
+    app.extensions['alarm_system'].dispatcher.start = lambda: None
+
+    with app.app_context():
+        api.db.create_all()
+        space = api.Space(name='bench', api_key='BENCH')
+        api.db.session.add(space)
+        api.db.session.commit()
+        users = [api.User(prename='Bench', name=str(i), username=f'bench{i}', role='alarmed', space_id=space.id)
+                 for i in range(writers)]
+        api.db.session.add_all(users)
+        api.db.session.commit()
+        user_ids = [user.id for user in users]
+
+    per_writer = max(alarms // writers, 1)
+    errors = []
+
+    def writer(user_id):
+        client = app.test_client()
+        for i in range(per_writer):
+            response = client.post('/api/v1/emergency', json={
+                'api_key': 'BENCH', 'position': 'Bench', 'message': str(i), 'level': 1, 'user_id': user_id})
+            if response.status_code != 201:
+                errors.append(response.status_code)
+
+    threads = [threading.Thread(target=writer, args=(user_id,)) for user_id in user_ids]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "writers": writers,
+        "alarms": per_writer * writers,
+        "seconds": round(elapsed, 3),
+        "alarms_per_second": round(per_writer * writers / elapsed, 1),
+        "errors": len(errors),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--alarms', type=int, default=2000)
+    parser.add_argument('--mode', choices=MODES)
+    parser.add_argument('--writers', type=int)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.writers, args.alarms)
+        return
+
+    results = {}
+    for mode in MODES:
+        for writers in WRITERS:
+            with tempfile.TemporaryDirectory() as directory:
+                env = dict(os.environ, API_CONFIG=write_config(directory, mode))
+                output = subprocess.run(
+                    [sys.executable, __file__, '--mode', mode, '--writers', str(writers), '--alarms', str(args.alarms)],
+                    env=env, capture_output=True, text=True, check=True
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+            results.setdefault(mode, []).append(result)
+            print(f"{mode:18} writers={writers:<4} {result['alarms_per_second']:>8} alarms/s  "
+                  f"errors={result['errors']}")
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""Per-route timing and allocation benchmark for the API and notifySys.
+
+Every (app, dataset size) pair runs in a fresh process against an
+in-memory SQLite database seeded with that many users and alarms (or
+notifications), and calls each route through the Flask test client.
+Calls to the notification service are replaced with no-ops, so only the
+handler itself is measured. The SSE stream is left out because it never
+returns.
+
+    python handler_bench.py --output baseline.json
+    python handler_bench.py --compare baseline.json --threshold 0.25
+
+With --compare the run exits with status 1 when a route's median time or
+peak allocation grew by more than --threshold over the baseline.
+"""
+import argparse
+import configparser
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+SIZES = (10, 1000, 100000)
+APPS = ('api', 'notify')
+ALLOCATION_CALLS = 5
+# Differences below these are noise whatever the ratio
+MIN_DELTA_MS = 0.05
+MIN_DELTA_KB = 4
+
+
+def write_config(directory):
+    config = configparser.ConfigParser()
+    config.read(os.path.join(root_dir, 'api', 'config.ini'))
+    config['DATABASE']['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    config['DATABASE']['wal'] = 'False'
+    config['DATABASE']['group_commit'] = 'False'
+    config['RATE_LIMIT']['enabled'] = 'False'
+    config['ALARMS']['coalesce_window'] = '0'
+    path = os.path.join(directory, 'config.ini')
+    with open(path, 'w') as f:
+        config.write(f)
+    return path
+
+
+def api_cases(size):
+    sys.path.insert(0, os.path.join(root_dir, 'api'))
+    import app as api
+
+    app = api.create_app()
+    app.extensions['alarm_system'].dispatcher.start = lambda: None
+    api.sync_subscription = lambda user: True
+    api.sync_subscriptions = lambda subscriptions: True
+    api.remove_subscription = lambda user_id: True
+
+    now = datetime.utcnow()
+    with app.app_context():
+        api.db.create_all()
+        api.db.session.add(api.Space(name='bench', api_key='BENCH'))
+        api.db.session.add(api.User(prename='Bench', name='Admin', username='admin', role='space_admin', space_id=1))
+        api.db.session.commit()
+        api.db.session.execute(api.User.__table__.insert(), [
+            {"prename": "Bench", "name": str(i), "username": f'user{i}', "email": f'user{i}@bench', "role": 'alarmed',
+             "space_id": 1} for i in range(size)])
+        api.db.session.execute(api.Alarm.__table__.insert(), [
+            {"message": str(i), "timestamp": now - timedelta(minutes=i), "position": 'Bench', "level": i % 3,
+             "repeat_count": 0, "user_id": 2 + i % size, "space_id": 1} for i in range(size)])
+        api.db.session.execute(api.NotificationOutbox.__table__.insert(), [
+            {"alarm_id": i + 1, "space_id": 1, "message": str(i), "level": i % 3, "created_at": now,
+             "next_attempt_at": now, "attempts": 0, "delivered_at": now, "recipients": size} for i in range(size)])
+        api.db.session.commit()
+    app.test_cli_runner().invoke(args=['rebuild-alarm-stats'])
+
+    admin = {'API-Key': 'BENCH', 'User-ID': '1'}
+    key = {'API-Key': 'BENCH'}
+
+    def new_user(client, i):
+        return client.post('/api/v1/spaces/1/users/add', headers=admin, json={
+            'prename': 'New', 'name': str(i), 'username': f'new{i}', 'role': 'normal'})
+
+    return app, [
+        ('GET /api/v1/ping', lambda client, i: client.get('/api/v1/ping')),
+        ('POST /api/v1/apikeycheck', lambda client, i: client.post('/api/v1/apikeycheck', json={'api_key': 'BENCH'})),
+        ('GET /spaces/list', lambda client, i: client.get('/spaces/list')),
+        ('POST /api/v1/users/add', lambda client, i: client.post('/api/v1/users/add', json={
+            'api_key': 'BENCH', 'prename': 'Add', 'name': str(i), 'username': f'add{i}', 'role': 'normal'})),
+        ('POST /api/v1/spaces/<id>/users/add', new_user),
+        ('POST /api/v1/spaces/<id>/users/bulk', lambda client, i: client.post(
+            '/api/v1/spaces/1/users/bulk', headers=admin, json={'users': [
+                {'prename': 'Bulk', 'name': str(j), 'username': f'bulk{i}_{j}', 'role': 'normal'}
+                for j in range(10)]})),
+        ('GET /api/v1/spaces/<id>/users', lambda client, i: client.get('/api/v1/spaces/1/users', headers=admin)),
+        ('PUT /api/v1/spaces/<id>/users/<id>', lambda client, i: client.put(
+            f'/api/v1/spaces/1/users/{2 + i % size}', headers=admin, json={'name': f'Renamed{i}'})),
+        ('DELETE /api/v1/spaces/<id>/users/<id> (after add)', lambda client, i: client.delete(
+            f'/api/v1/spaces/1/users/{new_user(client, f"delete{i}").json["user_id"]}', headers=admin)),
+        ('POST /api/v1/emergency', lambda client, i: client.post('/api/v1/emergency', json={
+            'api_key': 'BENCH', 'position': f'Bench{i}', 'message': 'bench', 'level': i % 3, 'user_id': 2})),
+        ('GET /api/v1/spaces/<id>/alarms', lambda client, i: client.get('/api/v1/spaces/1/alarms', headers=key)),
+        ('GET /api/v1/spaces/<id>/alarms?level', lambda client, i: client.get(
+            '/api/v1/spaces/1/alarms?level=2&limit=100', headers=key)),
+        ('GET /api/v1/spaces/<id>/alarms/stats', lambda client, i: client.get(
+            '/api/v1/spaces/1/alarms/stats', headers=key)),
+        ('GET /api/v1/spaces/<id>/export/alarms', lambda client, i: client.get(
+            '/api/v1/spaces/1/export/alarms', headers=admin)),
+        ('GET /api/v1/alarms/<id>/delivery', lambda client, i: client.get(
+            f'/api/v1/alarms/{1 + i % size}/delivery', headers=key)),
+        ('POST /api/v1/verify_user', lambda client, i: client.post('/api/v1/verify_user', json={
+            'api_key': 'BENCH', 'username': f'user{i % size}'})),
+        ('GET /api/v1/stats', lambda client, i: client.get('/api/v1/stats')),
+        ('GET /metrics', lambda client, i: client.get('/metrics')),
+    ]
+
+
+def notify_cases(size):
+    sys.path.insert(0, os.path.join(root_dir, 'notifySys'))
+    import notify
+
+    app = notify.create_app()
+    now = datetime.utcnow()
+    with app.app_context():
+        notify.db.create_all()
+        notify.db.session.execute(notify.User.__table__.insert(), [
+            {"id": i + 1, "username": f'user{i}', "email": f'user{i}@bench'} for i in range(size)])
+        notify.db.session.execute(notify.Subscription.__table__.insert(), [
+            {"space_id": 1, "user_id": i + 1} for i in range(size)])
+        notify.db.session.execute(notify.Notification.__table__.insert(), [
+            {"message": str(i), "timestamp": now, "user_id": 1, "space_id": 1} for i in range(size)])
+        notify.db.session.commit()
+
+    return app, [
+        ('POST /users/add', lambda client, i: client.post('/users/add', json={
+            'username': f'add{i}', 'email': f'add{i}@bench'})),
+        ('POST /notify/<user_id>', lambda client, i: client.post(f'/notify/{1 + i % size}', json={'message': 'bench'})),
+        ('PUT /subscriptions/<user_id>', lambda client, i: client.put(f'/subscriptions/{1 + i % size}', json={
+            'space_id': 1, 'username': f'user{i % size}', 'alarmed': True})),
+        ('PUT /subscriptions/bulk', lambda client, i: client.put('/subscriptions/bulk', json={'subscriptions': [
+            {'user_id': 1 + (i + j) % size, 'space_id': 1, 'username': f'user{(i + j) % size}', 'alarmed': True}
+            for j in range(min(size, 10))]})),
+        ('DELETE /subscriptions/<user_id>', lambda client, i: client.delete(f'/subscriptions/{size + 1 + i}')),
+        ('POST /notify/space/<space_id>', lambda client, i: client.post('/notify/space/1', json={'message': 'bench'})),
+        ('POST /notify/batch', lambda client, i: client.post('/notify/batch', json={'notifications': [
+            {'space_id': 2, 'message': 'bench'} for _ in range(10)]})),
+        ('GET /users/<user_id>/notifications', lambda client, i: client.get('/users/1/notifications')),
+        ('GET /users/<user_id>/notifications?since_id', lambda client, i: client.get(
+            f'/users/1/notifications?since_id={size - 10}&limit=50')),
+        ('GET /users/<user_id>/notifications/unread', lambda client, i: client.get('/users/1/notifications/unread')),
+        ('POST /users/<user_id>/notifications/ack', lambda client, i: client.post(
+            '/users/1/notifications/ack', json={'up_to_id': i})),
+        ('GET /metrics', lambda client, i: client.get('/metrics')),
+    ]
+
+
+def measure(client, call, iterations, max_seconds):
+    call(client, -1)
+
+    timings = []
+    errors = 0
+    deadline = time.perf_counter() + max_seconds
+    for i in range(iterations):
+        start = time.perf_counter()
+        response = call(client, i)
+        # Streamed bodies are only produced when read
+        response.get_data()
+        timings.append(time.perf_counter() - start)
+        errors += response.status_code >= 400
+        if time.perf_counter() > deadline:
+            break
+
+    peaks = []
+    tracemalloc.start()
+    for i in range(min(ALLOCATION_CALLS, len(timings))):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        call(client, iterations + i).get_data()
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "calls": len(timings),
+        "errors": errors,
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(timings[min(int(len(timings) * 0.95), len(timings) - 1)] * 1000, 3),
+        "peak_kb": round(statistics.median(peaks) / 1024, 1),
+    }
+
+
+def run(app_name, size, iterations, max_seconds):
+    app, cases = api_cases(size) if app_name == 'api' else notify_cases(size)
+    client = app.test_client()
+    print(json.dumps({name: measure(client, call, iterations, max_seconds) for name, call in cases}))
+
+
+def compare(baseline, results, threshold):
+    regressions = []
+    for app_name, sizes in results.items():
+        for size, routes in sizes.items():
+            for route, current in routes.items():
+                previous = baseline.get(app_name, {}).get(size, {}).get(route)
+                if previous is None:
+                    continue
+                for metric, min_delta in (('median_ms', MIN_DELTA_MS), ('peak_kb', MIN_DELTA_KB)):
+                    if current[metric] - previous[metric] > max(previous[metric] * threshold, min_delta):
+                        regressions.append(f'{app_name} size={size} {route}: {metric} '
+                                           f'{previous[metric]} -> {current[metric]}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)))
+    parser.add_argument('--apps', default=','.join(APPS))
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--max-seconds', type=float, default=2.0, help='Time budget per route before stopping early.')
+    parser.add_argument('--output', help='Write results to this JSON file.')
+    parser.add_argument('--compare', help='Baseline JSON file to compare against.')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed relative growth before failing.')
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        app_name, size = args.run.split(':')
+        run(app_name, int(size), args.iterations, args.max_seconds)
+        return
+
+    results = {}
+    for app_name in args.apps.split(','):
+        for size in args.sizes.split(','):
+            with tempfile.TemporaryDirectory() as directory:
+                env = dict(os.environ, API_CONFIG=write_config(directory), NOTIFY_DATABASE_URI='sqlite://')
+                output = subprocess.run(
+                    [sys.executable, __file__, '--run', f'{app_name}:{size}', '--iterations', str(args.iterations),
+                     '--max-seconds', str(args.max_seconds)],
+                    env=env, cwd=directory, capture_output=True, text=True, check=True
+                ).stdout
+            routes = json.loads(output.strip().splitlines()[-1])
+            results.setdefault(app_name, {})[size] = routes
+            for route, result in routes.items():
+                print(f"{app_name:6} size={size:<7} {route:42} {result['median_ms']:>9} ms  "
+                      f"p95 {result['p95_ms']:>9} ms  {result['peak_kb']:>9} KB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"python": platform.python_version(), "results": results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(baseline, results, args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions beyond {args.threshold:.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""Connected clients and emit throughput of notifySys against its worker count.
+
+For every entry in --workers this starts notify_workers.py on a temporary
+SQLite database, connects --clients websocket clients that all join one
+space's subscriber (one user on many devices), then posts --emits space
+notifications from --senders threads. Every client has to receive every
+emit, whichever worker it and the sender landed on, so missing deliveries
+point at the message bus:
+
+    python notify_workers_bench.py --workers 1,2,4 --clients 200 --emits 500
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from simple_websocket import Client
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+notify_dir = os.path.join(root_dir, 'notifySys')
+sys.path.insert(0, root_dir)
+
+from common.socket_token import issue_token  # noqa: E402
+
+SPACE_ID = 1
+USER_ID = 1
+TOKEN_SECRET = 'bench'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class SocketIOClient:
+    """Bare Engine.IO 4 / Socket.IO 5 client over a websocket, authenticated as one user."""
+
+    def __init__(self, port, token):
+        self.received = 0
+        self.last_received_at = None
+        self.ws = Client.connect(f'ws://127.0.0.1:{port}/socket.io/?EIO=4&transport=websocket')
+        # Not waiting for the Engine.IO open packet: simple_websocket's client leaves a frame that
+        # arrives together with the handshake response unread until the next one comes in
+        self.ws.send('40/notify,' + json.dumps({"token": token}))
+        deadline = time.monotonic() + 10
+        while not (self.receive(timeout=10) or '').startswith('40/notify,'):
+            if time.monotonic() > deadline:
+                raise TimeoutError('Namespace connect not acknowledged')
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def receive(self, timeout=None):
+        packet = self.ws.receive(timeout=timeout)
+        if packet == '2':
+            self.ws.send('3')
+        return packet
+
+    def run(self):
+        try:
+            while True:
+                if self.receive().startswith('42/notify,["notification"'):
+                    self.received += 1
+                    self.last_received_at = time.perf_counter()
+        except Exception:
+            return
+
+    def close(self):
+        self.ws.close()
+
+
+def wait_until_up(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{url} exited with {process.returncode}')
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f'{url} did not start within {timeout}s')
+
+
+def connect_clients(port, count, concurrency):
+    clients, failures = [], []
+    lock = threading.Lock()
+    remaining = iter(range(count))
+    token = issue_token(TOKEN_SECRET, USER_ID, 3600)
+
+    def connect():
+        for _ in remaining:
+            try:
+                client = SocketIOClient(port, token)
+            except Exception as e:
+                with lock:
+                    failures.append(type(e).__name__)
+                continue
+            with lock:
+                clients.append(client)
+
+    threads = [threading.Thread(target=connect) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return clients, failures, time.perf_counter() - started
+
+
+def send_emits(url, count, senders):
+    statuses = {}
+    lock = threading.Lock()
+    remaining = iter(range(count))
+
+    def send():
+        session = requests.Session()
+        for seq in remaining:
+            try:
+                status = session.post(f'{url}/notify/space/{SPACE_ID}', json={'message': f'bench {seq}'},
+                                      timeout=30).status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            with lock:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    threads = [threading.Thread(target=send) for _ in range(senders)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses, started, time.perf_counter() - started
+
+
+def run(workers, args):
+    port = free_port()
+    url = f'http://127.0.0.1:{port}'
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, NOTIFY_DATABASE_URI=f'sqlite:///{os.path.join(directory, "bench.db")}',
+                   NOTIFY_TOKEN_SECRET=TOKEN_SECRET)
+        env.pop('NOTIFY_MESSAGE_QUEUE', None)
+        server = subprocess.Popen([sys.executable, 'notify_workers.py', '--workers', str(workers),
+                                   '--port', str(port)],
+                                  cwd=notify_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        clients = []
+        try:
+            wait_until_up(f'{url}/metrics', server)
+            requests.put(f'{url}/subscriptions/{USER_ID}', json={'space_id': SPACE_ID, 'username': 'bench',
+                                                                 'alarmed': True}, timeout=10)
+
+            clients, failures, connect_seconds = connect_clients(port, args.clients, args.connect_concurrency)
+            statuses, sent_at, send_seconds = send_emits(url, args.emits, args.senders)
+
+            expected = statuses.get('201', 0) * len(clients)
+            deadline = time.monotonic() + args.drain_timeout
+            while sum(c.received for c in clients) < expected and time.monotonic() < deadline:
+                time.sleep(0.1)
+            delivered = sum(c.received for c in clients)
+            last = max((c.last_received_at for c in clients if c.last_received_at), default=sent_at)
+        finally:
+            for client in clients:
+                client.close()
+            server.terminate()
+            server.wait()
+
+    return {
+        "clients": {
+            "connected": len(clients),
+            "failed": len(failures),
+            "connect_seconds": round(connect_seconds, 3),
+            "connects_per_second": round(len(clients) / connect_seconds, 1),
+        },
+        "emits": {
+            "statuses": statuses,
+            "seconds": round(send_seconds, 3),
+            "per_second": round(args.emits / send_seconds, 1),
+        },
+        "deliveries": {
+            "expected": expected,
+            "delivered": delivered,
+            "missing": expected - delivered,
+            "per_second": round(delivered / (last - sent_at), 1) if last > sent_at else None,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', default='1,2,4', help='Worker counts to compare, comma separated.')
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--connect-concurrency', type=int, default=20)
+    parser.add_argument('--emits', type=int, default=500)
+    parser.add_argument('--senders', type=int, default=8)
+    parser.add_argument('--drain-timeout', type=float, default=60.0)
+    parser.add_argument('--output', help='Write results to this JSON file.')
+    args = parser.parse_args()
+
+    results = {}
+    for workers in [int(count) for count in args.workers.split(',')]:
+        results[workers] = result = run(workers, args)
+        print(f"{workers} workers: {result['clients']['connected']}/{args.clients} clients in "
+              f"{result['clients']['connect_seconds']}s, {result['emits']['per_second']} emits/s, "
+              f"{result['deliveries']['per_second']} deliveries/s, {result['deliveries']['missing']} missing",
+              flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
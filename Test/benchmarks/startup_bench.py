@@ -0,0 +1,132 @@
+"""Cold start and preload-then-fork startup time for the API and notifySys.
+
+For each service this starts --runs fresh interpreters that import the
+module, call create_app() and serve one request through the test client,
+and reports the median of each phase plus the slowest imports from
+``python -X importtime``. It then builds the app once, forks --runs
+children and times each child's first request, which is what a worker
+started with ``gunicorn --preload`` pays:
+
+    python startup_bench.py [--runs 5] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+SERVICES = {
+    'api': ('api', 'app', '/api/v1/ping'),
+    'notify': ('notifySys', 'notify', '/metrics'),
+}
+
+COLD_START = """
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {directory!r})
+import {module} as service
+imported = time.perf_counter()
+app = service.create_app()
+created = time.perf_counter()
+assert app.test_client().get({path!r}).status_code == 200
+served = time.perf_counter()
+print(json.dumps({{"import_ms": (imported - started) * 1000, "create_app_ms": (created - imported) * 1000,
+                  "first_request_ms": (served - created) * 1000}}))
+"""
+
+PRELOAD_FORK = """
+import json, os, sys, time
+sys.path.insert(0, {directory!r})
+import {module} as service
+app = service.create_app()
+timings = []
+for _ in range({runs}):
+    read, write = os.pipe()
+    started = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        ok = app.test_client().get({path!r}).status_code == 200
+        os.write(write, str((time.perf_counter() - started) * 1000 if ok else -1).encode())
+        os._exit(0)
+    os.waitpid(pid, 0)
+    timings.append(float(os.read(read, 64)))
+print(json.dumps(timings))
+"""
+
+
+def import_times(directory, module, top):
+    # (cumulative microseconds, module) for the slowest top-level imports
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=directory, capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # One level below the service module itself
+        if name.startswith('   ') and not name.startswith('     '):
+            rows.append((int(cumulative), name.strip()))
+    return [{"module": name, "ms": round(us / 1000, 1)} for us, name in sorted(rows, reverse=True)[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8, help='Number of slowest imports to list.')
+    parser.add_argument('--output', help='Write results to this JSON file.')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        # Databases are in memory, nothing is written to the repository
+        env = dict(os.environ, NOTIFY_DATABASE_URI='sqlite://', API_CONFIG=os.path.join(directory, 'config.ini'))
+        subprocess.run([sys.executable, '-c', f"""
+import configparser
+config = configparser.ConfigParser()
+config.read({os.path.join(root_dir, 'api', 'config.ini')!r})
+config['DATABASE']['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+config.write(open({env['API_CONFIG']!r}, 'w'))
+"""], check=True)
+
+        for name, (subdir, module, path) in SERVICES.items():
+            service_dir = os.path.join(root_dir, subdir)
+            runs = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                output = subprocess.run([sys.executable, '-c', COLD_START.format(directory=service_dir, module=module,
+                                                                                 path=path)],
+                                        cwd=directory, env=env, capture_output=True, text=True, check=True).stdout
+                run = json.loads(output.strip().splitlines()[-1])
+                run["process_ms"] = (time.perf_counter() - started) * 1000
+                runs.append(run)
+
+            forked = json.loads(subprocess.run(
+                [sys.executable, '-c', PRELOAD_FORK.format(directory=service_dir, module=module, path=path,
+                                                           runs=args.runs)],
+                cwd=directory, env=env, capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1])
+
+            results[name] = {
+                "cold": {phase: round(statistics.median(run[phase] for run in runs), 1) for phase in runs[0]},
+                "forked_first_request_ms": round(statistics.median(forked), 1),
+                "slowest_imports": import_times(service_dir, module, args.top),
+            }
+            cold = results[name]["cold"]
+            print(f"{name:6} process {cold['process_ms']:>7} ms  import {cold['import_ms']:>7} ms  "
+                  f"create_app {cold['create_app_ms']:>6} ms  first request {cold['first_request_ms']:>6} ms  "
+                  f"forked worker first request {results[name]['forked_first_request_ms']:>6} ms")
+            for row in results[name]["slowest_imports"]:
+                print(f"         {row['ms']:>7} ms  {row['module']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+"""Load test for the emergency alarm path, from POST to notification delivery.
+
+Starts the notification stub (hackclub-dump/notification_server) and the
+API against a temporary SQLite database, seeds one space per entry in
+--space-sizes, fires alarms at /api/v1/emergency from --concurrency
+threads and waits for the stub to receive them. Throughput, latency
+percentiles and delivery lag are written to a JSON file meant to be diffed
+between releases:
+
+    python emergency_load.py --requests 2000 --concurrency 20 --space-sizes 5,50,500 \\
+        --stub-latency-ms 20 --stub-error-rate 0.01 --output results.json
+"""
+import argparse
+import configparser
+import itertools
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+api_dir = os.path.join(root_dir, 'api')
+stub_path = os.path.join(root_dir, 'hackclub-dump', 'notification_server', 'app.py')
+
+MESSAGE = re.compile(r'load (\d+) ([\d.]+)')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None, "mean": None}
+
+    def rank(p):
+        return round(values[min(int(len(values) * p), len(values) - 1)] * 1000, 2)
+
+    return {"p50": rank(0.50), "p95": rank(0.95), "p99": rank(0.99), "max": round(values[-1] * 1000, 2),
+            "mean": round(sum(values) / len(values) * 1000, 2)}
+
+
+def write_config(directory, args, stub_port):
+    config = configparser.ConfigParser()
+    config.read(os.path.join(api_dir, 'config.ini'))
+    config['DATABASE']['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(directory, "load.db")}'
+    config['DATABASE']['group_commit'] = str(args.group_commit)
+    config['NOTIFICATION_SERVICE']['url'] = f'http://localhost:{stub_port}/notify'
+    config['NOTIFICATION_SERVICE']['subscriptions_url'] = f'http://localhost:{stub_port}/subscriptions'
+    config['NOTIFICATION_SERVICE']['poll_interval'] = '0.1'
+    config['RATE_LIMIT']['enabled'] = str(args.rate_limit)
+    config['ALARMS']['coalesce_window'] = '0'
+    path = os.path.join(directory, 'config.ini')
+    with open(path, 'w') as f:
+        config.write(f)
+    return path
+
+
+def seed(space_sizes):
+    sys.path.insert(0, api_dir)
+    import app as api
+
+    spaces = []
+    with api.create_app().app_context():
+        api.db.create_all()
+        for index, size in enumerate(space_sizes):
+            space = api.Space(name=f'load{index}', api_key=f'LOAD{index}')
+            api.db.session.add(space)
+            api.db.session.flush()
+            users = [api.User(prename='Load', name=str(i), username=f'load{index}_{i}', role='alarmed',
+                              space_id=space.id) for i in range(size)]
+            api.db.session.add_all(users)
+            api.db.session.flush()
+            spaces.append({"space_id": space.id, "api_key": space.api_key, "user_ids": [user.id for user in users]})
+        api.db.session.commit()
+    print(json.dumps(spaces))
+
+
+def wait_until_up(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{url} exited with {process.returncode}')
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f'{url} did not start within {timeout}s')
+
+
+def drive(api_url, spaces, total, concurrency):
+    sequence = itertools.count()
+    samples = []
+    sent = {}
+    lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        while True:
+            seq = next(sequence)
+            if seq >= total:
+                return
+            space = random.choice(spaces)
+            user_id = random.choice(space["user_ids"])
+            sent_at = time.time()
+            start = time.perf_counter()
+            try:
+                status = session.post(f'{api_url}/api/v1/emergency', json={
+                    'api_key': space["api_key"], 'position': f'load-{seq}', 'message': f'load {seq} {sent_at:.6f}',
+                    'level': random.choice((0, 1, 2)), 'user_id': user_id}, timeout=30).status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            latency = time.perf_counter() - start
+            with lock:
+                samples.append((latency, status))
+                if status == 201:
+                    sent[seq] = sent_at
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, sent, time.perf_counter() - start
+
+
+def collect_deliveries(stub_url, sent, timeout):
+    # Lag is from the client sending the alarm to the stub receiving its notification
+    deadline = time.monotonic() + timeout
+    lags = {}
+    while True:
+        for delivery in requests.get(f'{stub_url}/stub/deliveries', timeout=10).json()['deliveries']:
+            match = MESSAGE.search(delivery['message'] or '')
+            if match and int(match.group(1)) in sent:
+                lags.setdefault(int(match.group(1)), delivery['received_at'] - float(match.group(2)))
+        if len(lags) >= len(sent) or time.monotonic() > deadline:
+            return lags
+        time.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--space-sizes', default='5,50,500', help='Users per seeded space, comma separated.')
+    parser.add_argument('--stub-latency-ms', type=float, default=0.0)
+    parser.add_argument('--stub-jitter-ms', type=float, default=0.0)
+    parser.add_argument('--stub-error-rate', type=float, default=0.0)
+    parser.add_argument('--group-commit', action='store_true')
+    parser.add_argument('--rate-limit', action='store_true', help='Keep the API rate limiter enabled.')
+    parser.add_argument('--drain-timeout', type=float, default=60.0)
+    parser.add_argument('--output', default='load_results.json')
+    parser.add_argument('--seed', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed([int(size) for size in args.seed.split(',')])
+        return
+
+    space_sizes = [int(size) for size in args.space_sizes.split(',')]
+    stub_port, api_port = free_port(), free_port()
+    stub_url, api_url = f'http://localhost:{stub_port}', f'http://localhost:{api_port}'
+    processes = []
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, API_CONFIG=write_config(directory, args, stub_port))
+        try:
+            stub = subprocess.Popen([sys.executable, stub_path, '--port', str(stub_port), '--quiet',
+                                     '--latency-ms', str(args.stub_latency_ms),
+                                     '--jitter-ms', str(args.stub_jitter_ms),
+                                     '--error-rate', str(args.stub_error_rate)],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            processes.append(stub)
+
+            spaces = json.loads(subprocess.run(
+                [sys.executable, __file__, '--seed', ','.join(map(str, space_sizes))],
+                env=env, capture_output=True, text=True, check=True
+            ).stdout.strip().splitlines()[-1])
+
+            api = subprocess.Popen([sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(api_port)],
+                                   cwd=api_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            processes.append(api)
+            wait_until_up(f'{stub_url}/stub/config', stub)
+            wait_until_up(f'{api_url}/api/v1/ping', api)
+
+            requests.put(f'{stub_url}/subscriptions/bulk', json={'subscriptions': [
+                {'user_id': user_id, 'space_id': space["space_id"], 'alarmed': True}
+                for space in spaces for user_id in space["user_ids"]]}, timeout=30)
+
+            samples, sent, elapsed = drive(api_url, spaces, args.requests, args.concurrency)
+            lags = collect_deliveries(stub_url, sent, args.drain_timeout)
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait()
+
+    statuses = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    results = {
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "space_sizes": space_sizes,
+            "stub_latency_ms": args.stub_latency_ms,
+            "stub_jitter_ms": args.stub_jitter_ms,
+            "stub_error_rate": args.stub_error_rate,
+            "group_commit": args.group_commit,
+            "rate_limit": args.rate_limit,
+        },
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(samples) / elapsed, 1),
+        "statuses": statuses,
+        "latency_ms": percentiles([latency for latency, _ in samples]),
+        "delivery": {
+            "created": len(sent),
+            "delivered": len(lags),
+            "missing": len(sent) - len(lags),
+            "lag_ms": percentiles(list(lags.values())),
+        },
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+    print(f"{results['throughput_rps']} req/s  latency p50={results['latency_ms']['p50']}ms "
+          f"p95={results['latency_ms']['p95']}ms p99={results['latency_ms']['p99']}ms  "
+          f"delivered {len(lags)}/{len(sent)} lag p95={results['delivery']['lag_ms']['p95']}ms  -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+import requests
+
+url = "http://localhost:7070/api/v1/spaces/1/users/bulk"
+
+headers = {
+    "API-Key": "XXXX-XXXXX-XXXXX-XXXX",
+    "User-ID": "1"
+}
+
+payload = [
+    {"prename": "John", "name": "Doe", "username": "johndoe", "email": "john.doe@example.com", "role": "alarmed"},
+    {"prename": "Jane", "name": "Doe", "username": "janedoe", "email": "jane.doe@example.com", "role": "normal"}
+]
+
+response = requests.post(url, json=payload, headers=headers)
+
+print(response.status_code)
+print(response.json())
@@ -1,27 +1,93 @@
+import base64
+import concurrent.futures
 import configparser
+import csv
+import heapq
+import io
+import json
+import math
+import os
 import random
 import string
-from datetime import datetime
+import sys
+import time
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta, timezone
 from functools import wraps
+from itertools import chain, islice
+from types import SimpleNamespace
 import requests
 
-from flask import Flask, request, jsonify, render_template
+import click
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, render_template, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from sqlalchemy import case, delete, exists, insert, or_, select, tuple_, update
+from werkzeug.local import LocalProxy
 
-# Load configuration
-config = configparser.ConfigParser()
-config.read('config.ini')
+# Modules shared with notifySys live in the common package at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = config['DATABASE']['SQLALCHEMY_DATABASE_URI']
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+from common.archive import SegmentArchive  # noqa: E402
+from common.database import init_database  # noqa: E402
+from common.metrics import Gauge, registry  # noqa: E402
+from common.socket_token import issue_token  # noqa: E402
+from common.writer import GroupCommitWriter  # noqa: E402
 
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+from cache import TTLCache  # noqa: E402
+from coalesce import AlarmCoalescer  # noqa: E402
+from dispatch import NotificationDispatcher  # noqa: E402
+from export import gzip_chunks, ndjson_chunks  # noqa: E402
+from feed import AlarmFeed  # noqa: E402
+from profiler import SQLProfiler  # noqa: E402
+from ratelimit import RateLimiter  # noqa: E402
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+
+db = SQLAlchemy()
+bp = Blueprint('api', __name__, cli_group=None)
+
+
+def load_config(path=None):
+    config = configparser.ConfigParser()
+    config.read(path or os.environ.get('API_CONFIG', os.path.join(API_DIR, 'config.ini')))
+    return config
+
+
+def _service(name):
+    # Looked up on the current app, so every create_app() has its own caches and workers
+    return LocalProxy(lambda: getattr(current_app.extensions['alarm_system'], name))
+
+
+config = _service('config')
+space_cache = _service('space_cache')
+role_cache = _service('role_cache')
+alarm_feed = _service('alarm_feed')
+coalescer = _service('coalescer')
+rate_limiter = _service('rate_limiter')
+dispatcher = _service('dispatcher')
+alarm_writer = _service('alarm_writer')
+alarm_archive = _service('alarm_archive')
+profiler = _service('profiler')
+
+
+RATE_LIMIT_SCOPES = ('space', 'user', 'critical', 'admin')
+
+
+def load_rate_limits(section):
+    return {scope: (section.getfloat(f'{scope}_rate'), section.getfloat(f'{scope}_burst'))
+            for scope in RATE_LIMIT_SCOPES if f'{scope}_rate' in section}
+
+
+CachedSpace = namedtuple('CachedSpace', ['id', 'name', 'api_key'])
+ArchivedAlarm = namedtuple('ArchivedAlarm', ['id', 'message', 'timestamp', 'position', 'level', 'repeat_count',
+                                             'user_id', 'space_id'])
 
 
 class User(db.Model):
+    __table_args__ = (
+        db.Index('ix_user_space_id_role', 'space_id', 'role'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     prename = db.Column(db.String(80), nullable=False)
     name = db.Column(db.String(80), nullable=False)
@@ -44,17 +110,107 @@ class Space(db.Model):
 
 
 class Alarm(db.Model):
+    __table_args__ = (
+        db.Index('ix_alarm_space_id_timestamp', 'space_id', 'timestamp'),
+        # Ids of archived alarms are never reused, even once the highest one has left the table
+        {'sqlite_autoincrement': True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     message = db.Column(db.String(200), nullable=True)
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     position = db.Column(db.String(200), nullable=False)
     level = db.Column(db.Integer, nullable=False)  # 0: info, 1: warning, 2: critical
+    repeat_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     user = db.relationship('User', back_populates='alarms')
     space_id = db.Column(db.Integer, db.ForeignKey('space.id'), nullable=False)
     space = db.relationship('Space', back_populates='alarms')
 
 
+class NotificationOutbox(db.Model):
+    # Written in the same transaction as the alarm, drained by the dispatcher
+    __table_args__ = (
+        db.Index('ix_notification_outbox_pending', 'delivered_at', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    alarm_id = db.Column(db.Integer, db.ForeignKey('alarm.id'), nullable=False, unique=True)
+    space_id = db.Column(db.Integer, db.ForeignKey('space.id'), nullable=False)
+    message = db.Column(db.String(400), nullable=False)
+    level = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Rows are claimed and sent earliest deadline first, see delivery_deadline
+    deliver_by = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    delivered_at = db.Column(db.DateTime, nullable=True)
+    recipients = db.Column(db.Integer, nullable=True)
+    # User IDs the notification service reported as notified
+    recipient_ids = db.Column(db.JSON, nullable=True)
+    last_error = db.Column(db.String(200), nullable=True)
+
+
+class AlarmHourlyStat(db.Model):
+    # Rollups kept in step with write_alarms, rebuilt with `flask rebuild-alarm-stats`
+    space_id = db.Column(db.Integer, db.ForeignKey('space.id'), primary_key=True)
+    hour = db.Column(db.DateTime, primary_key=True)
+    level = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class UserAlarmStat(db.Model):
+    __table_args__ = (
+        db.Index('ix_user_alarm_stat_space_id_count', 'space_id', 'count'),
+    )
+
+    space_id = db.Column(db.Integer, db.ForeignKey('space.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    last_alarm_at = db.Column(db.DateTime, nullable=True)
+
+
+def claim_outbox(app, limit):
+    # Leases due rows atomically so concurrent workers never deliver the same row twice
+    with app.app_context():
+        now = datetime.utcnow()
+        lease = timedelta(seconds=config['NOTIFICATION_SERVICE'].getint('lease', 60))
+        due = (select(NotificationOutbox.id)
+               .where(NotificationOutbox.delivered_at.is_(None), NotificationOutbox.next_attempt_at <= now)
+               .order_by(NotificationOutbox.deliver_by, NotificationOutbox.id)
+               .limit(limit))
+        rows = db.session.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(due))
+            .values(next_attempt_at=now + lease)
+            .returning(NotificationOutbox.id, NotificationOutbox.space_id, NotificationOutbox.message,
+                       NotificationOutbox.attempts, NotificationOutbox.level, NotificationOutbox.created_at,
+                       NotificationOutbox.deliver_by)
+        ).all()
+        db.session.commit()
+        return sorted(rows, key=lambda row: (row.deliver_by, row.id))
+
+
+def complete_outbox(app, delivered, failed):
+    with app.app_context():
+        now = datetime.utcnow()
+        for outbox_id, recipients in delivered:
+            db.session.execute(update(NotificationOutbox).where(NotificationOutbox.id == outbox_id)
+                               .values(delivered_at=now, recipients=len(recipients), recipient_ids=recipients,
+                                       last_error=None))
+        for outbox_id, error, next_attempt_at in failed:
+            db.session.execute(update(NotificationOutbox).where(NotificationOutbox.id == outbox_id)
+                               .values(attempts=NotificationOutbox.attempts + 1, last_error=error,
+                                       next_attempt_at=next_attempt_at))
+        db.session.commit()
+
+
+@bp.before_app_request
+def start_dispatcher():
+    # wsgi.py and __main__ start it on boot; this covers servers that only import create_app
+    dispatcher.start()
+
+
 def generate_api_key():
     sections = [
         ''.join(random.choices(string.ascii_uppercase + string.digits, k=4)),
@@ -65,17 +221,59 @@ def generate_api_key():
     return '-'.join(sections)
 
 
+def get_space(api_key):
+    # Cached api_key -> space lookup, invalid keys are cached as None as well
+    if not api_key:
+        return None
+
+    def load():
+        space = Space.query.filter_by(api_key=api_key).first()
+        return CachedSpace(space.id, space.name, space.api_key) if space else None
+
+    return space_cache.get_or_load(api_key, load)
+
+
+def get_user_role(space_id, user_id):
+    # Cached (space, user) -> role lookup, None if the user is not in the space
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    def load():
+        row = db.session.query(User.role).filter_by(id=user_id, space_id=space_id).first()
+        return row.role if row else None
+
+    return role_cache.get_or_load((space_id, user_id), load)
+
+
+def invalidate_user(space_id, user_id):
+    role_cache.invalidate((space_id, user_id))
+
+
+def rate_limited(*buckets):
+    retry_after = rate_limiter.take(*buckets)
+    if not retry_after:
+        return None
+    response = jsonify({"error": "Rate limit exceeded", "retry_after": retry_after})
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response, 429
+
+
 def require_space_admin(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         api_key = request.headers.get('API-Key')
-        space = Space.query.filter_by(api_key=api_key).first()
+        space = get_space(api_key)
         if not space:
             return jsonify({"error": "Invalid API key"}), 403
 
+        # The key only grants access to its own space, whatever space the URL names
+        if 'space_id' in kwargs and kwargs['space_id'] != space.id:
+            return jsonify({"error": "API key does not belong to this space"}), 403
+
         user_id = request.headers.get('User-ID')
-        user = User.query.filter_by(id=user_id, space_id=space.id, role='space_admin').first()
-        if not user:
+        if get_user_role(space.id, user_id) != 'space_admin':
             return jsonify({"error": "Admin privileges required"}), 403
 
         return f(*args, **kwargs)
@@ -83,17 +281,21 @@ def require_space_admin(f):
     return decorated_function
 
 
-@app.route('/')
+@bp.route('/')
 def index():
-    return render_template('notify_widget.html')
+    return render_template('notify_widget.html', token=request.args.get('token'))
 
 
-@app.route('/spaces/add', methods=['GET', 'POST'])
+@bp.route('/spaces/add', methods=['GET', 'POST'])
 def add_space():
     if request.method == 'POST':
         name = request.form.get('name')
         password = request.form.get('password')
 
+        limited = rate_limited(('admin', request.remote_addr, None))
+        if limited:
+            return limited
+
         if password != config['ADMIN']['password']:
             return jsonify({"error": "Invalid admin password"}), 403
 
@@ -104,33 +306,34 @@ def add_space():
         new_space = Space(name=name, api_key=api_key)
         db.session.add(new_space)
         db.session.commit()
+        space_cache.invalidate(api_key)
 
         return jsonify({"message": "Space created successfully", "api_key": api_key}), 201
 
     return render_template('add_space.html')
 
 
-@app.route('/spaces/list', methods=['GET'])
+@bp.route('/spaces/list', methods=['GET'])
 def list_spaces():
     spaces = Space.query.all()
     space_list = [{"id": space.id, "name": space.name, "api_key": space.api_key} for space in spaces]
     return jsonify(space_list), 200
 
 
-@app.route('/api/v1/apikeycheck', methods=['POST'])
+@bp.route('/api/v1/apikeycheck', methods=['POST'])
 def apikey_check():
     api_key = request.json.get('api_key')
     if not api_key:
         return jsonify({"error": "API key is required"}), 400
 
-    space = Space.query.filter_by(api_key=api_key).first()
+    space = get_space(api_key)
     if space:
         return jsonify({"valid": True}), 200
     else:
         return jsonify({"valid": False}), 404
 
 
-@app.route('/api/v1/ping', methods=['GET'])
+@bp.route('/api/v1/ping', methods=['GET'])
 def ping():
     response = {
         "status": "online",
@@ -140,7 +343,14 @@ def ping():
     return jsonify(response), 200
 
 
-@app.route('/api/v1/users/add', methods=['POST'])
+def identity_taken(username, email):
+    condition = User.username == username
+    if email:
+        condition = or_(condition, User.email == email)
+    return db.session.query(User.id).filter(condition).first() is not None
+
+
+@bp.route('/api/v1/users/add', methods=['POST'])
 def add_user():
     api_key = request.json.get('api_key')
     prename = request.json.get('prename')
@@ -152,47 +362,339 @@ def add_user():
     if not api_key or not prename or not name or not username or not role:
         return jsonify({"error": "API key, prename, name, username, and role are required"}), 400
 
-    space = Space.query.filter_by(api_key=api_key).first()
+    space = get_space(api_key)
     if not space:
         return jsonify({"error": "Invalid API key"}), 404
 
-    if User.query.filter_by(username=username).first() or (email and User.query.filter_by(email=email).first()):
+    limited = rate_limited(('space', space.id, space.id))
+    if limited:
+        return limited
+
+    if identity_taken(username, email):
         return jsonify({"error": "Username or email already exists"}), 409
 
     new_user = User(prename=prename, name=name, username=username, email=email, role=role, space_id=space.id)
     db.session.add(new_user)
     db.session.commit()
 
-    notify_url = config['NOTIFICATION_SERVICE']['url']
+    invalidate_user(space.id, new_user.id)
 
-    notify_response = requests.post(
-        notify_url,
-        json={
-            'username': username,
-            'email': email
-        }
-    )
-    if notify_response.status_code != 201:
+    if not sync_subscription(new_user):
         return jsonify({"error": "Failed to create user in notification system"}), 500
 
     return jsonify({"message": "User created successfully", "user_id": new_user.id}), 201
 
 
-@app.route('/api/v1/spaces/<int:space_id>/alarms', methods=['GET'])
+ALARM_PAGE_DEFAULT = 50
+ALARM_PAGE_MAX = 500
+
+
+def parse_timestamp(value):
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def encode_cursor(alarm):
+    raw = f'{alarm.timestamp.isoformat()}|{alarm.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    timestamp, alarm_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(timestamp), int(alarm_id)
+
+
+def alarm_history_query(space_id, since=None, until=None, level=None, cursor=None):
+    # Newest first, keyset on (timestamp, id) so every page is an index range scan
+    query = Alarm.query.filter(Alarm.space_id == space_id)
+    if since is not None:
+        query = query.filter(Alarm.timestamp >= since)
+    if until is not None:
+        query = query.filter(Alarm.timestamp < until)
+    if level is not None:
+        query = query.filter(Alarm.level == level)
+    if cursor is not None:
+        query = query.filter(tuple_(Alarm.timestamp, Alarm.id) < cursor)
+    return query.order_by(Alarm.timestamp.desc(), Alarm.id.desc())
+
+
+def archived_alarm_history(space_id, since=None, until=None, level=None, cursor=None):
+    # Same order and filters as alarm_history_query; a monthly segment is only read once the merge reaches it
+    upper = min((bound for bound in (until, cursor[0] if cursor else None) if bound is not None), default=None)
+    for month in reversed(alarm_archive.months(space_id)):
+        if upper is not None and month > upper.strftime('%Y-%m'):
+            continue
+        if since is not None and month < since.strftime('%Y-%m'):
+            break
+        alarms = [ArchivedAlarm(**{field: row.get(field) for field in ArchivedAlarm._fields})
+                  for row in alarm_archive.read(space_id, month)]
+        alarms = [alarm for alarm in alarms
+                  if (since is None or alarm.timestamp >= since)
+                  and (until is None or alarm.timestamp < until)
+                  and (level is None or alarm.level == level)
+                  and (cursor is None or (alarm.timestamp, alarm.id) < cursor)]
+        yield from sorted(alarms, key=lambda alarm: (alarm.timestamp, alarm.id), reverse=True)
+
+
+def serialize_alarm(alarm):
+    return {"id": alarm.id, "message": alarm.message, "timestamp": alarm.timestamp, "position": alarm.position,
+            "level": alarm.level, "user_id": alarm.user_id, "repeat_count": alarm.repeat_count}
+
+
+@bp.route('/api/v1/spaces/<int:space_id>/alarms', methods=['GET'])
 def get_space_alarms(space_id):
     api_key = request.headers.get('API-Key')
-    space = Space.query.filter_by(id=space_id, api_key=api_key).first()
+    space = get_space(api_key)
 
-    if not space:
+    if not space or space.id != space_id:
+        return jsonify({"error": "Invalid API key or space does not exist"}), 403
+
+    try:
+        limit = min(int(request.args.get('limit', ALARM_PAGE_DEFAULT)), ALARM_PAGE_MAX)
+        since = request.args.get('since')
+        since = parse_timestamp(since) if since else None
+        until = request.args.get('until')
+        until = parse_timestamp(until) if until else None
+        level = request.args.get('level')
+        level = int(level) if level is not None else None
+        cursor = request.args.get('cursor')
+        cursor = decode_cursor(cursor) if cursor else None
+    except (ValueError, UnicodeDecodeError):
+        return jsonify({"error": "Invalid limit, since, until, level or cursor"}), 400
+
+    if limit < 1:
+        return jsonify({"error": "Limit must be positive"}), 400
+
+    alarms = alarm_history_query(space.id, since, until, level, cursor).limit(limit + 1)
+    if request.args.get('include_archive', type=int):
+        alarms = heapq.merge(alarms, archived_alarm_history(space.id, since, until, level, cursor),
+                             key=lambda alarm: (alarm.timestamp, alarm.id), reverse=True)
+    alarms = list(islice(alarms, limit + 1))
+    next_cursor = encode_cursor(alarms[limit - 1]) if len(alarms) > limit else None
+
+    return jsonify({
+        "alarms": [serialize_alarm(alarm) for alarm in alarms[:limit]],
+        "next_cursor": next_cursor,
+    }), 200
+
+
+@bp.route('/api/v1/spaces/<int:space_id>/alarms/stream', methods=['GET'])
+def stream_space_alarms(space_id):
+    # EventSource cannot send headers, so the key may also come as ?api_key=
+    api_key = request.headers.get('API-Key') or request.args.get('api_key')
+    space = get_space(api_key)
+
+    if not space or space.id != space_id:
+        return jsonify({"error": "Invalid API key or space does not exist"}), 403
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_id = int(last_event_id) if last_event_id else alarm_feed.latest_id(space_id)
+    except ValueError:
+        return jsonify({"error": "Invalid Last-Event-ID"}), 400
+
+    # The generator runs after the request context is gone, so it holds on to the feed itself
+    feed = alarm_feed._get_current_object()
+
+    def events():
+        nonlocal last_id
+        # A fresh client only wants alarms from now on, so there is nothing it could have missed yet
+        check_gap = last_event_id is not None
+        yield 'retry: 3000\n\n'
+        while True:
+            missed, complete = feed.wait(space_id, last_id, timeout=15)
+            if check_gap and not complete:
+                yield f'event: gap\ndata: {json.dumps({"last_event_id": last_id})}\n\n'
+            if not missed:
+                yield ': keepalive\n\n'
+                continue
+            for alarm_id, data in missed:
+                yield f'id: {alarm_id}\nevent: alarm\ndata: {data}\n\n'
+            last_id = missed[-1][0]
+            check_gap = True
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def archive_alarms(before, batch_size):
+    # Alarms still waiting for delivery stay hot until their outbox row is done
+    archived = 0
+    pending = exists().where(NotificationOutbox.alarm_id == Alarm.id, NotificationOutbox.delivered_at.is_(None))
+    while True:
+        rows = db.session.execute(select(Alarm.__table__)
+                                  .where(Alarm.timestamp < before, ~pending)
+                                  .order_by(Alarm.id)
+                                  .limit(batch_size)).all()
+        if not rows:
+            return archived
+        alarm_archive.append([row._asdict() for row in rows])
+        alarm_ids = [row.id for row in rows]
+        db.session.execute(delete(NotificationOutbox).where(NotificationOutbox.alarm_id.in_(alarm_ids)))
+        db.session.execute(delete(Alarm).where(Alarm.id.in_(alarm_ids)))
+        db.session.commit()
+        archived += len(alarm_ids)
+
+
+@bp.cli.command('archive-alarms')
+@click.option('--days', type=int, help='Archive alarms older than this many days (default from [RETENTION]).')
+def archive_alarms_command(days):
+    """Move old alarms out of the database into monthly archive segments."""
+    if days is None:
+        days = config['RETENTION'].getint('alarm_days', 365)
+    before = datetime.utcnow() - timedelta(days=days)
+    archived = archive_alarms(before, config['RETENTION'].getint('batch_size', 1000))
+    click.echo(f'Archived {archived} alarms older than {before.isoformat()} to {alarm_archive.directory}')
+
+
+EXPORT_TABLES = {'alarms': Alarm, 'users': User}
+EXPORT_BATCH_SIZE = 1000
+
+
+def export_rows(space_id, table):
+    # Plain rows streamed from the cursor in batches, no ORM objects or result list
+    model = EXPORT_TABLES[table]
+    statement = (select(model.__table__)
+                 .where(model.space_id == space_id)
+                 .order_by(model.id)
+                 .execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for row in db.session.execute(statement):
+        yield row._asdict()
+
+
+@bp.route('/api/v1/spaces/<int:space_id>/export/<table>', methods=['GET'])
+@require_space_admin
+def export_space(space_id, table):
+    if table not in EXPORT_TABLES:
+        return jsonify({"error": f"Table must be one of {', '.join(EXPORT_TABLES)}"}), 400
+
+    chunks = ndjson_chunks(export_rows(space_id, table), EXPORT_BATCH_SIZE)
+    filename = f'space_{space_id}_{table}.ndjson'
+    if request.args.get('gzip', type=int):
+        chunks = gzip_chunks(chunks)
+        mimetype = 'application/gzip'
+        filename += '.gz'
+    else:
+        mimetype = 'application/x-ndjson'
+
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+
+@bp.cli.command('export-space')
+@click.argument('space_id', type=int)
+@click.argument('table', type=click.Choice(list(EXPORT_TABLES)))
+@click.option('--output', '-o', type=click.Path(dir_okay=False), required=True)
+@click.option('--gzip', 'compress', is_flag=True, help='Write a gzip-compressed file.')
+def export_space_command(space_id, table, output, compress):
+    """Stream a space's alarms or users to an NDJSON file."""
+    chunks = ndjson_chunks(export_rows(space_id, table), EXPORT_BATCH_SIZE)
+    if compress:
+        chunks = gzip_chunks(chunks)
+    else:
+        chunks = (chunk.encode() for chunk in chunks)
+
+    with open(output, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+
+ALARM_STATS_DAYS_DEFAULT = 30
+ALARM_STATS_DAYS_MAX = 90
+ALARM_STATS_USERS_DEFAULT = 10
+ALARM_STATS_USERS_MAX = 100
+
+
+@bp.route('/api/v1/spaces/<int:space_id>/alarms/stats', methods=['GET'])
+def get_space_alarm_stats(space_id):
+    api_key = request.headers.get('API-Key')
+    space = get_space(api_key)
+
+    if not space or space.id != space_id:
         return jsonify({"error": "Invalid API key or space does not exist"}), 403
 
-    alarms = Alarm.query.filter_by(space_id=space.id).all()
-    alarm_list = [{"id": alarm.id, "message": alarm.message, "timestamp": alarm.timestamp, "position": alarm.position,
-                   "level": alarm.level, "user_id": alarm.user_id} for alarm in alarms]
-    return jsonify(alarm_list), 200
+    days = request.args.get('days', ALARM_STATS_DAYS_DEFAULT, type=int)
+    if days < 1 or days > ALARM_STATS_DAYS_MAX:
+        return jsonify({"error": f"Days must be between 1 and {ALARM_STATS_DAYS_MAX}"}), 400
+    top_users = request.args.get('users', ALARM_STATS_USERS_DEFAULT, type=int)
+    if top_users < 0 or top_users > ALARM_STATS_USERS_MAX:
+        return jsonify({"error": f"Users must be between 0 and {ALARM_STATS_USERS_MAX}"}), 400
+
+    # At most days * 24 * levels rollup rows and top_users user rows, however many alarms the space has
+    since = alarm_hour(datetime.utcnow()) - timedelta(days=days)
+    hours = (AlarmHourlyStat.query
+             .filter(AlarmHourlyStat.space_id == space.id, AlarmHourlyStat.hour >= since)
+             .order_by(AlarmHourlyStat.hour, AlarmHourlyStat.level)
+             .all())
+    # Top users only, read backwards off the (space_id, count) index
+    users = (UserAlarmStat.query.filter_by(space_id=space.id)
+             .order_by(UserAlarmStat.count.desc())
+             .limit(top_users)
+             .all())
+
+    totals = Counter()
+    for row in hours:
+        totals[row.level] += row.count
+
+    return jsonify({
+        "since": since.isoformat(),
+        "hours": [{"hour": row.hour.isoformat(), "level": row.level, "count": row.count} for row in hours],
+        "levels": {str(level): count for level, count in sorted(totals.items())},
+        "users": [{"user_id": row.user_id, "count": row.count,
+                   "last_alarm_at": row.last_alarm_at.isoformat() if row.last_alarm_at else None}
+                  for row in users],
+    }), 200
+
+
+@bp.cli.command('rebuild-alarm-stats')
+@click.option('--space-id', type=int, help='Only rebuild this space.')
+def rebuild_alarm_stats_command(space_id):
+    """Recompute the alarm rollup tables from the alarm table and the archive."""
+    statement = (select(Alarm.id, Alarm.space_id, Alarm.user_id, Alarm.level, Alarm.timestamp)
+                 .execution_options(yield_per=EXPORT_BATCH_SIZE))
+    if space_id is not None:
+        statement = statement.where(Alarm.space_id == space_id)
+        spaces = [space_id]
+    else:
+        spaces = db.session.scalars(select(Space.id)).all()
+
+    hourly = Counter()
+    users = Counter()
+    last_alarm = {}
+    # Archived alarms are history too, read one segment at a time; an alarm whose delete was lost
+    # after archiving is still in the alarm table and only counted once
+    archived_ids = set()
+    archived = (ArchivedAlarm(**{field: row.get(field) for field in ArchivedAlarm._fields})
+                for space in spaces for month in alarm_archive.months(space)
+                for row in alarm_archive.read(space, month))
+    for row in chain(archived, db.session.execute(statement)):
+        if isinstance(row, ArchivedAlarm):
+            archived_ids.add(row.id)
+        elif row.id in archived_ids:
+            continue
+        hourly[(row.space_id, alarm_hour(row.timestamp), row.level)] += 1
+        if row.user_id is not None:
+            users[(row.space_id, row.user_id)] += 1
+            key = (row.space_id, row.user_id)
+            last_alarm[key] = max(last_alarm.get(key, row.timestamp), row.timestamp)
+
+    for model in (AlarmHourlyStat, UserAlarmStat):
+        clear = delete(model)
+        if space_id is not None:
+            clear = clear.where(model.space_id == space_id)
+        db.session.execute(clear)
+    db.session.add_all(AlarmHourlyStat(space_id=space, hour=hour, level=level, count=count)
+                       for (space, hour, level), count in hourly.items())
+    db.session.add_all(UserAlarmStat(space_id=space, user_id=user, count=count,
+                                     last_alarm_at=last_alarm[(space, user)])
+                       for (space, user), count in users.items())
+    db.session.commit()
+    click.echo(f'Rebuilt {len(hourly)} hourly and {len(users)} user rollups')
 
 
-@app.route('/api/v1/spaces/<int:space_id>/users', methods=['GET'])
+@bp.route('/api/v1/spaces/<int:space_id>/users', methods=['GET'])
 @require_space_admin
 def get_users(space_id):
     users = User.query.filter_by(space_id=space_id).all()
@@ -202,7 +704,7 @@ def get_users(space_id):
     return jsonify(user_list), 200
 
 
-@app.route('/api/v1/spaces/<int:space_id>/users/add', methods=['POST'])
+@bp.route('/api/v1/spaces/<int:space_id>/users/add', methods=['POST'])
 @require_space_admin
 def add_user_to_space(space_id):
     prename = request.json.get('prename')
@@ -218,17 +720,110 @@ def add_user_to_space(space_id):
     if not space:
         return jsonify({"error": "Space not found"}), 404
 
-    if User.query.filter_by(username=username).first() or (email and User.query.filter_by(email=email).first()):
+    if identity_taken(username, email):
         return jsonify({"error": "Username or email already exists"}), 409
 
     new_user = User(prename=prename, name=name, username=username, email=email, role=role, space_id=space.id)
     db.session.add(new_user)
     db.session.commit()
+    invalidate_user(space.id, new_user.id)
+    sync_subscription(new_user)
 
     return jsonify({"message": "User added successfully", "user_id": new_user.id}), 201
 
 
-@app.route('/api/v1/spaces/<int:space_id>/users/<int:user_id>', methods=['PUT'])
+USER_FIELDS = ('prename', 'name', 'username', 'email', 'role')
+
+
+def read_bulk_users():
+    if request.mimetype == 'text/csv':
+        reader = csv.DictReader(io.StringIO(request.get_data(as_text=True)))
+        return [{field: (row.get(field) or '').strip() or None for field in USER_FIELDS} for row in reader]
+
+    rows = request.get_json(silent=True)
+    if isinstance(rows, dict):
+        rows = rows.get('users')
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        return None
+    return [{field: row.get(field) for field in USER_FIELDS} for row in rows]
+
+
+def bulk_row_error(row):
+    if any(value is not None and not isinstance(value, str) for value in row.values()):
+        return "Fields must be strings"
+    if not row['prename'] or not row['name'] or not row['username'] or not row['role']:
+        return "Prename, name, username, and role are required"
+    return None
+
+
+@bp.route('/api/v1/spaces/<int:space_id>/users/bulk', methods=['POST'])
+@require_space_admin
+def add_users_bulk(space_id):
+    limited = rate_limited(('space', space_id, space_id))
+    if limited:
+        return limited
+
+    rows = read_bulk_users()
+    if rows is None:
+        return jsonify({"error": "Expected a JSON array of users or a CSV body"}), 400
+
+    errors = [bulk_row_error(row) for row in rows]
+    usernames = {row['username'] for row, error in zip(rows, errors) if not error}
+    emails = {row['email'] for row, error in zip(rows, errors) if not error and row['email']}
+    taken_usernames = set()
+    taken_emails = set()
+    if usernames or emails:
+        for username, email in db.session.query(User.username, User.email).filter(
+                or_(User.username.in_(usernames), User.email.in_(emails))):
+            taken_usernames.add(username)
+            taken_emails.add(email)
+
+    results = []
+    new_users = []
+    for index, (row, error) in enumerate(zip(rows, errors)):
+        if error:
+            results.append({"row": index, "status": "error", "error": error})
+            continue
+        if row['username'] in taken_usernames or (row['email'] and row['email'] in taken_emails):
+            results.append({"row": index, "status": "error", "error": "Username or email already exists"})
+            continue
+
+        taken_usernames.add(row['username'])
+        if row['email']:
+            taken_emails.add(row['email'])
+        new_users.append(dict(row, space_id=space_id))
+        results.append({"row": index, "status": "created", "username": row['username']})
+
+    subscriptions = []
+    if new_users:
+        # One executemany for all rows and one query for their IDs; SQLite cannot return IDs from a
+        # multi-row insert in order, so the ORM would insert row by row
+        db.session.execute(insert(User), new_users)
+        created_users = {user.username: user for user in
+                         User.query.filter(User.username.in_([user['username'] for user in new_users]))}
+        for result in results:
+            if "username" in result:
+                result["user_id"] = created_users[result.pop("username")].id
+        # Taken before the commit expires the new rows
+        subscriptions = [dispatcher.subscription_payload(created_users[user['username']]) for user in new_users]
+    db.session.commit()
+
+    notification_sync = True
+    if new_users:
+        for subscription in subscriptions:
+            invalidate_user(space_id, subscription['user_id'])
+        notification_sync = sync_subscriptions(subscriptions)
+
+    created = len(new_users)
+    return jsonify({
+        "created": created,
+        "failed": len(rows) - created,
+        "notification_sync": notification_sync,
+        "results": results,
+    }), 201 if created else 400
+
+
+@bp.route('/api/v1/spaces/<int:space_id>/users/<int:user_id>', methods=['PUT'])
 @require_space_admin
 def edit_user(space_id, user_id):
     user = User.query.filter_by(id=user_id, space_id=space_id).first()
@@ -257,10 +852,12 @@ def edit_user(space_id, user_id):
         user.role = role
 
     db.session.commit()
+    invalidate_user(space_id, user_id)
+    sync_subscription(user)
     return jsonify({"message": "User updated successfully"}), 200
 
 
-@app.route('/api/v1/spaces/<int:space_id>/users/<int:user_id>', methods=['DELETE'])
+@bp.route('/api/v1/spaces/<int:space_id>/users/<int:user_id>', methods=['DELETE'])
 @require_space_admin
 def delete_user(space_id, user_id):
     user = User.query.filter_by(id=user_id, space_id=space_id).first()
@@ -269,10 +866,25 @@ def delete_user(space_id, user_id):
 
     db.session.delete(user)
     db.session.commit()
+    invalidate_user(space_id, user_id)
+    remove_subscription(user_id)
     return jsonify({"message": "User deleted successfully"}), 200
 
 
-@app.route('/api/v1/emergency', methods=['POST'])
+ALARM_LEVELS = (0, 1, 2)  # info, warning, critical
+
+
+def parse_level(value):
+    # Clients send the level as a number or a numeric string; it is normalised here once because
+    # rate limiting, coalescing and delivery order all compare it as an int
+    if isinstance(value, str) and value.strip().isdecimal():
+        value = int(value)
+    if type(value) is not int or value not in ALARM_LEVELS:
+        return None
+    return value
+
+
+@bp.route('/api/v1/emergency', methods=['POST'])
 def emergency_alarm():
     api_key = request.json.get('api_key')
     position = request.json.get('position')
@@ -283,46 +895,221 @@ def emergency_alarm():
     if not api_key or not position or not message or level is None or not user_id:
         return jsonify({"error": "API key, position, message, level, and user_id are required"}), 400
 
-    space = Space.query.filter_by(api_key=api_key).first()
+    level = parse_level(level)
+    if level is None:
+        return jsonify({"error": f"Level must be one of {', '.join(map(str, ALARM_LEVELS))}"}), 400
+
+    space = get_space(api_key)
     if not space:
         return jsonify({"error": "Invalid API key"}), 403
 
-    user = User.query.filter_by(id=user_id, space_id=space.id).first()
-    if not user:
+    if get_user_role(space.id, user_id) is None:
         return jsonify({"error": "Invalid user or user not associated with the space"}), 403
 
-    new_alarm = Alarm(
-        message=message,
-        position=position,
-        level=level,
-        space_id=space.id,
-        user_id=user.id
-    )
-    db.session.add(new_alarm)
+    # Repeated presses of an active alarm only bump its count, they do not use up the rate limit
+    alarm_key = (space.id, int(user_id), position, level)
+    alarm_id = coalescer.match(alarm_key)
+    if alarm_id is not None:
+        Alarm.query.filter_by(id=alarm_id).update({Alarm.repeat_count: Alarm.repeat_count + 1})
+        db.session.commit()
+        return jsonify({"message": "Emergency alarm already active", "alarm_id": alarm_id, "coalesced": True}), 200
+
+    # Critical alarms draw from their own bucket so floods of lower levels cannot block them
+    if level == 2:
+        limited = rate_limited(('critical', (space.id, int(user_id)), space.id))
+    else:
+        limited = rate_limited(('space', space.id, space.id), ('user', (space.id, int(user_id)), space.id))
+    if limited:
+        return limited
+
+    alarm = {
+        "message": message,
+        "timestamp": datetime.utcnow(),
+        "position": position,
+        "level": level,
+        "space_id": space.id,
+        "user_id": int(user_id),
+    }
+    if alarm_writer:
+        # Hand the pooled connection back so waiting callers cannot starve the writer
+        db.session.close()
+        try:
+            alarm_id = alarm_writer.submit(alarm).result(
+                timeout=config['DATABASE'].getfloat('group_commit_timeout', 5))
+        except concurrent.futures.TimeoutError:
+            # Still queued, the writer announces it once it is committed
+            return jsonify({"message": "Emergency alarm accepted but not stored yet"}), 202
+        except Exception as e:
+            current_app.logger.error('Failed to write emergency alarm: %s', e)
+            return jsonify({"error": "Emergency alarm could not be stored"}), 503
+    else:
+        alarm_id = write_alarms([alarm])[0]
+        announce_alarm(alarm, alarm_id)
+
+    return jsonify({"message": "Emergency alarm created successfully", "alarm_id": alarm_id}), 201
+
+
+def write_alarms(alarms):
+    # Alarm, outbox row and last_alert_sent for every alarm in a single commit
+    new_alarms = [Alarm(**alarm) for alarm in alarms]
+    db.session.add_all(new_alarms)
+    for alarm in alarms:
+        User.query.filter_by(id=alarm["user_id"]).update({User.last_alert_sent: alarm["timestamp"]})
+    db.session.flush()
+    alarm_ids = [new_alarm.id for new_alarm in new_alarms]
+    for alarm, alarm_id in zip(alarms, alarm_ids):
+        notify_users(alarm["space_id"], alarm_id, alarm["position"], alarm["message"], alarm["level"])
+    update_alarm_stats(alarms)
     db.session.commit()
+    return alarm_ids
 
-    notify_users(space.id, new_alarm)
 
-    return jsonify({"message": "Emergency alarm created successfully"}), 201
+def alarm_hour(timestamp):
+    return timestamp.replace(minute=0, second=0, microsecond=0)
 
 
-def notify_users(space_id, alarm):
-    users = User.query.filter_by(space_id=space_id).all()
-    notify_url = config['NOTIFICATION_SERVICE']['url']
+def upsert_counts(model, keys, rows, latest=None):
+    # INSERT .. ON CONFLICT DO UPDATE adds to the existing counter without reading it first
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(model).values(rows)
+    values = {'count': model.count + statement.excluded.count}
+    if latest:
+        column = getattr(model, latest)
+        values[latest] = case((column > statement.excluded[latest], column), else_=statement.excluded[latest])
+    db.session.execute(statement.on_conflict_do_update(index_elements=keys, set_=values))
+
+
+def update_alarm_stats(alarms):
+    hourly = Counter((alarm["space_id"], alarm_hour(alarm["timestamp"]), alarm["level"]) for alarm in alarms)
+    users = Counter((alarm["space_id"], alarm["user_id"]) for alarm in alarms if alarm["user_id"] is not None)
+    last_alarm = {}
+    for alarm in alarms:
+        key = (alarm["space_id"], alarm["user_id"])
+        last_alarm[key] = max(last_alarm.get(key, alarm["timestamp"]), alarm["timestamp"])
+
+    upsert_counts(AlarmHourlyStat, ['space_id', 'hour', 'level'],
+                  [{"space_id": space_id, "hour": hour, "level": level, "count": count}
+                   for (space_id, hour, level), count in hourly.items()])
+    if users:
+        upsert_counts(UserAlarmStat, ['space_id', 'user_id'],
+                      [{"space_id": space_id, "user_id": user_id, "count": count,
+                        "last_alarm_at": last_alarm[(space_id, user_id)]}
+                       for (space_id, user_id), count in users.items()],
+                      latest='last_alarm_at')
+
+
+def announce_alarm(alarm, alarm_id):
+    # Only for committed alarms: repeats merge into it, the dispatcher sends it and streams show it
+    coalescer.remember((alarm["space_id"], alarm["user_id"], alarm["position"], alarm["level"]), alarm_id)
+    dispatcher.wake()
+    alarm_feed.publish(alarm["space_id"], alarm_id, json.dumps(dict(alarm, id=alarm_id, repeat_count=0,
+                                                                    timestamp=alarm["timestamp"].isoformat())))
+
+
+def write_alarm_group(app, alarms):
+    with app.app_context():
+        alarm_ids = write_alarms(alarms)
+        # Here rather than in the request, which may have stopped waiting before the group committed.
+        # The rows are in, so a failure must not make the writer retry them
+        for alarm, alarm_id in zip(alarms, alarm_ids):
+            try:
+                announce_alarm(alarm, alarm_id)
+            except Exception:
+                app.logger.exception('Failed to announce alarm %s', alarm_id)
+    return alarm_ids
+
+
+def sync_subscription(user):
+    try:
+        response = dispatcher.sync_subscription(config['NOTIFICATION_SERVICE']['subscriptions_url'], user)
+    except requests.RequestException:
+        response = None
+    if response is None or response.status_code != 200:
+        print(f"Failed to sync user {user.id} with notification system")
+        return False
+    return True
+
+
+def sync_subscriptions(subscriptions):
+    try:
+        response = dispatcher.sync_subscriptions(config['NOTIFICATION_SERVICE']['subscriptions_url'], subscriptions)
+    except requests.RequestException:
+        response = None
+    if response is None or response.status_code != 200:
+        print(f"Failed to sync {len(subscriptions)} users with notification system")
+        return False
+    return True
+
+
+@bp.cli.command('sync-subscriptions')
+@click.option('--batch-size', type=int, default=EXPORT_BATCH_SIZE, show_default=True)
+def sync_subscriptions_command(batch_size):
+    """Push every user to the notification service, e.g. users created before it kept subscriptions."""
+    statement = (select(User.id, User.space_id, User.username, User.email, User.role)
+                 .order_by(User.id)
+                 .execution_options(yield_per=batch_size))
+    synced = failed = 0
+    for users in db.session.execute(statement).partitions():
+        if sync_subscriptions([dispatcher.subscription_payload(user) for user in users]):
+            synced += len(users)
+        else:
+            failed += len(users)
+    click.echo(f'Synced {synced} users with the notification system')
+    if failed:
+        raise click.ClickException(f'Failed to sync {failed} users')
+
+
+def remove_subscription(user_id):
+    try:
+        response = dispatcher.remove_subscription(config['NOTIFICATION_SERVICE']['subscriptions_url'], user_id)
+    except requests.RequestException:
+        response = None
+    if response is None or response.status_code != 200:
+        print(f"Failed to remove user {user_id} from notification system")
+
+
+def delivery_deadline(created_at, level):
+    # Critical alarms are due at once and every level below adds starvation_after seconds, so fresh
+    # higher-level alarms overtake lower ones for a while but never starve them
+    starvation_after = config['NOTIFICATION_SERVICE'].getfloat('starvation_after', 5.0)
+    return created_at + timedelta(seconds=(ALARM_LEVELS[-1] - level) * starvation_after)
+
+
+def notify_users(space_id, alarm_id, position, message, level):
+    # Only queues the notification, it is delivered once the transaction commits
+    now = datetime.utcnow()
+    db.session.add(NotificationOutbox(alarm_id=alarm_id, space_id=space_id, level=level,
+                                      message=f'Alarm from {position}: {message}',
+                                      created_at=now, deliver_by=delivery_deadline(now, level)))
+
+
+@bp.route('/api/v1/alarms/<int:alarm_id>/delivery', methods=['GET'])
+def get_alarm_delivery(alarm_id):
+    api_key = request.headers.get('API-Key')
+    space = get_space(api_key)
+    if not space:
+        return jsonify({"error": "Invalid API key"}), 403
+
+    outbox = NotificationOutbox.query.filter_by(alarm_id=alarm_id, space_id=space.id).first()
+    if not outbox:
+        return jsonify({"error": "No delivery record for this alarm"}), 404
 
-    for user in users:
-        if user.role == 'alarmed':
-            notify_response = requests.post(
-                f'{notify_url}/{user.id}',
-                json={
-                    'message': f'Alarm from {alarm.position}: {alarm.message}',
-                }
-            )
-            if notify_response.status_code != 201:
-                print(f"Failed to notify user {user.id}")
+    return jsonify({
+        "alarm_id": alarm_id,
+        "delivered": outbox.delivered_at is not None,
+        "delivered_at": outbox.delivered_at,
+        "recipients": outbox.recipients,
+        "recipient_ids": outbox.recipient_ids,
+        "attempts": outbox.attempts,
+        "next_attempt_at": outbox.next_attempt_at,
+        "last_error": outbox.last_error,
+    }), 200
 
 
-@app.route('/api/v1/verify_user', methods=['POST'])
+@bp.route('/api/v1/verify_user', methods=['POST'])
 def verify_user():
     api_key = request.json.get('api_key')
     username = request.json.get('username')
@@ -330,19 +1117,148 @@ def verify_user():
     if not api_key or not username:
         return jsonify({"error": "API key and username are required"}), 400
 
-    space = Space.query.filter_by(api_key=api_key).first()
+    space = get_space(api_key)
     if not space:
         return jsonify({"error": "Invalid API key"}), 404
 
     user = User.query.filter_by(username=username, space_id=space.id).first()
     if user:
-        return jsonify({"valid": True, "user_id": user.id}), 200
+        # The notification service only puts clients presenting this token in the user's room
+        notification_config = config['NOTIFICATION_SERVICE']
+        token = issue_token(notification_config['token_secret'], user.id,
+                            notification_config.getint('token_ttl', 86400))
+        return jsonify({"valid": True, "user_id": user.id, "notification_token": token}), 200
     else:
         return jsonify({"valid": False}), 404
 
 
+@bp.route('/api/v1/stats', methods=['GET'])
+def stats():
+    return jsonify({
+        "cache": {
+            "spaces": space_cache.stats(),
+            "roles": role_cache.stats(),
+        },
+        "coalescing": coalescer.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "group_commit": alarm_writer.stats() if alarm_writer else None,
+        "feed": alarm_feed.stats(),
+        "dispatch": dispatcher.stats(),
+        "startup": current_app.extensions['alarm_system'].startup,
+    }), 200
+
+
+registry.add(Gauge('cache_requests_total', 'Auth cache lookups by cache and result.',
+                   lambda: {(name, result): cache.stats()[result]
+                            for name, cache in (('spaces', space_cache), ('roles', role_cache))
+                            for result in ('hits', 'misses')},
+                   labels=('cache', 'result'), kind='counter'))
+registry.add(Gauge('rate_limit_decisions_total', 'Rate limiter decisions by scope.',
+                   lambda: {**{(scope, 'allowed'): n for scope, n in rate_limiter.stats()['allowed'].items()},
+                            **{(scope, 'limited'): n for scope, n in rate_limiter.stats()['limited'].items()}},
+                   labels=('scope', 'decision'), kind='counter'))
+registry.add(Gauge('alarms_coalesced_total', 'Alarms merged into an active alarm.',
+                   lambda: coalescer.stats()['merged'], kind='counter'))
+registry.add(Gauge('notify_queue_depth', 'Notifications waiting for a send worker by alarm level.',
+                   lambda: {str(level): stats['depth'] for level, stats in dispatcher.queue.stats().items()},
+                   labels=('level',)))
+registry.add(Gauge('notify_queue_wait_seconds_max', 'Longest time from outbox row to send worker by alarm level.',
+                   lambda: {str(level): stats['wait_max'] for level, stats in dispatcher.queue.stats().items()},
+                   labels=('level',)))
+registry.add(Gauge('alarm_feed_published_total', 'Alarms published to live feeds.',
+                   lambda: alarm_feed.stats()['published'], kind='counter'))
+registry.add(Gauge('app_startup_seconds', 'Time spent in create_app.',
+                   lambda: {phase[:-len('_ms')]: ms / 1000
+                            for phase, ms in current_app.extensions['alarm_system'].startup.items()},
+                   labels=('phase',)))
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def create_app(settings=None):
+    """Build the API from a config.ini path or ConfigParser (default: API_CONFIG or api/config.ini).
+
+    Nothing connects to the database or starts a thread here; the
+    dispatcher and group-commit writer start on first use. That makes it
+    safe to create the app in a parent process and fork workers from it.
+    """
+    started = time.perf_counter()
+    if not isinstance(settings, configparser.ConfigParser):
+        settings = load_config(settings)
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = settings['DATABASE']['SQLALCHEMY_DATABASE_URI']
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    app.register_blueprint(bp)
+
+    engine = init_database(app, db, wal=settings['DATABASE'].getboolean('wal', True))
+
+    # Development/CI only: per-request statement counts and N+1 warnings
+    profiling_config = settings['PROFILING'] if settings.has_section('PROFILING') else {}
+    sql_profiler = None
+    if os.environ.get('API_SQL_PROFILING', str(profiling_config.get('enabled', False))).lower() in ('1', 'true', 'yes'):
+        budget = profiling_config.get('query_budget')
+        sql_profiler = SQLProfiler(app, engine, budget=int(budget) if budget else None,
+                                   n_plus_one_threshold=int(profiling_config.get('n_plus_one_threshold', 3)))
+
+    cache_config = settings['CACHE']
+    notification_config = settings['NOTIFICATION_SERVICE']
+    database_config = settings['DATABASE']
+
+    writer = None
+    if database_config.getboolean('group_commit', False):
+        writer = GroupCommitWriter(
+            lambda alarms: write_alarm_group(app, alarms),
+            interval=database_config.getfloat('group_commit_interval_ms', 5) / 1000,
+            max_batch=database_config.getint('group_commit_max_batch', 200),
+        )
+
+    app.extensions['alarm_system'] = SimpleNamespace(
+        config=settings,
+        space_cache=TTLCache(maxsize=cache_config.getint('maxsize', 10000), ttl=cache_config.getint('ttl', 60)),
+        role_cache=TTLCache(maxsize=cache_config.getint('maxsize', 10000), ttl=cache_config.getint('ttl', 60)),
+        alarm_feed=AlarmFeed(capacity=settings['ALARMS'].getint('feed_capacity', 500)),
+        coalescer=AlarmCoalescer(window=settings['ALARMS'].getint('coalesce_window', 30)),
+        # Per-space overrides live in [RATE_LIMIT_SPACE_<space_id>] sections
+        rate_limiter=RateLimiter(
+            load_rate_limits(settings['RATE_LIMIT']),
+            overrides={int(name.rsplit('_', 1)[1]): load_rate_limits(settings[name])
+                       for name in settings.sections() if name.startswith('RATE_LIMIT_SPACE_')},
+            enabled=settings['RATE_LIMIT'].getboolean('enabled', True),
+        ),
+        dispatcher=NotificationDispatcher(
+            notification_config['url'],
+            lambda limit: claim_outbox(app, limit),
+            lambda delivered, failed: complete_outbox(app, delivered, failed),
+            workers=notification_config.getint('workers', 4),
+            pool_size=notification_config.getint('pool_size', 4),
+            timeout=notification_config.getfloat('timeout', 5.0),
+            batch_size=notification_config.getint('batch_size', 100),
+            poll_interval=notification_config.getfloat('poll_interval', 1.0),
+            retry_base=notification_config.getfloat('retry_base', 1.0),
+            retry_max=notification_config.getfloat('retry_max', 300.0),
+        ),
+        alarm_writer=writer,
+        alarm_archive=SegmentArchive(os.path.join(app.instance_path,
+                                                  settings['RETENTION'].get('directory', 'archive'))),
+        profiler=sql_profiler,
+        startup={"create_app_ms": round((time.perf_counter() - started) * 1000, 1)},
+    )
+    app.logger.info('Started in %(create_app_ms)s ms', app.extensions['alarm_system'].startup)
+    return app
+
+
 if __name__ == '__main__':
-    if config['DATABASE'].getboolean('AutoUpdate'):
-        with app.app_context():
+    app = create_app()
+    with app.app_context():
+        if config['DATABASE'].getboolean('AutoUpdate'):
             db.create_all()
-    app.run(port=int(config['DEFAULT']['port']), debug=True)
+        port = int(config['DEFAULT']['port'])
+    # Only the reloader's child serves requests, the parent just watches files
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        app.extensions['alarm_system'].dispatcher.start()
+    app.run(port=port, debug=True)
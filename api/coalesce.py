@@ -0,0 +1,42 @@
+import threading
+import time
+
+
+class AlarmCoalescer:
+    """In-memory index of recently raised alarms used to merge repeats.
+
+    An alarm is identified by (space_id, user_id, position, level); a repeat
+    within ``window`` seconds of the original alarm is merged into it.
+    """
+
+    def __init__(self, window=30):
+        self.window = window
+        self.merged = 0
+        self._recent = {}
+        self._lock = threading.Lock()
+        self._next_prune = 0
+
+    def match(self, key):
+        if self.window <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._recent.get(key)
+            if entry is None or entry[1] <= now:
+                return None
+            self.merged += 1
+            return entry[0]
+
+    def remember(self, key, alarm_id):
+        if self.window <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._recent[key] = (alarm_id, now + self.window)
+            if now >= self._next_prune:
+                self._recent = {k: v for k, v in self._recent.items() if v[1] > now}
+                self._next_prune = now + self.window
+
+    def stats(self):
+        with self._lock:
+            return {"window": self.window, "tracked": len(self._recent), "merged": self.merged}
@@ -0,0 +1,239 @@
+import heapq
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common.metrics import Counter, Histogram, registry
+
+NOTIFY_BATCHES = registry.add(Histogram('notify_fanout_duration_seconds',
+                                        'Time to deliver one batch of alarm notifications.', ('result',)))
+NOTIFY_DELIVERIES = registry.add(Counter('notify_deliveries_total', 'Alarm notifications by delivery result.',
+                                         ('result',)))
+
+
+class DeliveryQueue:
+    """Outbox rows waiting for a send worker, earliest ``deliver_by`` first.
+
+    The outbox sets ``deliver_by`` from the alarm level, so a recent critical
+    alarm overtakes older info and warning rows until their own deadline
+    comes, and no level waits behind the others indefinitely. Waits are
+    measured from the row's ``created_at`` and include its time in the outbox.
+    """
+
+    def __init__(self, levels=3):
+        self.levels = levels
+        self._heap = []
+        self._depths = [0] * levels
+        self._condition = threading.Condition()
+        self._waits = [{"count": 0, "total": 0.0, "max": 0.0} for _ in range(levels)]
+        self._recent_waits = [deque(maxlen=1000) for _ in range(levels)]
+
+    def level_of(self, item):
+        return min(max(int(item.level), 0), self.levels - 1)
+
+    def put(self, items):
+        # Levels first, so an item without a valid level leaves the queue untouched
+        levels = [self.level_of(item) for item in items]
+        with self._condition:
+            for level, item in zip(levels, items):
+                heapq.heappush(self._heap, (item.deliver_by, item.id, level, item))
+                self._depths[level] += 1
+            self._condition.notify_all()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._heap)
+
+    def wait_below(self, limit, timeout):
+        with self._condition:
+            self._condition.wait_for(lambda: len(self._heap) < limit, timeout)
+
+    def take(self, max_items):
+        """Blocks until at least one item is queued and returns up to ``max_items``."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._heap)
+            now = datetime.utcnow()
+            batch = []
+            while self._heap and len(batch) < max_items:
+                _, _, level, item = heapq.heappop(self._heap)
+                self._depths[level] -= 1
+                wait = max((now - item.created_at).total_seconds(), 0.0)
+                stats = self._waits[level]
+                stats["count"] += 1
+                stats["total"] += wait
+                stats["max"] = max(stats["max"], wait)
+                self._recent_waits[level].append(wait)
+                batch.append(item)
+            self._condition.notify_all()
+            return batch
+
+    def stats(self):
+        with self._condition:
+            levels = {}
+            for level in range(self.levels):
+                stats = self._waits[level]
+                recent = sorted(self._recent_waits[level])
+                levels[level] = {
+                    "depth": self._depths[level],
+                    "taken": stats["count"],
+                    "wait_avg": stats["total"] / stats["count"] if stats["count"] else 0.0,
+                    "wait_max": stats["max"],
+                    "wait_p95_recent": recent[int(len(recent) * 0.95)] if recent else 0.0,
+                }
+            return levels
+
+
+class NotificationDispatcher:
+    """Drains the notification outbox in the background.
+
+    A drain thread claims due outbox rows and puts them on a DeliveryQueue;
+    send workers take batches from it, earliest delivery deadline first, and
+    deliver each batch with one call to the notification service over a
+    shared keep-alive HTTP session. Failed rows are retried with exponential
+    backoff. Claiming and completing rows is done by the ``claim`` and
+    ``complete`` callables so this class knows nothing about the database.
+    """
+
+    def __init__(self, notify_url, claim, complete, workers=4, pool_size=4, timeout=5.0, batch_size=100,
+                 poll_interval=1.0, retry_base=1.0, retry_max=300.0):
+        self.notify_url = notify_url
+        self.claim = claim
+        self.complete = complete
+        self.workers = workers
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.queue = DeliveryQueue()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = None
+
+    def start(self):
+        # Threads are started on first use so importing the app (or the
+        # reloader parent process) does not spawn any.
+        if self._threads is not None:
+            return
+        with self._lock:
+            if self._threads is None:
+                self._threads = [threading.Thread(target=self._drain, name='notify-outbox', daemon=True)]
+                self._threads += [threading.Thread(target=self._work, name=f'notify-send-{i}', daemon=True)
+                                  for i in range(self.workers)]
+                for thread in self._threads:
+                    thread.start()
+
+    def wake(self):
+        self.start()
+        self._wake.set()
+
+    def retry_delay(self, attempts):
+        return min(self.retry_base * 2 ** attempts, self.retry_max)
+
+    def _drain(self):
+        queue_limit = self.batch_size * self.workers
+        while True:
+            # Claimed rows are leased, so only claim what the workers can take soon
+            self.queue.wait_below(queue_limit, self.poll_interval)
+            self._wake.clear()
+            room = queue_limit - len(self.queue)
+            if room <= 0:
+                continue
+            try:
+                batch = self.claim(room)
+            except Exception as e:
+                print(f"Failed to claim notification outbox: {e}")
+                batch = []
+
+            try:
+                self.queue.put(batch)
+            except Exception as e:
+                # One bad row must not stop delivery, the rest of the batch is queued without it
+                print(f"Failed to queue notification outbox batch: {e}")
+                self._put_each(batch)
+            if not batch:
+                self._wake.wait(self.poll_interval)
+
+    def _put_each(self, batch):
+        failed = []
+        for row in batch:
+            try:
+                self.queue.put([row])
+            except Exception as e:
+                failed.append((row.id, f'Not queued: {type(e).__name__}',
+                               datetime.utcnow() + timedelta(seconds=self.retry_delay(row.attempts))))
+        try:
+            self.complete([], failed)
+        except Exception as e:
+            print(f"Failed to update notification outbox: {e}")
+
+    def _work(self):
+        while True:
+            self._send(self.queue.take(self.batch_size))
+
+    def _send(self, batch):
+        start = time.perf_counter()
+        try:
+            response = self.session.post(
+                f'{self.notify_url}/batch',
+                json={'notifications': [{'space_id': row.space_id, 'message': row.message} for row in batch]},
+                timeout=self.timeout
+            )
+            if response.status_code == 201:
+                results = response.json()['results']
+                delivered = [(row.id, result['recipients']) for row, result in zip(batch, results)]
+                error = None
+            else:
+                delivered = []
+                error = f'HTTP {response.status_code}'
+        except (requests.RequestException, ValueError, KeyError) as e:
+            delivered = []
+            error = type(e).__name__
+
+        NOTIFY_BATCHES.observe(time.perf_counter() - start, 'failed' if error else 'delivered')
+        NOTIFY_DELIVERIES.inc('failed' if error else 'delivered', amount=len(batch))
+
+        failed = []
+        if error:
+            print(f"Failed to deliver {len(batch)} notifications: {error}")
+            now = datetime.utcnow()
+            failed = [(row.id, error, now + timedelta(seconds=self.retry_delay(row.attempts))) for row in batch]
+
+        try:
+            self.complete(delivered, failed)
+        except Exception as e:
+            print(f"Failed to update notification outbox: {e}")
+
+    def stats(self):
+        return {"levels": self.queue.stats()}
+
+    @staticmethod
+    def subscription_payload(user):
+        return {
+            'user_id': user.id,
+            'space_id': user.space_id,
+            'username': user.username,
+            'email': user.email,
+            'alarmed': user.role == 'alarmed'
+        }
+
+    def sync_subscription(self, subscriptions_url, user):
+        return self.session.put(f'{subscriptions_url}/{user.id}', json=self.subscription_payload(user),
+                                timeout=self.timeout)
+
+    def sync_subscriptions(self, subscriptions_url, subscriptions):
+        return self.session.put(f'{subscriptions_url}/bulk', json={'subscriptions': subscriptions},
+                                timeout=self.timeout)
+
+    def remove_subscription(self, subscriptions_url, user_id):
+        return self.session.delete(f'{subscriptions_url}/{user_id}', timeout=self.timeout)
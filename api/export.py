@@ -0,0 +1,31 @@
+import json
+import zlib
+from datetime import datetime
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def ndjson_chunks(rows, batch_size=1000):
+    """Serialize dict rows as newline-delimited JSON, ``batch_size`` lines per chunk."""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, default=_default))
+        if len(lines) >= batch_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress text chunks into a single gzip stream on the fly."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,73 @@
+import bisect
+import threading
+
+
+class AlarmFeed:
+    """Per-space ring buffer of recently committed alarms for live feeds.
+
+    Events are ``(alarm_id, data)`` pairs kept in id order. A subscriber
+    that last saw ``last_id`` can be served from memory as long as nothing
+    newer than ``last_id`` has been dropped from the buffer, and nothing was
+    committed before this process started publishing.
+    """
+
+    def __init__(self, capacity=500):
+        self.capacity = capacity
+        self.published = 0
+        self._events = {}
+        self._floors = {}
+        self._process_floor = None
+        self._lock = threading.Lock()
+        self._conditions = {}
+
+    def _condition(self, space_id):
+        condition = self._conditions.get(space_id)
+        if condition is None:
+            condition = self._conditions.setdefault(space_id, threading.Condition(self._lock))
+        return condition
+
+    def publish(self, space_id, alarm_id, data):
+        with self._lock:
+            if self._process_floor is None:
+                self._process_floor = alarm_id - 1
+            events = self._events.setdefault(space_id, [])
+            bisect.insort(events, (alarm_id, data), key=lambda event: event[0])
+            if len(events) > self.capacity:
+                dropped = events[:len(events) - self.capacity]
+                del events[:len(events) - self.capacity]
+                self._floors[space_id] = max(self._floors.get(space_id, 0), dropped[-1][0])
+            self.published += 1
+            self._condition(space_id).notify_all()
+
+    def latest_id(self, space_id):
+        with self._lock:
+            events = self._events.get(space_id)
+            return events[-1][0] if events else 0
+
+    def _complete_after(self, space_id, last_id):
+        if self._process_floor is None:
+            return False
+        return last_id >= max(self._floors.get(space_id, 0), self._process_floor)
+
+    def wait(self, space_id, last_id, timeout=15):
+        """Events newer than ``last_id``, waiting up to ``timeout`` seconds for one.
+
+        Returns ``(events, complete)``; ``complete`` is False when alarms
+        after ``last_id`` may have been missed and must be re-read elsewhere.
+        """
+        with self._lock:
+            condition = self._condition(space_id)
+            events = self._events.get(space_id, [])
+            if not events or events[-1][0] <= last_id:
+                condition.wait(timeout)
+                events = self._events.get(space_id, [])
+            start = bisect.bisect_right(events, last_id, key=lambda event: event[0])
+            return events[start:], self._complete_after(space_id, last_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "spaces": len(self._events),
+                "buffered": sum(len(events) for events in self._events.values()),
+                "published": self.published,
+            }
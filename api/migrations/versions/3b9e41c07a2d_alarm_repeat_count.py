@@ -0,0 +1,26 @@
+"""alarm repeat count
+
+Revision ID: 3b9e41c07a2d
+Revises: 150c56de07ed
+Create Date: 2026-10-18 09:12:40.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9e41c07a2d'
+down_revision = '150c56de07ed'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('alarm', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('repeat_count', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('alarm', schema=None) as batch_op:
+        batch_op.drop_column('repeat_count')
@@ -0,0 +1,39 @@
+"""alarm autoincrement
+
+Revision ID: 7fc76b5b8d9f
+Revises: 26d2e772d533
+Create Date: 2026-10-18 08:23:59.926861
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+
+
+# revision identifiers, used by Alembic.
+revision = '7fc76b5b8d9f'
+down_revision = '26d2e772d533'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite only stops reusing the ids of deleted (archived) rows with AUTOINCREMENT, which needs a new table
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('alarm', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+        pass
+    # Rows archived before this revision keep their ids taken
+    archived = current_app.extensions['alarm_system'].alarm_archive.max_id()
+    op.execute(sa.text("UPDATE sqlite_sequence SET seq = max(seq, :archived) WHERE name = 'alarm'")
+               .bindparams(archived=archived))
+    op.execute(sa.text("INSERT INTO sqlite_sequence (name, seq) SELECT 'alarm', :archived "
+                       "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'alarm')")
+               .bindparams(archived=archived))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('alarm', recreate='always'):
+        pass
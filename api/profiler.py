@@ -0,0 +1,100 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+_IN_LIST = re.compile(r'\(\?(?:, \?)+\)')
+_LITERAL = re.compile(r"'[^']*'|\b\d+\b")
+
+
+def statement_shape(statement):
+    """Statement with literals and IN-list lengths removed, for spotting repeats."""
+    return _LITERAL.sub('?', _IN_LIST.sub('(?)', ' '.join(statement.split())))
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class SQLProfiler:
+    """Opt-in per-request SQL statement recorder.
+
+    Every statement run while handling a request is recorded with its
+    duration. The totals go into an ``X-SQL-Queries`` response header and a
+    log line; statement shapes repeated ``n_plus_one_threshold`` times or
+    more are reported as N+1 suspects. Requests over ``budget`` statements
+    are logged, or raise inside ``expect_at_most`` for use in tests.
+    """
+
+    def __init__(self, app, engine, budget=None, n_plus_one_threshold=3):
+        self.app = app
+        self.budget = budget
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.last = None
+        self._strict_budget = None
+        if app.logger.level == logging.NOTSET:
+            app.logger.setLevel(logging.INFO)
+
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        event.listen(engine, 'handle_error', self._discard)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _start(self):
+        g.sql_profile = []
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'sql_profile' in g:
+            conn.info.setdefault('profile_start', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'sql_profile' in g and conn.info.get('profile_start'):
+            g.sql_profile.append((statement, time.perf_counter() - conn.info['profile_start'].pop()))
+
+    def _discard(self, context):
+        if context.connection is not None and context.connection.info.get('profile_start'):
+            context.connection.info['profile_start'].pop()
+
+    def suspects(self, statements):
+        shapes = Counter(statement_shape(statement) for statement, _ in statements)
+        return {shape: count for shape, count in shapes.items() if count >= self.n_plus_one_threshold}
+
+    def _finish(self, response):
+        statements = g.pop('sql_profile', None)
+        if statements is None:
+            return response
+
+        total_ms = sum(duration for _, duration in statements) * 1000
+        suspects = self.suspects(statements)
+        route = request.url_rule.rule if request.url_rule else request.path
+        self.last = {"route": route, "queries": len(statements), "total_ms": total_ms,
+                     "statements": [statement for statement, _ in statements], "suspects": suspects}
+
+        response.headers['X-SQL-Queries'] = f'count={len(statements)}; total_ms={total_ms:.2f}'
+        self.app.logger.info('%s %s: %d queries in %.2f ms', request.method, route, len(statements), total_ms)
+        for shape, count in suspects.items():
+            response.headers['X-SQL-N-Plus-One'] = str(len(suspects))
+            self.app.logger.warning('%s %s: possible N+1, %d x %s', request.method, route, count, shape)
+
+        budget = self._strict_budget if self._strict_budget is not None else self.budget
+        if budget is not None and len(statements) > budget:
+            self.app.logger.warning('%s %s: %d queries exceeds budget of %d', request.method, route,
+                                    len(statements), budget)
+            if self._strict_budget is not None:
+                raise QueryBudgetExceeded(f'{request.method} {route} ran {len(statements)} queries, '
+                                          f'budget is {budget}:\n' + '\n'.join(self.last['statements']))
+        return response
+
+    @contextmanager
+    def expect_at_most(self, budget):
+        """Fail any request made inside the block that runs more than ``budget`` queries."""
+        self._strict_budget = budget
+        try:
+            yield self
+        finally:
+            self._strict_budget = None
@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+
+class RateLimiter:
+    """In-process token buckets keyed by (scope, ...) tuples.
+
+    ``limits`` maps a scope name to ``(rate, burst)``: ``rate`` tokens are
+    added per second up to ``burst``. A bucket that is idle long enough to
+    refill is indistinguishable from a new one, so least recently used
+    buckets can be dropped once more than ``max_buckets`` exist.
+    """
+
+    def __init__(self, limits, overrides=None, enabled=True, max_buckets=100000):
+        self.limits = limits
+        self.overrides = overrides or {}
+        self.enabled = enabled
+        self.max_buckets = max_buckets
+        self.allowed = defaultdict(int)
+        self.limited = defaultdict(int)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def limit_for(self, scope, space_id=None):
+        return self.overrides.get(space_id, {}).get(scope, self.limits[scope])
+
+    def take(self, *keys):
+        """Take one token from every ``(scope, key, space_id)`` bucket.
+
+        Returns 0 if all buckets had a token, otherwise the number of seconds
+        until they will; no tokens are taken in that case.
+        """
+        if not self.enabled:
+            return 0
+
+        now = time.monotonic()
+        with self._lock:
+            buckets = []
+            retry_after = 0
+            for scope, key, space_id in keys:
+                rate, burst = self.limit_for(scope, space_id)
+                bucket_key = (scope, key)
+                tokens, updated = self._buckets.get(bucket_key, (burst, now))
+                tokens = min(burst, tokens + (now - updated) * rate)
+                buckets.append((bucket_key, tokens))
+                if tokens < 1:
+                    self.limited[scope] += 1
+                    retry_after = max(retry_after, (1 - tokens) / rate if rate > 0 else 60)
+
+            if retry_after:
+                for bucket_key, tokens in buckets:
+                    self._store(bucket_key, tokens, now)
+                return retry_after
+
+            for bucket_key, tokens in buckets:
+                self._store(bucket_key, tokens - 1, now)
+            for scope, _, _ in keys:
+                self.allowed[scope] += 1
+            return 0
+
+    def _store(self, bucket_key, tokens, now):
+        self._buckets[bucket_key] = (tokens, now)
+        self._buckets.move_to_end(bucket_key)
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "buckets": len(self._buckets),
+                "allowed": dict(self.allowed),
+                "limited": dict(self.limited),
+            }
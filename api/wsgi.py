@@ -0,0 +1,15 @@
+"""WSGI entry point for a single worker process:
+
+    gunicorn -w 1 --threads 16 -b :7070 wsgi:app
+
+Run exactly one worker. Rate limit buckets, the alarm coalescer and the
+live alarm feed are kept in process memory, so with several workers every
+limit is multiplied by the worker count, repeats that reach different
+workers are not merged, and a stream only sees alarms raised through its
+own worker. Scale with ``--threads``; each open alarm stream holds a thread.
+"""
+from app import create_app
+
+app = create_app()
+# Deliver rows left undelivered by a previous run without waiting for the first request
+app.extensions['alarm_system'].dispatcher.start()
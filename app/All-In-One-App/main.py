@@ -95,6 +95,8 @@ class AlarmScreen(BoxLayout):
 
             if response.status_code == 201:
                 self.result_label.text = "Alarm triggered successfully"
+            elif response.status_code == 200 and response.json().get('coalesced'):
+                self.result_label.text = "Alarm already active, everyone has been notified"
             else:
                 self.result_label.text = "Failed to trigger alarm"
         else:
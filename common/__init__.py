@@ -0,0 +1,5 @@
+"""Modules shared by the API (api/) and the notification service (notifySys/).
+
+Both services run from their own directory and add the repository root to
+``sys.path`` before importing from here.
+"""
@@ -0,0 +1,114 @@
+import gzip
+import json
+import os
+from datetime import date, datetime
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Cannot archive {type(value).__name__}')
+
+
+class SegmentArchive:
+    """Append-only gzip NDJSON segments, one file per ``key`` value per month.
+
+    Every ``append`` adds a new gzip member to the end of a segment; gzip
+    readers treat consecutive members as one stream, so a segment is never
+    rewritten. Rows are flushed to disk before ``append`` returns, so the
+    caller can delete them from the database afterwards. If that delete is
+    lost the rows are archived twice, which ``read`` hides by row id.
+
+    Next to each segment a small file records the lowest and highest row id
+    in it, so ``id_range`` lets readers skip segments without opening them,
+    and ``max_id`` keeps the highest id ever archived so archived ids are not
+    handed out again.
+    """
+
+    def __init__(self, directory, key='space_id'):
+        self.directory = directory
+        self.key = key
+        self.prefix = key[:-len('_id')] if key.endswith('_id') else key
+
+    def segment_path(self, value, month):
+        name = 'unassigned' if value is None else int(value)
+        return os.path.join(self.directory, f'{self.prefix}_{name}', f'{month}.ndjson.gz')
+
+    def append(self, rows):
+        segments = {}
+        for row in rows:
+            segments.setdefault((row[self.key], row['timestamp'].strftime('%Y-%m')), []).append(row)
+
+        if rows:
+            os.makedirs(self.directory, exist_ok=True)
+            self._write_json(os.path.join(self.directory, 'max_id'), max([self.max_id()] + [row['id'] for row in rows]))
+        for (value, month), segment_rows in segments.items():
+            path = self.segment_path(value, month)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # The range is widened before the rows are written, so it never misses a row that made it to disk
+            self._widen_id_range(value, month, [row['id'] for row in segment_rows], os.path.exists(path))
+            with open(path, 'ab') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='ab') as f:
+                    f.write(''.join(json.dumps(row, default=_default) + '\n' for row in segment_rows).encode())
+                raw.flush()
+                os.fsync(raw.fileno())
+        return len(rows)
+
+    def _widen_id_range(self, value, month, ids, segment_exists):
+        current = self.id_range(value, month)
+        if current is None and segment_exists:
+            # Segment written before ranges were kept, its range stays unknown
+            return
+        low, high = current or (min(ids), max(ids))
+        self._write_json(self.segment_path(value, month) + '.ids', [min(low, min(ids)), max(high, max(ids))])
+
+    def _write_json(self, path, value):
+        with open(path + '.tmp', 'w') as f:
+            json.dump(value, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    def max_id(self):
+        """Highest row id ever archived, 0 for an empty archive."""
+        try:
+            with open(os.path.join(self.directory, 'max_id')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            pass
+        # Archive written before the high-water mark was kept
+        highest = 0
+        names = os.listdir(self.directory) if os.path.isdir(self.directory) else []
+        for name in names:
+            if not name.startswith(f'{self.prefix}_'):
+                continue
+            value = name[len(self.prefix) + 1:]
+            value = None if value == 'unassigned' else int(value)
+            for month in self.months(value):
+                id_range = self.id_range(value, month)
+                ids = [id_range[1]] if id_range else [row['id'] for row in self.read(value, month)]
+                highest = max([highest] + ids)
+        return highest
+
+    def id_range(self, value, month):
+        """``(lowest, highest)`` row id in a segment, or None if unknown."""
+        try:
+            with open(self.segment_path(value, month) + '.ids') as f:
+                return tuple(json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def months(self, value):
+        directory = os.path.dirname(self.segment_path(value, 'month'))
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-len('.ndjson.gz')] for name in os.listdir(directory) if name.endswith('.ndjson.gz'))
+
+    def read(self, value, month):
+        rows = {}
+        with gzip.open(self.segment_path(value, month), 'rt') as f:
+            for line in f:
+                row = json.loads(line)
+                row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+                rows[row['id']] = row
+        return list(rows.values())
@@ -0,0 +1,50 @@
+import os
+import weakref
+
+import click
+from sqlalchemy import event
+
+from common.metrics import instrument
+
+
+# Engines of every app built in this process. Forked workers open their own connections instead of
+# sharing the parent's; one fork hook covers them all however often an app is created
+_engines = weakref.WeakSet()
+
+
+def _dispose_engines():
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_dispose_engines)
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run alongside the writer, NORMAL syncs on checkpoints instead of every commit,
+    # and the busy timeout keeps workers sharing the file from failing on each other's locks
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA busy_timeout=5000')
+    cursor.close()
+
+
+def init_database(app, db, wal=True):
+    """Connection setup shared by the API and notifySys; returns the engine.
+
+    Only builds the engine, no connection is opened, so the app can still be
+    created in a parent process and forked into workers.
+    """
+    if click.get_current_context(silent=True) is not None:
+        # `flask db ...` needs Migrate, a served app does not and alembic is slow to import
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name == 'sqlite' and wal:
+        event.listen(engine, 'connect', set_sqlite_pragmas)
+    instrument(app, engine)
+    _engines.add(engine)
+    return engine
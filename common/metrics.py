@@ -0,0 +1,149 @@
+import bisect
+import threading
+import time
+
+from flask import g, request
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.label_names, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                # One slot per bucket plus +Inf, then sum
+                counts = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, counts in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else repr(float(bound))
+                    lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, [("le", le)])} {cumulative}')
+                lines.append(f'{self.name}_sum{_labels(self.label_names, labels)} {counts[-1]}')
+                lines.append(f'{self.name}_count{_labels(self.label_names, labels)} {cumulative}')
+        return lines
+
+
+class Gauge:
+    """Value read from ``collect`` at scrape time: a number or a {labels: number} dict."""
+
+    def __init__(self, name, documentation, collect, labels=(), kind='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.collect = collect
+        self.label_names = tuple(labels)
+        self.kind = kind
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            if not isinstance(labels, tuple):
+                labels = (labels,)
+            lines.append(f'{self.name}{_labels(self.label_names, labels)} {value}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUESTS = registry.add(Counter('http_requests_total', 'HTTP requests by route and status.',
+                                ('method', 'route', 'status')))
+REQUEST_LATENCY = registry.add(Histogram('http_request_duration_seconds', 'HTTP request latency by route.',
+                                         ('method', 'route')))
+DB_QUERIES = registry.add(Counter('db_queries_total', 'SQL statements executed.'))
+DB_LATENCY = registry.add(Histogram('db_query_duration_seconds', 'SQL statement execution time.'))
+
+
+def instrument(app, engine):
+    """Record request and SQL statement counts and latencies for ``app``."""
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUESTS.inc(request.method, route, str(response.status_code))
+            REQUEST_LATENCY.observe(time.perf_counter() - start, request.method, route)
+        return response
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def record_query(conn, cursor, statement, parameters, context, executemany):
+        DB_QUERIES.inc()
+        DB_LATENCY.observe(time.perf_counter() - conn.info['metrics_start'].pop())
+
+    @event.listens_for(engine, 'handle_error')
+    def discard_query(context):
+        if context.connection is not None and context.connection.info.get('metrics_start'):
+            context.connection.info['metrics_start'].pop()
@@ -0,0 +1,26 @@
+import hashlib
+import hmac
+import time
+
+
+def _sign(secret, payload):
+    return hmac.new(secret.encode(), payload.encode(), hashlib.sha256).hexdigest()
+
+
+def issue_token(secret, user_id, ttl):
+    """Token a client presents when connecting to the notification service's Socket.IO namespace."""
+    payload = f'{user_id}.{int(time.time()) + ttl}'
+    return f'{payload}.{_sign(secret, payload)}'
+
+
+def read_token(secret, token):
+    """Returns the user ID of a valid, unexpired token, else None."""
+    if not isinstance(token, str) or token.count('.') != 2:
+        return None
+    payload, signature = token.rsplit('.', 1)
+    if not hmac.compare_digest(signature, _sign(secret, payload)):
+        return None
+    user_id, expires = payload.split('.')
+    if int(expires) < time.time():
+        return None
+    return int(user_id)
@@ -0,0 +1,143 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Single writer thread that commits queued rows in groups.
+
+    Callers ``submit`` an item and get a future back, which they may wait on
+    or not. While other items are queued the writer collects them for up to
+    ``interval`` seconds (or ``max_batch`` items) and passes them to
+    ``write_batch``, which must write them in one transaction and return one
+    result per item. If a group fails, its items are retried one by one so a
+    single bad row only fails its own future. ``close`` writes everything
+    submitted before it and stops the thread.
+    """
+
+    def __init__(self, write_batch, interval=0.005, max_batch=200):
+        self.write_batch = write_batch
+        self.interval = interval
+        self.max_batch = max_batch
+        self.batches = 0
+        self.items = 0
+        self.closed = False
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, item):
+        future = Future()
+        # Under the lock, so nothing can be queued behind the stop marker of close
+        with self._lock:
+            if self.closed:
+                raise RuntimeError('Writer is closed')
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+                self._thread.start()
+            self._queue.put((item, future))
+        return future
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            if entry is _STOP:
+                return
+            batch = [entry]
+            # A lone item is written straight away; only when others are
+            # already queued is it worth waiting up to interval for more.
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.max_batch:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    timeout = deadline - time.monotonic()
+                    if len(batch) == 1 or timeout <= 0:
+                        break
+                    try:
+                        entry = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                if entry is _STOP:
+                    self._write(batch)
+                    return
+                batch.append(entry)
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            results = self.write_batch([item for item, _ in batch])
+        except Exception as e:
+            if len(batch) > 1:
+                for entry in batch:
+                    self._write([entry])
+            else:
+                batch[0][1].set_exception(e)
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def close(self, timeout=30):
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put(_STOP)
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "average_batch": self.items / self.batches if self.batches else 0,
+            "pending": self._queue.qsize(),
+        }
+
+
+class IdAllocator:
+    """Hands out row IDs before the rows are written.
+
+    Every process only uses IDs equal to ``offset`` modulo ``stride``, so
+    workers given distinct offsets never collide. Allocation starts above
+    ``load_max()`` and jumps past every ID ``observe``d from other workers,
+    which keeps IDs roughly in time order across workers for since_id cursors.
+    """
+
+    def __init__(self, load_max, stride=1, offset=0):
+        self.load_max = load_max
+        self.stride = stride
+        self.offset = offset
+        self._next = None
+        self._lock = threading.Lock()
+
+    def configure(self, stride, offset):
+        with self._lock:
+            self.stride = stride
+            self.offset = offset
+            self._next = None
+
+    def _above(self, value):
+        # Smallest ID greater than value that belongs to this process
+        return value + 1 + (self.offset - value - 1) % self.stride
+
+    def take(self, count=1):
+        with self._lock:
+            if self._next is None:
+                self._next = self._above(self.load_max())
+            ids = list(range(self._next, self._next + count * self.stride, self.stride))
+            self._next += count * self.stride
+            return ids
+
+    def observe(self, value):
+        with self._lock:
+            if self._next is not None and value >= self._next:
+                self._next = self._above(value)
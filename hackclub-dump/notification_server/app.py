@@ -1,17 +1,125 @@
+import argparse
+import random
+import threading
+import time
+
 from flask import Flask, request, jsonify
 
 app = Flask(__name__)
 
+# Injected behaviour, set from the command line or with POST /stub/config
+stub_config = {"latency_ms": 0.0, "jitter_ms": 0.0, "error_rate": 0.0, "quiet": False}
+
+subscriptions = {}
+deliveries = []
+lock = threading.Lock()
+
+
+def simulate():
+    # Returns an error response for a share of calls, after sleeping the injected latency
+    delay = stub_config["latency_ms"] + random.uniform(0, stub_config["jitter_ms"])
+    if delay:
+        time.sleep(delay / 1000)
+    if random.random() < stub_config["error_rate"]:
+        return jsonify({"error": "Injected failure"}), 503
+    return None
+
+
+def record(space_id, user_id, message):
+    received_at = time.time()
+    with lock:
+        deliveries.append({"space_id": space_id, "user_id": user_id, "message": message, "received_at": received_at})
+    if not stub_config["quiet"]:
+        print(f"Sending notification to {'space ' + str(space_id) if space_id else 'user ' + str(user_id)}: {message}")
+
 
 @app.route('/notify/<int:user_id>', methods=['POST'])
 def notify(user_id):
-    data = request.json
+    failed = simulate()
+    if failed:
+        return failed
 
-    # Send Notification
-    print(f"Sending notification to user {user_id}: {data}")
+    record(None, user_id, request.json.get('message'))
 
     return jsonify({"status": "Notification sent"}), 200
 
 
+@app.route('/notify/space/<int:space_id>', methods=['POST'])
+def notify_space(space_id):
+    failed = simulate()
+    if failed:
+        return failed
+
+    record(space_id, None, request.json.get('message'))
+    return jsonify({"message": "Notification sent successfully",
+                    "recipients": sorted(subscriptions.get(space_id, ()))}), 201
+
+
+@app.route('/notify/batch', methods=['POST'])
+def notify_batch():
+    failed = simulate()
+    if failed:
+        return failed
+
+    results = []
+    for entry in request.json.get('notifications', []):
+        record(entry['space_id'], None, entry['message'])
+        results.append({"recipients": sorted(subscriptions.get(entry['space_id'], ()))})
+    return jsonify({"results": results}), 201
+
+
+def apply_subscription(entry):
+    with lock:
+        for members in subscriptions.values():
+            members.discard(entry['user_id'])
+        if entry.get('alarmed'):
+            subscriptions.setdefault(entry['space_id'], set()).add(entry['user_id'])
+
+
+@app.route('/subscriptions/<int:user_id>', methods=['PUT'])
+def put_subscription(user_id):
+    apply_subscription(dict(request.json, user_id=user_id))
+    return jsonify({"message": "Subscription updated successfully"}), 200
+
+
+@app.route('/subscriptions/bulk', methods=['PUT'])
+def put_subscriptions_bulk():
+    entries = request.json.get('subscriptions', [])
+    for entry in entries:
+        apply_subscription(entry)
+    return jsonify({"message": "Subscriptions updated successfully", "count": len(entries)}), 200
+
+
+@app.route('/subscriptions/<int:user_id>', methods=['DELETE'])
+def delete_subscription(user_id):
+    apply_subscription({"user_id": user_id})
+    return jsonify({"message": "Subscription deleted successfully"}), 200
+
+
+@app.route('/stub/config', methods=['GET', 'POST'])
+def configure():
+    if request.method == 'POST':
+        stub_config.update({key: type(stub_config[key])(value) for key, value in request.json.items()
+                            if key in stub_config})
+    return jsonify(stub_config), 200
+
+
+@app.route('/stub/deliveries', methods=['GET', 'DELETE'])
+def get_deliveries():
+    with lock:
+        if request.method == 'DELETE':
+            deliveries.clear()
+        return jsonify({"count": len(deliveries), "deliveries": deliveries}), 200
+
+
 if __name__ == '__main__':
-    app.run(port=5001, debug=True)
+    parser = argparse.ArgumentParser(description='Stand-in for the notification service.')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Delay added to every notify call.')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Random extra delay up to this value.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of notify calls answered with 503.')
+    parser.add_argument('--quiet', action='store_true', help='Do not print every notification.')
+    args = parser.parse_args()
+    stub_config.update(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                       quiet=args.quiet)
+    app.run(port=args.port, debug=not args.quiet, threaded=True)
@@ -0,0 +1,39 @@
+"""notification autoincrement
+
+Revision ID: 6d992005923c
+Revises: 064e7a51d600
+Create Date: 2026-10-18 08:24:01.265732
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+
+
+# revision identifiers, used by Alembic.
+revision = '6d992005923c'
+down_revision = '064e7a51d600'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite only stops reusing the ids of deleted (archived) rows with AUTOINCREMENT, which needs a new table
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('notification', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+        pass
+    # Rows archived before this revision keep their ids taken
+    archived = current_app.extensions['notification_archive'].max_id()
+    op.execute(sa.text("UPDATE sqlite_sequence SET seq = max(seq, :archived) WHERE name = 'notification'")
+               .bindparams(archived=archived))
+    op.execute(sa.text("INSERT INTO sqlite_sequence (name, seq) SELECT 'notification', :archived "
+                       "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'notification')")
+               .bindparams(archived=archived))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('notification', recreate='always'):
+        pass
@@ -1,34 +1,75 @@
-from flask import Flask, request, jsonify
+import atexit
+import os
+import sys
+import time
+import weakref
+
+import click
+from flask import Blueprint, Flask, Response, current_app, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from flask_socketio import SocketIO, emit
-from datetime import datetime
+from flask_socketio import SocketIO, join_room
+from datetime import datetime, timedelta
+from sqlalchemy import delete, or_, select, update
+from socketio import PubSubManager
+from werkzeug.local import LocalProxy
+
+# Modules shared with the API live in the common package at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.archive import SegmentArchive  # noqa: E402
+from common.database import init_database  # noqa: E402
+from common.metrics import Counter, Gauge, registry  # noqa: E402
+from common.socket_token import read_token  # noqa: E402
+from common.writer import GroupCommitWriter, IdAllocator  # noqa: E402
+
+from notify_bus import queue_options  # noqa: E402
+from notify_cache import RecentNotifications  # noqa: E402
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///notifications.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+db = SQLAlchemy()
+socketio = SocketIO()
+bp = Blueprint('notify', __name__, cli_group=None)
 
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-socketio = SocketIO(app)
+notification_archive = LocalProxy(lambda: current_app.extensions['notification_archive'])
+recent_notifications = LocalProxy(lambda: current_app.extensions['recent_notifications'])
+notification_writer = LocalProxy(lambda: current_app.extensions['notification_writer'])
+notification_ids = LocalProxy(lambda: current_app.extensions['notification_ids'])
+
+connected_clients = 0
 
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=True)
+    # Highest notification ID the user has acknowledged, everything above it is unread
+    read_up_to = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     notifications = db.relationship('Notification', back_populates='user', lazy=True)
+    subscriptions = db.relationship('Subscription', back_populates='user', lazy=True, cascade='all, delete-orphan')
 
 
 class Notification(db.Model):
+    __table_args__ = (
+        db.Index('ix_notification_user_id_id', 'user_id', 'id'),
+        # Ids of archived notifications are never reused, even once the highest one has left the table
+        {'sqlite_autoincrement': True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     message = db.Column(db.String(200), nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     user = db.relationship('User', back_populates='notifications')
+    space_id = db.Column(db.Integer, nullable=True)
+
+
+class Subscription(db.Model):
+    # Recipients of space-wide alarms, kept in sync by the API
+    space_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    user = db.relationship('User', back_populates='subscriptions')
 
 
-@app.route('/users/add', methods=['POST'])
+@bp.route('/users/add', methods=['POST'])
 def add_user():
     username = request.json.get('username')
     email = request.json.get('email')
@@ -46,7 +87,7 @@ def add_user():
     return jsonify({"message": "User created successfully", "user_id": new_user.id}), 201
 
 
-@app.route('/notify/<int:user_id>', methods=['POST'])
+@bp.route('/notify/<int:user_id>', methods=['POST'])
 def notify_user(user_id):
     message = request.json.get('message')
 
@@ -57,33 +98,500 @@ def notify_user(user_id):
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    new_notification = Notification(message=message, user_id=user_id)
-    db.session.add(new_notification)
-    db.session.commit()
+    notification_id, = notification_ids.take()
+    timestamp = datetime.utcnow()
+
+    # The row is only queued for the background writer, which commits it together with others
+    # accepted around the same time. Queued before the emit so a shutting down worker refuses it
+    # instead of delivering a notification it will not store
+    try:
+        written = notification_writer.submit({
+            "id": notification_id,
+            "message": message,
+            "timestamp": timestamp,
+            "user_id": user_id,
+            "space_id": None
+        })
+    except RuntimeError:
+        return jsonify({"error": "Notification service is shutting down"}), 503
+    written.add_done_callback(log_write_failure(current_app.logger, notification_id))
 
-    # Emit notification via WebSocket
-    socketio.emit('notification', {
+    # Emit notification via WebSocket, only the user's own connections are in their room
+    publish('notification', {
+        "id": notification_id,
         "user_id": user_id,
         "message": message,
-        "timestamp": new_notification.timestamp.isoformat()
-    }, namespace='/notify')
+        "timestamp": timestamp.isoformat()
+    }, to=user_room(user_id))
+
+    return jsonify({"message": "Notification accepted", "notification_id": notification_id}), 202
+
+
+def write_notifications(app, rows):
+    with app.app_context():
+        db.session.execute(Notification.__table__.insert(), rows)
+        db.session.commit()
+    return [row['id'] for row in rows]
+
+
+def log_write_failure(logger, notification_id):
+    def callback(future):
+        if future.exception() is not None:
+            logger.error('Failed to write notification %s: %s', notification_id, future.exception())
+    return callback
+
+
+def adopt_users(entries, user_ids):
+    # Users added through /users/add before the API pushed them have ids of their own. The one with an
+    # entry's username or email takes the API's id, keeping its notifications, instead of clashing with it
+    if not entries:
+        return set()
+    usernames = [entry['username'] for entry in entries]
+    emails = [entry['email'] for entry in entries if entry.get('email')]
+    legacy = (db.session.query(User.id, User.username, User.email)
+              .filter(User.id.notin_(user_ids), or_(User.username.in_(usernames), User.email.in_(emails)))
+              .all())
+    by_username = {row.username: row.id for row in legacy}
+    by_email = {row.email: row.id for row in legacy if row.email}
+
+    adopted = set()
+    for entry in entries:
+        legacy_id = by_username.get(entry['username']) or by_email.get(entry.get('email'))
+        if legacy_id is None or legacy_id in adopted:
+            continue
+        adopted.add(legacy_id)
+        for model in (Notification, Subscription):
+            model.query.filter_by(user_id=legacy_id).update({'user_id': entry['user_id']}, synchronize_session=False)
+        User.query.filter_by(id=legacy_id).update({'id': entry['user_id']}, synchronize_session=False)
+    return adopted
+
+
+def apply_subscriptions(entries):
+    # Upserts users and their space subscription for a whole batch in one transaction
+    user_ids = [entry['user_id'] for entry in entries]
+    users = {user.id: user for user in User.query.filter(User.id.in_(user_ids)).all()}
+    if adopt_users([entry for entry in entries if entry['user_id'] not in users], user_ids):
+        users = {user.id: user for user in User.query.filter(User.id.in_(user_ids)).all()}
+
+    for entry in entries:
+        user = users.get(entry['user_id'])
+        if user:
+            user.username = entry['username']
+            user.email = entry.get('email')
+        else:
+            db.session.add(User(id=entry['user_id'], username=entry['username'], email=entry.get('email')))
+
+    Subscription.query.filter(Subscription.user_id.in_(user_ids)).delete(synchronize_session=False)
+    db.session.add_all([Subscription(space_id=entry['space_id'], user_id=entry['user_id'])
+                        for entry in entries if entry.get('alarmed')])
+    db.session.commit()
+
+
+def invalid_subscription(entry):
+    return (not isinstance(entry, dict) or entry.get('user_id') is None or entry.get('space_id') is None
+            or not entry.get('username'))
+
+
+@bp.route('/subscriptions/<int:user_id>', methods=['PUT'])
+def put_subscription(user_id):
+    if not isinstance(request.json, dict):
+        return jsonify({"error": "Space ID and username are required"}), 400
+    entry = dict(request.json, user_id=user_id)
+    if invalid_subscription(entry):
+        return jsonify({"error": "Space ID and username are required"}), 400
+
+    apply_subscriptions([entry])
+    return jsonify({"message": "Subscription updated successfully"}), 200
+
+
+@bp.route('/subscriptions/bulk', methods=['PUT'])
+def put_subscriptions_bulk():
+    entries = request.json.get('subscriptions') if isinstance(request.json, dict) else None
+    if not isinstance(entries, list) or any(invalid_subscription(entry) for entry in entries):
+        return jsonify({"error": "Subscriptions with user ID, space ID and username are required"}), 400
+
+    apply_subscriptions(entries)
+    return jsonify({"message": "Subscriptions updated successfully", "count": len(entries)}), 200
+
+
+@bp.route('/subscriptions/<int:user_id>', methods=['DELETE'])
+def delete_subscription(user_id):
+    Subscription.query.filter_by(user_id=user_id).delete()
+    db.session.commit()
+    return jsonify({"message": "Subscription deleted successfully"}), 200
+
+
+def fan_out(space_id, message, timestamp):
+    # Adds one Notification per subscriber of the space to the session. IDs come from the same
+    # allocator as notify_user, whose rows may not be written yet
+    recipients = [user_id for user_id, in
+                  db.session.query(Subscription.user_id).filter_by(space_id=space_id).all()]
+    ids = notification_ids.take(len(recipients))
+    db.session.add_all([Notification(id=notification_id, message=message, user_id=user_id, space_id=space_id,
+                                     timestamp=timestamp)
+                        for notification_id, user_id in zip(ids, recipients)])
+    return recipients, ids
+
+
+def user_room(user_id):
+    return f'user_{user_id}'
+
+
+def remember(cache, event, payload):
+    # Keeps the recent-notification cache in step with the events sent to clients
+    if event == 'notification':
+        cache.add(payload['user_id'], {"id": payload['id'], "message": payload['message'],
+                                       "timestamp": datetime.fromisoformat(payload['timestamp'])})
+    elif event == 'notifications_read':
+        cache.mark_read(payload['user_id'], payload['read_up_to'])
+
+
+def follow_bus(manager, cache, ids):
+    # Events published by other workers pass through _handle_emit, their writes reach this worker's cache too
+    # and its next notification IDs stay above theirs
+    handle_emit = manager._handle_emit
+
+    def _handle_emit(message):
+        if isinstance(message['data'], list) and message['data'] and isinstance(message['data'][0], dict):
+            payload = message['data'][0]
+            remember(cache, message['event'], payload)
+            if message['event'] == 'notification':
+                ids.observe(payload['id'])
+        handle_emit(message)
+
+    manager._handle_emit = _handle_emit
+
+
+@bp.before_app_request
+def start_bus_listener():
+    # The Socket.IO server starts its client manager on the first client connect. Workers that
+    # only served HTTP so far still need the other workers' events to keep their cache current
+    server = socketio.server
+    if isinstance(server.manager, PubSubManager) and not server.manager_initialized:
+        server.manager_initialized = True
+        server.manager.initialize()
+
+
+def publish(event, payload, to):
+    remember(recent_notifications, event, payload)
+    SOCKET_EMITS.inc(event)
+    socketio.emit(event, payload, namespace='/notify', to=to)
+
+
+def emit_space(space_id, recipients, notification_ids, message, timestamp):
+    # One emit per subscriber's room carrying only their own notification, so the bytes sent grow with
+    # the subscribers and no client learns who else was notified
+    for user_id, notification_id in zip(recipients, notification_ids):
+        publish('notification', {
+            "id": notification_id,
+            "user_id": user_id,
+            "space_id": space_id,
+            "message": message,
+            "timestamp": timestamp.isoformat()
+        }, to=user_room(user_id))
+
+
+@bp.route('/notify/space/<int:space_id>', methods=['POST'])
+def notify_space(space_id):
+    message = request.json.get('message')
+
+    if not message:
+        return jsonify({"error": "Message is required"}), 400
+
+    timestamp = datetime.utcnow()
+    recipients, ids = fan_out(space_id, message, timestamp)
+    if not recipients:
+        return jsonify({"message": "No subscribers", "recipients": []}), 201
+
+    db.session.commit()
+
+    emit_space(space_id, recipients, ids, message, timestamp)
+
+    return jsonify({
+        "message": "Notification sent successfully",
+        "recipients": recipients,
+        "notification_ids": ids,
+    }), 201
 
-    return jsonify({"message": "Notification sent successfully"}), 201
 
+def invalid_notification(entry):
+    return not isinstance(entry, dict) or entry.get('space_id') is None or not entry.get('message')
 
-@app.route('/users/<int:user_id>/notifications', methods=['GET'])
+
+@bp.route('/notify/batch', methods=['POST'])
+def notify_batch():
+    entries = request.json.get('notifications') if isinstance(request.json, dict) else None
+    if not isinstance(entries, list) or any(invalid_notification(entry) for entry in entries):
+        return jsonify({"error": "Notifications with space ID and message are required"}), 400
+
+    timestamp = datetime.utcnow()
+    results = [fan_out(entry['space_id'], entry['message'], timestamp) for entry in entries]
+    db.session.commit()
+
+    for entry, (recipients, ids) in zip(entries, results):
+        if recipients:
+            emit_space(entry['space_id'], recipients, ids, entry['message'], timestamp)
+
+    return jsonify({"results": [{"recipients": recipients} for recipients, _ in results]}), 201
+
+
+MAX_PAGE_SIZE = 1000
+
+
+def user_notifications_query(user_id, since_id=0):
+    return (Notification.query
+            .filter(Notification.user_id == user_id, Notification.id > since_id)
+            .order_by(Notification.id))
+
+
+def unread_count_query(user_id, read_up_to):
+    # Counts only the index range above the watermark, not the user's whole history
+    return (db.session.query(db.func.count(Notification.id))
+            .filter(Notification.user_id == user_id, Notification.id > read_up_to))
+
+
+def latest_notification_id(user_id):
+    return db.session.query(db.func.max(Notification.id)).filter(Notification.user_id == user_id).scalar() or 0
+
+
+def queued_notification_ids(user_id, after):
+    # Accepted and emitted but maybe not written yet, every worker's emits reach the recent-notification cache
+    return recent_notifications.newer_than(user_id, max(after, latest_notification_id(user_id)))
+
+
+def unread_count(user):
+    return (unread_count_query(user.id, user.read_up_to).scalar()
+            + len(queued_notification_ids(user.id, user.read_up_to)))
+
+
+@bp.route('/users/<int:user_id>/notifications', methods=['GET'])
 def get_user_notifications(user_id):
+    # Reconnecting clients pass the last ID they have as since_id and page with limit
+    since_id = request.args.get('since_id', 0, type=int)
+    limit = request.args.get('limit', type=int)
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({"error": f"Limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+    include_archive = request.args.get('include_archive', type=int)
+
+    # Catch-up reads of recent history are answered from memory, so reconnect storms skip the database
+    recent = None if include_archive else recent_notifications.since(user_id, since_id, limit)
+    if recent is not None:
+        notifications, read_up_to = recent
+    else:
+        user = User.query.get(user_id)
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+
+        query = user_notifications_query(user_id, since_id)
+        if limit:
+            query = query.limit(limit)
+        rows = query.all()
+        if include_archive:
+            # A row archived just before a failed delete may still be hot, keep one copy
+            merged = {n.id: n for n in archived_notifications(user_id, since_id, limit) + rows if n.id > since_id}
+            rows = [merged[notification_id] for notification_id in sorted(merged)[:limit]]
+        notifications = [{"id": n.id, "message": n.message, "timestamp": n.timestamp} for n in rows]
+        read_up_to = user.read_up_to
+        if not include_archive and (not limit or len(rows) < limit):
+            # The read reached the newest row, so it holds everything above since_id
+            recent_notifications.load(user_id, since_id, notifications, read_up_to)
+            # Notifications still queued for the background writer are only in the cache
+            notifications, read_up_to = (recent_notifications.since(user_id, since_id, limit)
+                                         or (notifications, read_up_to))
+
+    return jsonify([dict(n, read=n['id'] <= read_up_to) for n in notifications]), 200
+
+
+@bp.route('/users/<int:user_id>/notifications/unread', methods=['GET'])
+def get_unread_count(user_id):
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    return jsonify({"read_up_to": user.read_up_to, "unread": unread_count(user)}), 200
+
+
+@bp.route('/users/<int:user_id>/notifications/ack', methods=['POST'])
+def ack_notifications(user_id):
+    up_to_id = request.json.get('up_to_id')
+    if not isinstance(up_to_id, int) or isinstance(up_to_id, bool) or up_to_id < 0:
+        return jsonify({"error": "up_to_id must be a notification ID"}), 400
+
     user = User.query.get(user_id)
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    notifications = Notification.query.filter_by(user_id=user_id).all()
-    notification_list = [{"id": n.id, "message": n.message, "timestamp": n.timestamp} for n in notifications]
+    # Acknowledges everything up to the given ID at once. The watermark never moves backwards, so late
+    # acks from another device are harmless, nor past the user's newest notification
+    latest = max([latest_notification_id(user_id)] + queued_notification_ids(user_id, 0))
+    moved = db.session.execute(update(User)
+                               .where(User.id == user_id, User.read_up_to < min(up_to_id, latest))
+                               .values(read_up_to=min(up_to_id, latest))).rowcount
+    db.session.commit()
+    db.session.refresh(user)
+
+    if moved:
+        # Lets the user's other connected devices clear the same notifications
+        publish('notifications_read', {"user_id": user_id, "read_up_to": user.read_up_to}, to=user_room(user_id))
+
+    return jsonify({"read_up_to": user.read_up_to, "unread": unread_count(user)}), 200
+
+
+def archived_notifications(user_id, since_id=0, limit=None):
+    # Segments are per user. One is only opened if its id range can still hold one of the first
+    # ``limit`` notifications after since_id
+    found = []
+    for month in notification_archive.months(user_id):
+        id_range = notification_archive.id_range(user_id, month)
+        if id_range is not None and (id_range[1] <= since_id
+                                     or limit and len(found) >= limit and id_range[0] > found[limit - 1].id):
+            continue
+        found += [Notification(**row) for row in notification_archive.read(user_id, month) if row['id'] > since_id]
+        found.sort(key=lambda notification: notification.id)
+    return found[:limit]
+
+
+def archive_notifications(before, batch_size):
+    archived = 0
+    while True:
+        rows = db.session.execute(select(Notification.__table__)
+                                  .where(Notification.timestamp < before)
+                                  .order_by(Notification.id)
+                                  .limit(batch_size)).all()
+        if not rows:
+            return archived
+        notification_archive.append([row._asdict() for row in rows])
+        db.session.execute(delete(Notification).where(Notification.id.in_([row.id for row in rows])))
+        db.session.commit()
+        archived += len(rows)
+
+
+@bp.cli.command('archive-notifications')
+@click.option('--days', type=int, help='Archive notifications older than this many days.')
+def archive_notifications_command(days):
+    """Move old notifications out of the database into monthly archive segments."""
+    if days is None:
+        days = current_app.config['NOTIFICATION_RETENTION_DAYS']
+    before = datetime.utcnow() - timedelta(days=days)
+    archived = archive_notifications(before, current_app.config['ARCHIVE_BATCH_SIZE'])
+    click.echo(f'Archived {archived} notifications older than {before.isoformat()} to {notification_archive.directory}')
+
+
+@socketio.on('connect', namespace='/notify')
+def client_connected(auth=None):
+    # Clients authenticate with the token the API's verify_user returns, as auth or ?token=
+    token = auth.get('token') if isinstance(auth, dict) else request.args.get('token')
+    user_id = read_token(current_app.config['SOCKET_TOKEN_SECRET'], token)
+    if user_id is None:
+        SOCKET_REJECTS.inc()
+        return False
+
+    join_room(user_room(user_id))
+    global connected_clients
+    connected_clients += 1
+    SOCKET_CONNECTS.inc()
+
+
+@socketio.on('disconnect', namespace='/notify')
+def client_disconnected(*args):
+    global connected_clients
+    connected_clients -= 1
+
+
+def max_notification_id(app):
+    # Archived notifications are gone from the table but their ids stay taken
+    with app.app_context():
+        hot = db.session.query(db.func.max(Notification.id)).scalar() or 0
+    return max(hot, app.extensions['notification_archive'].max_id())
+
+
+SOCKET_EMITS = registry.add(Counter('socketio_emits_total', 'Socket.IO events emitted.', ('event',)))
+SOCKET_CONNECTS = registry.add(Counter('socketio_connects_total', 'Socket.IO client connections.'))
+SOCKET_REJECTS = registry.add(Counter('socketio_rejected_connects_total',
+                                      'Socket.IO connections refused for a missing or invalid token.'))
+registry.add(Gauge('socketio_connected_clients', 'Clients connected to the /notify namespace of this worker.',
+                   lambda: connected_clients))
+registry.add(Gauge('notification_cache_requests_total', 'Notification reads by recent-notification cache result.',
+                   lambda: {result: recent_notifications.stats()[result] for result in ('hits', 'misses')},
+                   labels=('result',), kind='counter'))
+registry.add(Gauge('notification_cache_items', 'Notifications held in the recent-notification cache.',
+                   lambda: recent_notifications.stats()['size']))
+registry.add(Gauge('notification_write_queue_depth', 'Accepted notifications waiting for the background writer.',
+                   lambda: notification_writer.stats()['pending']))
+registry.add(Gauge('notification_write_batches_total', 'Transactions committed by the background writer.',
+                   lambda: notification_writer.stats()['batches'], kind='counter'))
+registry.add(Gauge('app_startup_seconds', 'Time spent in create_app.',
+                   lambda: {phase[:-len('_ms')]: ms / 1000 for phase, ms in current_app.config['STARTUP'].items()},
+                   labels=('phase',)))
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+# Writers of every app built in this process. Accepted notifications are written before the process
+# exits, notify_workers.py closes the writer of forked workers itself
+open_writers = weakref.WeakSet()
+
+
+@atexit.register
+def close_writers():
+    for writer in list(open_writers):
+        writer.close()
+
+
+def create_app(overrides=None):
+    """Build the notification service; ``overrides`` are applied to app.config.
+
+    The Socket.IO server is attached here and database connections are only
+    opened on first use, so the app can be created before forking workers.
+    """
+    started = time.perf_counter()
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('NOTIFY_DATABASE_URI', 'sqlite:///notifications.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['NOTIFICATION_RETENTION_DAYS'] = 90
+    app.config['ARCHIVE_BATCH_SIZE'] = 1000
+    # Per-user ring buffer of recent notifications, capped in total across users
+    app.config['RECENT_NOTIFICATIONS_PER_USER'] = 50
+    app.config['RECENT_NOTIFICATIONS_MAX_ITEMS'] = 100000
+    app.config['RECENT_NOTIFICATIONS_TTL'] = 300
+    # Rows accepted by /notify/<user_id> are written in one transaction per interval (seconds)
+    app.config['NOTIFICATION_WRITE_INTERVAL'] = 0.005
+    app.config['NOTIFICATION_WRITE_MAX_BATCH'] = 500
+    # Shared by the workers of notify_workers.py so emits reach clients connected to any of them
+    app.config['SOCKETIO_MESSAGE_QUEUE'] = os.environ.get('NOTIFY_MESSAGE_QUEUE')
+    # Same value as token_secret in the API's [NOTIFICATION_SERVICE] section
+    app.config['SOCKET_TOKEN_SECRET'] = os.environ.get('NOTIFY_TOKEN_SECRET', 'ChangeMe')
+    app.config.update(overrides or {})
+
+    db.init_app(app)
+    app.register_blueprint(bp)
+    socketio.init_app(app, **queue_options(app.config['SOCKETIO_MESSAGE_QUEUE']))
+
+    init_database(app, db)
 
-    return jsonify(notification_list), 200
+    app.extensions['notification_archive'] = SegmentArchive(os.path.join(app.instance_path, 'archive'), key='user_id')
+    cache = app.extensions['recent_notifications'] = RecentNotifications(
+        per_user=app.config['RECENT_NOTIFICATIONS_PER_USER'],
+        max_items=app.config['RECENT_NOTIFICATIONS_MAX_ITEMS'],
+        ttl=app.config['RECENT_NOTIFICATIONS_TTL'])
+    ids = app.extensions['notification_ids'] = IdAllocator(lambda: max_notification_id(app))
+    writer = app.extensions['notification_writer'] = GroupCommitWriter(
+        lambda rows: write_notifications(app, rows),
+        interval=app.config['NOTIFICATION_WRITE_INTERVAL'],
+        max_batch=app.config['NOTIFICATION_WRITE_MAX_BATCH'])
+    open_writers.add(writer)
+    if isinstance(socketio.server.manager, PubSubManager):
+        follow_bus(socketio.server.manager, cache, ids)
+    app.config['STARTUP'] = {"create_app_ms": round((time.perf_counter() - started) * 1000, 1)}
+    app.logger.info('Started in %(create_app_ms)s ms', app.config['STARTUP'])
+    return app
 
 
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
         db.create_all()
     socketio.run(app, port=5001, debug=True)
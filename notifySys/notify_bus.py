@@ -0,0 +1,231 @@
+"""Message bus for running notifySys as several worker processes.
+
+An emit made in one worker is published on the bus and replayed by every
+other worker to the clients connected to it. ``BusHub`` relays frames
+between the workers over a UNIX or TCP socket and ``LocalBusManager`` is the
+python-socketio client manager talking to it. ``MemoryBusManager`` does the
+same between servers in one process, for tests.
+
+    NOTIFY_MESSAGE_QUEUE=local:///tmp/notify-bus.sock   UNIX socket
+    NOTIFY_MESSAGE_QUEUE=local://localhost:5101         TCP
+    NOTIFY_MESSAGE_QUEUE=memory://notify                in-process
+    NOTIFY_MESSAGE_QUEUE=redis://localhost:6379/0       handled by Flask-SocketIO
+
+notify_workers.py forks its own hub. Workers started some other way, e.g.
+one gunicorn per NOTIFY_WORKER_INDEX, need a hub running next to them:
+
+    python notify_bus.py local:///run/notify-bus.sock
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+import weakref
+from urllib.parse import urlsplit
+
+from socketio import PubSubManager
+
+SUBSCRIBE = b'subscribe\n'
+PUBLISH = b'publish\n'
+
+
+def bus_address(url):
+    # local:///run/notify.sock -> UNIX socket, local://host:port -> TCP
+    parts = urlsplit(url)
+    if parts.hostname:
+        return socket.AF_INET, (parts.hostname, parts.port)
+    return socket.AF_UNIX, parts.path
+
+
+def bus_listener(url):
+    family, address = bus_address(url)
+    listener = socket.socket(family, socket.SOCK_STREAM)
+    if family == socket.AF_UNIX:
+        if os.path.exists(address):
+            os.unlink(address)
+    else:
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(address)
+    listener.listen(128)
+    return listener
+
+
+def connect(url):
+    family, address = bus_address(url)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+class BusHub:
+    """Relays every line published by a connection to all subscribed connections.
+
+    Connections say whether they publish or subscribe in their first line,
+    frames are single lines of JSON. Binding happens in the constructor, so
+    the hub can be created before forking workers and started afterwards.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.listener = bus_listener(url)
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def serve_forever(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn):
+        with conn, conn.makefile('rb') as lines:
+            role = lines.readline()
+            if role == SUBSCRIBE:
+                with self.lock:
+                    self.subscribers.add(conn)
+                # Subscribers never publish, this only returns once they hang up
+                lines.read()
+                with self.lock:
+                    self.subscribers.discard(conn)
+            elif role == PUBLISH:
+                for line in lines:
+                    self.relay(line)
+
+    def relay(self, line):
+        with self.lock:
+            for subscriber in list(self.subscribers):
+                try:
+                    subscriber.sendall(line)
+                except OSError:
+                    self.subscribers.discard(subscriber)
+
+    def close(self):
+        family, address = bus_address(self.url)
+        self.listener.close()
+        if family == socket.AF_UNIX and os.path.exists(address):
+            os.unlink(address)
+
+
+# Managers built in this process, renewed in forked children by one fork hook for all of them
+_managers = weakref.WeakSet()
+
+
+def _forked():
+    for manager in list(_managers):
+        manager._forked()
+
+
+os.register_at_fork(after_in_child=_forked)
+
+
+class LocalBusManager(PubSubManager):
+    """Client manager publishing and receiving Socket.IO events through a ``BusHub``."""
+    name = 'local'
+
+    def __init__(self, url, channel='flask-socketio', write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.url = url
+        self.publisher = None
+        self.publish_lock = threading.Lock()
+        # The manager is usually built before the workers are forked, each of them is its own host
+        _managers.add(self)
+
+    def _forked(self):
+        self.host_id = uuid.uuid4().hex
+        self.publisher = None
+        self.publish_lock = threading.Lock()
+
+    def _publish(self, data):
+        frame = json.dumps(data).encode() + b'\n'
+        with self.publish_lock:
+            for attempt in range(2):
+                try:
+                    if self.publisher is None:
+                        self.publisher = connect(self.url)
+                        self.publisher.sendall(PUBLISH)
+                    self.publisher.sendall(frame)
+                    return
+                except OSError:
+                    if self.publisher is not None:
+                        self.publisher.close()
+                    self.publisher = None
+        self._get_logger().error('Message bus at %s unreachable, %s not published', self.url, data['method'])
+
+    def _listen(self):
+        while True:
+            try:
+                sock = connect(self.url)
+                sock.sendall(SUBSCRIBE)
+            except OSError:
+                time.sleep(1)
+                continue
+            with sock, sock.makefile('rb') as lines:
+                for line in lines:
+                    yield json.loads(line)
+            self._get_logger().warning('Message bus at %s closed the connection, reconnecting', self.url)
+            time.sleep(1)
+
+
+class MemoryBusManager(PubSubManager):
+    """Client manager sharing events between Socket.IO servers of one process."""
+    name = 'memory'
+    channels = {}
+
+    def __init__(self, url, channel='flask-socketio', write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.subscribers = self.channels.setdefault(urlsplit(url).netloc or channel, [])
+
+    def _publish(self, data):
+        for subscriber in list(self.subscribers):
+            subscriber.put(data)
+
+    def _listen(self):
+        messages = queue.Queue()
+        self.subscribers.append(messages)
+        while True:
+            yield messages.get()
+
+
+def queue_options(url):
+    """Keyword arguments for ``SocketIO.init_app`` that route emits through ``url``."""
+    # Both keys are always set, SocketIO keeps options from an earlier create_app otherwise
+    if not url:
+        return {"message_queue": None, "client_manager": None}
+    if url.startswith('local:'):
+        return {"message_queue": None, "client_manager": LocalBusManager(url)}
+    if url.startswith('memory:'):
+        return {"message_queue": None, "client_manager": MemoryBusManager(url)}
+    return {"message_queue": url}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs a bus hub for notifySys workers.')
+    parser.add_argument('url', help='local:// URL the workers use as NOTIFY_MESSAGE_QUEUE.')
+    url = parser.parse_args().url
+    if not url.startswith('local:'):
+        parser.error('Only local:// buses need a hub')
+    hub = BusHub(url)
+    print(f'Relaying notifySys events on {url}', flush=True)
+    try:
+        hub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        hub.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Entry:
+    def __init__(self, floor, loaded_at):
+        # Every notification of the user with an ID above floor is in ids/items
+        self.floor = floor
+        self.ids = []
+        self.items = []
+        self.read_up_to = None
+        self.loaded_at = loaded_at
+
+
+class RecentNotifications:
+    """Thread-safe cache of the latest ``per_user`` notifications of recently active users.
+
+    Reads starting at or above an entry's floor are answered from memory.
+    Writes extend the entries of their user. Entries become readable once a
+    database read has filled in the user's older rows and read watermark.
+    At most ``max_items`` notifications are held, the least recently used
+    users are evicted first. Entries are reloaded after ``ttl`` seconds in
+    case an update from another worker was missed.
+    """
+
+    def __init__(self, per_user=50, max_items=100000, ttl=300):
+        self.per_user = per_user
+        self.max_items = max_items
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, user_id):
+        entry = self._users.get(user_id)
+        if entry is not None and entry.loaded_at + self.ttl <= time.monotonic():
+            self._drop(user_id)
+            return None
+        return entry
+
+    def _drop(self, user_id):
+        self.size -= len(self._users.pop(user_id).ids)
+
+    def _insert(self, entry, notification):
+        if notification['id'] <= entry.floor:
+            return
+        position = bisect.bisect_left(entry.ids, notification['id'])
+        if position < len(entry.ids) and entry.ids[position] == notification['id']:
+            return
+        # Emits of concurrent writes can arrive out of order, keep the entry sorted by ID
+        entry.ids.insert(position, notification['id'])
+        entry.items.insert(position, notification)
+        self.size += 1
+        if len(entry.ids) > self.per_user:
+            entry.floor = entry.ids.pop(0)
+            entry.items.pop(0)
+            self.size -= 1
+
+    def _touch(self, user_id):
+        self._users.move_to_end(user_id)
+        while self.size > self.max_items and len(self._users) > 1:
+            self._drop(next(iter(self._users)))
+            self.evictions += 1
+
+    def add(self, user_id, notification):
+        """Records a notification ({"id", "message", "timestamp"}) written for the user."""
+        with self._lock:
+            entry = self._entry(user_id)
+            if entry is None:
+                # Nothing is known about older rows yet, a later read fills them in
+                entry = self._users[user_id] = _Entry(notification['id'] - 1, time.monotonic())
+            self._insert(entry, notification)
+            self._touch(user_id)
+
+    def load(self, user_id, since_id, notifications, read_up_to):
+        """Stores the result of a database read returning every notification above ``since_id``."""
+        with self._lock:
+            entry = self._entry(user_id)
+            if entry is None:
+                entry = self._users[user_id] = _Entry(since_id, time.monotonic())
+            else:
+                # Rows written during the read were added with a floor just below them
+                entry.floor = min(entry.floor, since_id)
+            for notification in notifications[-self.per_user:]:
+                self._insert(entry, notification)
+            if len(notifications) > self.per_user:
+                entry.floor = max(entry.floor, notifications[-self.per_user - 1]['id'])
+                while entry.ids and entry.ids[0] <= entry.floor:
+                    entry.ids.pop(0)
+                    entry.items.pop(0)
+                    self.size -= 1
+            entry.read_up_to = max(read_up_to, entry.read_up_to or 0)
+            self._touch(user_id)
+
+    def mark_read(self, user_id, read_up_to):
+        with self._lock:
+            entry = self._entry(user_id)
+            if entry is not None and entry.read_up_to is not None:
+                entry.read_up_to = max(entry.read_up_to, read_up_to)
+
+    def since(self, user_id, since_id, limit=None):
+        """Returns (notifications above since_id, read watermark), or None if the database has to answer."""
+        with self._lock:
+            entry = self._entry(user_id)
+            if entry is None or entry.read_up_to is None or since_id < entry.floor:
+                self.misses += 1
+                return None
+            self._users.move_to_end(user_id)
+            self.hits += 1
+            start = bisect.bisect_right(entry.ids, since_id)
+            end = start + limit if limit else len(entry.items)
+            return entry.items[start:end], entry.read_up_to
+
+    def newer_than(self, user_id, notification_id):
+        """IDs above ``notification_id`` cached for the user, also before a read has filled in the entry."""
+        with self._lock:
+            entry = self._entry(user_id)
+            if entry is None:
+                return []
+            return entry.ids[bisect.bisect_right(entry.ids, notification_id):]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "size": self.size,
+                "max_items": self.max_items,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
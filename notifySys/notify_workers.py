@@ -0,0 +1,127 @@
+"""Runs notifySys as several worker processes sharing one port, for development only.
+
+    python notify_workers.py --workers 4 --port 5001
+
+Every worker serves with werkzeug's development server, one thread per
+connection, so throughput does not grow with --workers the way a production
+server's would. It is meant for trying the bus and the worker ID scheme
+locally and for the workers benchmark; in production run notify_wsgi.py
+under an eventlet server, one process per NOTIFY_WORKER_INDEX.
+
+The parent imports the app once, binds the port and the message bus socket
+and forks a bus hub plus the workers, restarting any of them that exits.
+Emits made in one worker reach the clients connected to the others through
+the bus (NOTIFY_MESSAGE_QUEUE, a local UNIX socket hub by default; a
+redis:// URL works too and then no hub is started).
+
+Socket.IO clients have to use the websocket transport: the requests of a
+long-polling session can land on different workers, which do not share
+sessions.
+
+Worker i of n only hands out notification IDs equal to i modulo n, so
+/notify/<user_id> can answer before its row is written. On SIGTERM every
+worker writes the notifications it has accepted before exiting.
+"""
+import argparse
+import os
+import signal
+import socket
+import tempfile
+
+from werkzeug.serving import make_server
+
+import notify
+from notify_bus import BusHub
+
+
+def listen_sockets(host, port, count):
+    # With SO_REUSEPORT each worker gets its own accept queue and the kernel spreads connections evenly
+    if not hasattr(socket, 'SO_REUSEPORT'):
+        return [socket.create_server((host, port), backlog=1024)] * count
+    sockets = []
+    for _ in range(count):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((host, port))
+        sock.listen(1024)
+        port = sock.getsockname()[1]
+        sockets.append(sock)
+    return sockets
+
+
+def fork(target, *args):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        try:
+            target(*args)
+        finally:
+            os._exit(1)
+    return pid
+
+
+def serve(app, host, sock, index, count):
+    app.extensions['notification_ids'].configure(stride=count, offset=index)
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        make_server(host, sock.getsockname()[1], app, threaded=True, fd=sock.fileno()).serve_forever()
+    finally:
+        # fork() leaves through os._exit, which skips the atexit hook
+        app.extensions['notification_writer'].close()
+
+
+def stop(signum, frame):
+    raise SystemExit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--message-queue', default=os.environ.get('NOTIFY_MESSAGE_QUEUE'),
+                        help='Bus shared by the workers, defaults to a UNIX socket in a temporary directory.')
+    args = parser.parse_args()
+
+    run_dir = tempfile.mkdtemp(prefix='notify-workers-')
+    url = args.message_queue or f'local://{os.path.join(run_dir, "bus.sock")}'
+    hub = BusHub(url) if url.startswith('local:') else None
+
+    app = notify.create_app({"SOCKETIO_MESSAGE_QUEUE": url})
+    with app.app_context():
+        notify.db.create_all()
+    sockets = listen_sockets(args.host, args.port, args.workers)
+
+    children = {}
+    if hub:
+        children[fork(hub.serve_forever)] = ('hub', None)
+    for index, sock in enumerate(sockets):
+        children[fork(serve, app, args.host, sock, index, args.workers)] = ('worker', index)
+    print(f'Serving on {args.host}:{sockets[0].getsockname()[1]} with {args.workers} workers, bus {url} '
+          f'(development server, use notify_wsgi.py in production)', flush=True)
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while True:
+            pid, status = os.wait()
+            role, index = children.pop(pid)
+            app.logger.error('%s %s exited with status %s, restarting', role, pid, status)
+            if role == 'hub':
+                children[fork(hub.serve_forever)] = (role, index)
+            else:
+                children[fork(serve, app, args.host, sockets[index], index, args.workers)] = (role, index)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+        for pid in children:
+            os.waitpid(pid, 0)
+        if hub:
+            hub.close()
+        os.rmdir(run_dir)
+
+
+if __name__ == '__main__':
+    main()
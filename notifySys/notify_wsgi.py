@@ -0,0 +1,20 @@
+"""WSGI entry point for a Socket.IO capable server, e.g.
+
+    gunicorn -k eventlet -w 1 -b :5001 notify_wsgi:app
+
+Each process needs its own gunicorn instance (-w 1). To run several, give
+them the same NOTIFY_MESSAGE_QUEUE, NOTIFY_WORKER_COUNT and a distinct
+NOTIFY_WORKER_INDEX from 0 to count - 1, so the notification IDs they hand
+out never collide, and route each websocket client to one of them from a
+load balancer. The message queue is either a redis:// URL or a local:// one
+served by a hub started alongside them with ``python notify_bus.py <url>``;
+without one, emits never reach clients connected to another instance.
+"""
+import os
+
+from notify import create_app
+
+app = create_app()
+if 'NOTIFY_WORKER_COUNT' in os.environ:
+    app.extensions['notification_ids'].configure(stride=int(os.environ['NOTIFY_WORKER_COUNT']),
+                                                 offset=int(os.environ.get('NOTIFY_WORKER_INDEX', 0)))